@@ -8,111 +8,148 @@ from src.TimeManager import TimeManager
 from src.solver.AdaptivePartitioner import AdaptivePartitioner
 from src.solver.MilpSolver import MilpSolver
 from src.BigMFinder import BigMFinder
+from src.ArtifactCache import ArtifactCache
 
 # Expiriment parameters
 SEED = 421
 NUM_THREADS = 1
+# Block of scenarios of the streamed Song et al violations,
+# None stores the dense tensor of all violations
+SONG_BLOCK_SIZE = None
+# Processes solving the Belotti et al big M MIPs of binary instances
+NUM_WORKERS = 1
+# Processes solving the deterministic models of the scenario and
+# subset costs, and the accurate splits of the cost refiner
+NUM_EVAL_WORKERS = 1
+# Reuse the big M's of previous iterations of the adaptive partitioner:
+# the big M's of a looser vUB within the refresh tolerance are kept,
+# which gives looser models than in the paper
+INCREMENTAL_BIG_M = False
+# Folder and maximum size in bytes of the artifacts shared by all the
+# runs on the same instance, e.g., "./results/cache/". None disables the
+# cache. The Song et al violations of an instance take
+# 8*nb_scenarios**2*nb_constraints bytes and are not cached if larger.
+ARTIFACT_CACHE_LOCATION = None
+ARTIFACT_CACHE_MAX_SIZE = 2**32
 
-# Experiment instance
-args = sys.argv[1:]
-FILE_LOCATION = args[0]
-USE_CONTINUOUS_VAR = (int(args[1]) == 1)
-EPSILON = float(args[2])
-METHOD = int(args[3])
-OUTPUT_FILE_LOCATION = args[4]
-TIME_LIMIT = 3600
-GAP = 1e-4
+# The experiment only runs in the main process: the process pools
+# import this module in their workers
+if __name__ == "__main__":
+    # Experiment instance
+    args = sys.argv[1:]
+    FILE_LOCATION = args[0]
+    USE_CONTINUOUS_VAR = (int(args[1]) == 1)
+    EPSILON = float(args[2])
+    METHOD = int(args[3])
+    OUTPUT_FILE_LOCATION = args[4]
+    TIME_LIMIT = 3600
+    GAP = 1e-4
 
-# Output selection
-WITH_ITERATION_INFO = True
+    # Output selection
+    WITH_ITERATION_INFO = True
 
-# Setting expiriment parameters
-random.seed(SEED)
-os.environ["OMP_NUM_THREADS"] = str(NUM_THREADS)
-os.environ["OPENBLAS_NUM_THREADS"] = str(NUM_THREADS)
-os.environ["MKL_NUM_THREADS"] = str(NUM_THREADS)
-os.environ["VECLIB_MAXIMUM_THREADS"] = str(NUM_THREADS)
-os.environ["NUMEXPR_NUM_THREADS"] = str(NUM_THREADS)
-os.environ['OPENBLAS_NUM_THREADS'] = str(NUM_THREADS)
+    # Setting expiriment parameters
+    random.seed(SEED)
+    os.environ["OMP_NUM_THREADS"] = str(NUM_THREADS)
+    os.environ["OPENBLAS_NUM_THREADS"] = str(NUM_THREADS)
+    os.environ["MKL_NUM_THREADS"] = str(NUM_THREADS)
+    os.environ["VECLIB_MAXIMUM_THREADS"] = str(NUM_THREADS)
+    os.environ["NUMEXPR_NUM_THREADS"] = str(NUM_THREADS)
+    os.environ['OPENBLAS_NUM_THREADS'] = str(NUM_THREADS)
 
-# Create folders for results
-if not os.path.exists(OUTPUT_FILE_LOCATION):
-    os.makedirs(OUTPUT_FILE_LOCATION)
+    # Create folders for results
+    if not os.path.exists(OUTPUT_FILE_LOCATION):
+        os.makedirs(OUTPUT_FILE_LOCATION)
+    ArtifactCache.configure(ARTIFACT_CACHE_LOCATION,
+                            max_size=ARTIFACT_CACHE_MAX_SIZE)
 
-# Load instance data
-chance_instance = ChanceKnapInstance(FILE_LOCATION,
-                                     USE_CONTINUOUS_VAR,
-                                     EPSILON)
+    # Load instance data
+    chance_instance = ChanceKnapInstance(FILE_LOCATION,
+                                         USE_CONTINUOUS_VAR,
+                                         EPSILON, use_cache=True)
 
-# Creating Output file name and location
-file_name = chance_instance.get_file_name()
-output_file_name = (OUTPUT_FILE_LOCATION + file_name + "-" +
-                    "{:.0f}".format(EPSILON*100) +
-                    USE_CONTINUOUS_VAR*"-1-" +
-                    (not USE_CONTINUOUS_VAR)*"-0-" +
-                    str(METHOD))
-computation_output_file_name = output_file_name + ".csv"
-iteration_output_file_name = output_file_name + "-iter.csv"
-print('Running experiment:', computation_output_file_name)
+    # Creating Output file name and location
+    file_name = chance_instance.get_file_name()
+    output_file_name = (OUTPUT_FILE_LOCATION + file_name + "-" +
+                        "{:.0f}".format(EPSILON*100) +
+                        USE_CONTINUOUS_VAR*"-1-" +
+                        (not USE_CONTINUOUS_VAR)*"-0-" +
+                        str(METHOD))
+    computation_output_file_name = output_file_name + ".csv"
+    iteration_output_file_name = output_file_name + "-iter.csv"
+    print('Running experiment:', computation_output_file_name)
 
 
-# Timeout handler to stop the process when the time limit is reached
-def timeout_handler(signum, frame):
-    signal.raise_signal(signal.SIGINT)
+    # Timeout handler to stop the process when the time limit is reached
+    def timeout_handler(signum, frame):
+        signal.raise_signal(signal.SIGINT)
 
 
-# Raise alarm when time limit is reached and call the handler
-try:
-    signal.signal(signal.SIGALRM, timeout_handler)
-except AttributeError:
-    print('\n--                 ! Warning !                 --')
-    print('The timeout signal handler is designed for Unix systems.')
-    print('The code will run but the timeout exception will not')
-    print('be handled correctly, and will throw an error not')
-    print('after the time limit of', TIME_LIMIT, 'seconds.')
-    print('--                 ! Warning !                 --\n')
+    # Raise alarm when time limit is reached and call the handler
+    try:
+        signal.signal(signal.SIGALRM, timeout_handler)
+    except AttributeError:
+        print('\n--                 ! Warning !                 --')
+        print('The timeout signal handler is designed for Unix systems.')
+        print('The code will run but the timeout exception will not')
+        print('be handled correctly, and will throw an error not')
+        print('after the time limit of', TIME_LIMIT, 'seconds.')
+        print('--                 ! Warning !                 --\n')
 
 
-if METHOD == 1:
-    method = MilpSolver(chance_instance, time_limit=TIME_LIMIT, gap=GAP)
-    method.solve(use_big_m=True, big_m_method="song",
-                 save_bounds=True, path=iteration_output_file_name)
-elif METHOD == 2:
-    method = MilpSolver(chance_instance, time_limit=TIME_LIMIT, gap=GAP)
-    method.solve(use_big_m=True, big_m_method="belotti",
-                 save_bounds=True, path=iteration_output_file_name)
-elif METHOD == 3:
-    signal.alarm(TIME_LIMIT)
-    method = AdaptivePartitioner(
-        chance_instance, initial_partition_type="random",
-        split_method='random',
-        projection_method='rescaled_max_violation',
-        time_limit=TIME_LIMIT, gap=GAP)
-    partitionBigMFinder = BigMFinder(method.chance_instance_part)
-    try:
-        method.solve(partitionBigMFinder, use_merger=False,
-                     use_big_M=True, big_m_method="belotti",
-                     use_balancing=False)
-    except KeyboardInterrupt:
-        print("Reached time limit between iterations.")
-elif METHOD == 4:
-    signal.alarm(TIME_LIMIT)
-    method = AdaptivePartitioner(
-        chance_instance, initial_partition_type="cost",
-        split_method='cost',
-        use_acc_obj=True,
-        projection_method='rescaled_max_violation',
-        time_limit=TIME_LIMIT, gap=GAP)
-    partitionBigMFinder = BigMFinder(method.chance_instance_part)
-    try:
-        method.solve(partitionBigMFinder, use_merger=True,
-                     use_big_M=True, big_m_method="belotti",
-                     use_balancing=False, use_lazy=True)
-    except KeyboardInterrupt:
-        print("Reached time limit between iterations.")
+    if METHOD == 1:
+        method = MilpSolver(chance_instance, time_limit=TIME_LIMIT, gap=GAP,
+                            nb_threads=NUM_THREADS,
+                            song_block_size=SONG_BLOCK_SIZE,
+                            nb_eval_workers=NUM_EVAL_WORKERS)
+        method.solve(use_big_m=True, big_m_method="song",
+                     save_bounds=True, path=iteration_output_file_name)
+    elif METHOD == 2:
+        method = MilpSolver(chance_instance, time_limit=TIME_LIMIT, gap=GAP,
+                            nb_workers=NUM_WORKERS,
+                            nb_eval_workers=NUM_EVAL_WORKERS)
+        method.solve(use_big_m=True, big_m_method="belotti",
+                     save_bounds=True, path=iteration_output_file_name)
+    elif METHOD == 3:
+        signal.alarm(TIME_LIMIT)
+        method = AdaptivePartitioner(
+            chance_instance, initial_partition_type="random",
+            split_method='random',
+            projection_method='rescaled_max_violation',
+            time_limit=TIME_LIMIT, gap=GAP,
+            nb_eval_workers=NUM_EVAL_WORKERS)
+        partitionBigMFinder = BigMFinder(method.chance_instance_part,
+                                         nb_threads=NUM_THREADS,
+                                         nb_workers=NUM_WORKERS,
+                                         incremental=INCREMENTAL_BIG_M)
+        try:
+            method.solve(partitionBigMFinder, use_merger=False,
+                         use_big_M=True, big_m_method="belotti",
+                         use_balancing=False)
+        except KeyboardInterrupt:
+            print("Reached time limit between iterations.")
+    elif METHOD == 4:
+        signal.alarm(TIME_LIMIT)
+        method = AdaptivePartitioner(
+            chance_instance, initial_partition_type="cost",
+            split_method='cost',
+            use_acc_obj=True,
+            projection_method='rescaled_max_violation',
+            time_limit=TIME_LIMIT, gap=GAP,
+            nb_eval_workers=NUM_EVAL_WORKERS)
+        partitionBigMFinder = BigMFinder(method.chance_instance_part,
+                                         nb_threads=NUM_THREADS,
+                                         nb_workers=NUM_WORKERS,
+                                         incremental=INCREMENTAL_BIG_M)
+        try:
+            method.solve(partitionBigMFinder, use_merger=True,
+                         use_big_M=True, big_m_method="belotti",
+                         use_balancing=False, use_lazy=True)
+        except KeyboardInterrupt:
+            print("Reached time limit between iterations.")
 
-# Writing everything to the file
-TimeManager.set_final_time()
-method.write_all_computation_details(computation_output_file_name)
-if WITH_ITERATION_INFO and METHOD in [3, 4]:
-    method.write_iteration_details(iteration_output_file_name)
+    # Writing everything to the file
+    TimeManager.set_final_time()
+    method.write_all_computation_details(computation_output_file_name)
+    if WITH_ITERATION_INFO and METHOD in [3, 4]:
+        method.write_iteration_details(iteration_output_file_name)
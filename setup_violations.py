@@ -1,8 +1,23 @@
+import sys
 from distutils.core import setup
 from distutils.extension import Extension
 from Cython.Distutils import build_ext
 
+# Compile with OpenMP to compute the violations in parallel
+if sys.platform == "win32":
+    openmp_compile_args = ['/openmp']
+    openmp_link_args = []
+elif sys.platform == "darwin":
+    # Apple clang needs libomp, e.g., installed with Homebrew
+    openmp_compile_args = ['-Xpreprocessor', '-fopenmp']
+    openmp_link_args = ['-lomp']
+else:
+    openmp_compile_args = ['-fopenmp']
+    openmp_link_args = ['-fopenmp']
+
 ext_modules = [Extension("violations", ["violations.pyx"],
-                         language='c++',)]
+                         language='c++',
+                         extra_compile_args=openmp_compile_args,
+                         extra_link_args=openmp_link_args)]
 
 setup(cmdclass={'build_ext': build_ext}, ext_modules=ext_modules)
@@ -0,0 +1,136 @@
+import os
+import hashlib
+import numpy as np
+
+
+class ArtifactCache(object):
+    """
+    On-disk store of the expensive artifacts that do not depend on
+    epsilon, e.g., the single-scenario costs or the Song et al
+    violations, shared by all the runs on the same instance.
+
+    An artifact is keyed by a hash of the instance arrays and variable
+    type, and by its name. Writes are atomic so that concurrent runs never
+    read a partially written artifact. When the total size of the cache
+    exceeds max_size bytes, the least recently used artifacts are removed.
+    The cache is disabled until a folder is set with configure.
+    """
+    cache_location = None
+    max_size = None
+
+    @classmethod
+    def configure(cls, cache_location, max_size=2**32):
+        cls.cache_location = cache_location
+        cls.max_size = max_size
+        if cache_location is not None:
+            os.makedirs(cache_location, exist_ok=True)
+
+    @classmethod
+    def disable(cls):
+        cls.configure(None)
+
+    @classmethod
+    def is_enabled(cls):
+        return cls.cache_location is not None
+
+    #   - - - Private methods - - -
+    @staticmethod
+    def _arrays_key(chance_instance):
+        """
+        Hash of the instance arrays and variable type. It is computed
+        once and stored in the instance, whose arrays do not change.
+        """
+        arrays_key = getattr(chance_instance, "artifact_key", None)
+        if arrays_key is None:
+            key = hashlib.sha256()
+            for array in [chance_instance.get_matrices_A(),
+                          chance_instance.get_vectors_b(),
+                          chance_instance.get_vector_c(),
+                          chance_instance.get_var_type()]:
+                array = np.ascontiguousarray(array)
+                key.update(str((array.shape, array.dtype.str)).encode())
+                key.update(array.tobytes())
+            arrays_key = key.hexdigest()
+            chance_instance.artifact_key = arrays_key
+        return arrays_key
+
+    @classmethod
+    def _instance_key(cls, chance_instance):
+        """Hash of the instance arrays, variable type and partition."""
+        key = hashlib.sha256(cls._arrays_key(chance_instance).encode())
+        partition = getattr(chance_instance, "partition", None)
+        key.update(repr(partition).encode())
+        return key.hexdigest()
+
+    @classmethod
+    def _get_artifact_file(cls, chance_instance, name):
+        return os.path.join(cls.cache_location,
+                            cls._instance_key(chance_instance)
+                            + "-" + name + ".npy")
+
+    @classmethod
+    def _evict(cls):
+        """
+        Remove the least recently used artifacts until the cache fits
+        in its maximum size. Artifacts removed concurrently by other
+        runs are ignored.
+        """
+        artifacts = []
+        for entry in os.scandir(cls.cache_location):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in artifacts)
+        for _, size, path in sorted(artifacts):
+            if total_size <= cls.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    #   - - - Public methods - - -
+    @classmethod
+    def load(cls, chance_instance, name):
+        """
+        Returns the artifact of the instance with the given name,
+        or None if the cache is disabled or does not contain it.
+        """
+        if not cls.is_enabled():
+            return None
+        artifact_file = cls._get_artifact_file(chance_instance, name)
+        try:
+            artifact = np.load(artifact_file)
+            # Mark the artifact as recently used
+            os.utime(artifact_file)
+        except (OSError, ValueError):
+            return None
+        print('Loaded cached artifact:', name)
+        return artifact
+
+    @classmethod
+    def save(cls, chance_instance, name, artifact):
+        """
+        Atomically write the artifact of the instance: write to a
+        temporary file and replace the target. Artifacts larger than
+        the cache are not saved. Failing to write the cache is not an
+        error: the artifact is simply computed again in the next run.
+        """
+        if not cls.is_enabled():
+            return
+        artifact = np.ascontiguousarray(artifact)
+        if artifact.nbytes > cls.max_size:
+            return
+        artifact_file = cls._get_artifact_file(chance_instance, name)
+        temp_file = artifact_file + "." + str(os.getpid()) + ".tmp"
+        try:
+            with open(temp_file, "wb") as f:
+                np.save(f, artifact)
+            os.replace(temp_file, artifact_file)
+            cls._evict()
+        except OSError:
+            print('Warning: could not write cached artifact', name)
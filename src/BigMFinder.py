@@ -1,26 +1,92 @@
 # Import packages
 import math
+import time
+import multiprocessing
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from gurobipy import GRB
-from copy import copy
 
-# Import Cython functions
-from violations import compute_all_violations
+# Import Cython functions, or their NumPy versions if the extension
+# was not built
+try:
+    from violations import compute_all_violations, compute_violations_block
+except ImportError:
+    from src.song_big_m import vectorized_all_violations \
+        as compute_all_violations
+    from src.song_big_m import vectorized_violations_block \
+        as compute_violations_block
 # Import local python functions
 from src.optim.BigMKnapsackModel import BigMKnapsackModel
-from src.song_big_m import solve_continuous_knapsack
+from src.song_big_m import solve_all_continuous_knapsacks
+from src.Partition import Partition
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
 from src.instance.PartitionChanceKnapInstance import \
     PartitionChanceKnapInstance
+from src.TimeManager import TimeManager
+from src.ArtifactCache import ArtifactCache
+
+
+def _solve_belotti_shard(instance_args, vUB, pairs, gap, use_one_thread,
+                         deadline):
+    """
+    Process pool worker: solve the Belotti et al MIPs of a shard of
+    (scenario, constraint) pairs with a single knapsack model.
+    The pairs that are not solved before the deadline are returned as nan.
+    """
+    chance_instance = ChanceKnapInstance(*instance_args)
+    big_m_knapsack_model = BigMKnapsackModel(chance_instance, vUB)
+    big_m_knapsack_model.build()
+    BigMFinder._set_gurobi_params(big_m_knapsack_model, gap, use_one_thread)
+    big_ms = np.full(len(pairs), np.nan)
+    for p, (s, i) in enumerate(pairs):
+        if deadline is not None:
+            remaining_time = deadline - time.time()
+            if remaining_time <= 0:
+                break
+            big_m_knapsack_model.grb_model.setParam(GRB.Param.TimeLimit,
+                                                    remaining_time)
+        big_m_knapsack_model.initialize_violation_objective(s, i)
+        big_m_knapsack_model.solve()
+        big_ms[p] = big_m_knapsack_model.get_obj_bnd()
+    return big_ms
 
 
 class BigMFinder(object):
     """
     Find big M parameters of indicator constraints.
+    The Song et al violations are computed with nb_threads threads
+    and the Belotti et al MIPs are solved by nb_workers processes.
+    If song_block_size is given, the violations are streamed by blocks
+    of scenarios instead of being stored in a dense tensor.
+    If incremental is True, the Belotti et al big M's are cached across
+    updates and only the stale rows are recomputed.
     """
-    def __init__(self, chance_instance):
+    # Number of smallest violations kept per (scenario, constraint) when
+    # streaming, as a multiple of the quantile index
+    SONG_KEPT_FACTOR = 2
+    # Maximum number of violations aggregated over subsets at once
+    MAX_AGGREGATED_VIOLATIONS = 2**24
+    # Relative decrease of vUB after which cached big M's are recomputed
+    # even for subsets that did not change
+    INCREMENTAL_REFRESH_TOL = 0.05
+
+    def __init__(self, chance_instance, nb_threads=1, song_block_size=None,
+                 nb_workers=1, incremental=False):
         self.chance_instance = chance_instance
+        self.nb_threads = nb_threads
+        self.nb_workers = nb_workers
+        self.incremental = incremental
+        self.nb_mips_avoided = 0
+        # Cached big M of every (scenario, constraint) and the vUB
+        # under which it was computed
+        self.cached_big_m = None
+        self.cached_vUB = None
+        self.cached_subsets = set()
+        self.song_block_size = song_block_size
         self.nb_scenarios = self.chance_instance.get_nb_scenarios()
         self.song_violations = None
+        self.song_smallest_violations = None
+        self.song_smallest_scenarios = None
         # Initialize with naive big M
         self.bigM = [self._naive_bigM(s) for s in range(self.nb_scenarios)]
 
@@ -37,28 +103,146 @@ class BigMFinder(object):
         assert len(naive_bigM) == self.chance_instance.get_nb_constraints(s)
         return naive_bigM
 
-    def _single_continuous_belotti_iter(self, s, i, upper_bound):
+    def _continuous_belotti_table(self, upper_bound):
         """Belotti et al big M tightening method for continuous variables.
 
-        It is solved using a greedy sorting approach.
+        All the single-dimensional knapsacks share the objective vector as
+        weights, they are all solved with one vectorized greedy pass.
 
         Args:
-           s (int): scenario index to be tightened
-           i (int): constraint index to be tightened
            upper_bound (float): bound used for the knapsack constraint
 
         Returns:
-           new_big_m (float): new big m for constraint (s,i)
+           table (np.array): new big M of every (scenario, constraint)
+        """
+        return solve_all_continuous_knapsacks(
+            self.chance_instance.get_matrices_A(),
+            self.chance_instance.get_vectors_b(),
+            self.chance_instance.get_vector_c(), upper_bound)
+
+    def _belotti_table(self, vUB, gap, use_one_thread, verbose,
+                       use_lp_screening, rows=None):
+        """
+        Belotti et al big M of every (scenario, constraint). The big M of
+        a constraint of a subset is that of the scenario constraint.
+        If rows is given, only the MIPs of these rows are solved and the
+        other rows of the table are only upper bounds.
+
+        Returns:
+           table (np.array): big M of every (scenario, constraint)
+        """
+        # Check if we have integer variables
+        var_type = self.chance_instance.get_var_type()
+        integer_vars = (sum(var_type == 0) > 0)
+        if not integer_vars:
+            # Only continuous vars: this is a single-dim knapsack
+            return self._continuous_belotti_table(vUB)
+
+        # Integer Vars = run MIP
+        if use_lp_screening:
+            # Only solve the MIPs that can change the model: keep the
+            # relaxation bound if it is exact or the big M is negative
+            table, is_integral = self._relaxed_belotti_table(vUB)
+            needs_mip = ~is_integral & (table > 0.0)
+        else:
+            table = (np.sum(self.chance_instance.get_matrices_A(), axis=2)
+                     - self.chance_instance.get_vectors_b())
+            needs_mip = np.ones(table.shape, dtype=bool)
+        if rows is not None:
+            needs_mip &= rows
+        self.nb_mips_avoided = int(np.count_nonzero(~needs_mip))
+        print('Number of MIPs avoided by screening:', self.nb_mips_avoided)
+        if self.nb_workers > 1:
+            return self._parallel_mip_belotti_table(
+                vUB, gap, use_one_thread, table, needs_mip)
+        # Initialize optimization model
+        big_m_knapsack_model = BigMKnapsackModel(self.chance_instance, vUB)
+        big_m_knapsack_model.build(verbose=verbose)
+        self._set_gurobi_params(big_m_knapsack_model, gap, use_one_thread)
+        # The pairs that are not solved within the remaining time of the
+        # TimeManager keep their big M from the input table
+        deadline = self._get_deadline()
+        nb_unsolved = 0
+        nb_scenarios = table.shape[0]
+        for s in range(nb_scenarios):
+            self._print_status(s, nb_scenarios)
+            for i in np.flatnonzero(needs_mip[s]):
+                if deadline is not None:
+                    remaining_time = deadline - time.time()
+                    if remaining_time <= 0:
+                        nb_unsolved += 1
+                        continue
+                    big_m_knapsack_model.grb_model.setParam(
+                        GRB.Param.TimeLimit, remaining_time)
+                table[s, i] = self._single_mip_belotti_iter(
+                    big_m_knapsack_model, s, i)
+        if nb_unsolved > 0:
+            print('Time limit reached: %d big M\'s left naive.'
+                  % nb_unsolved)
+        return table
+
+    def _stale_rows(self, vUB, subsets):
+        """
+        Rows of the cached big M's that need to be recomputed: the rows
+        never computed, the rows computed for a tighter vUB, the rows of
+        new subsets computed for a looser vUB, and the rows computed for
+        a vUB looser than the refresh tolerance.
+        """
+        is_new_scenario = np.ones(self.cached_vUB.shape[0], dtype=bool)
+        for subset in subsets:
+            if frozenset(subset) in self.cached_subsets:
+                is_new_scenario[subset] = False
+        refresh_vUB = vUB + self.INCREMENTAL_REFRESH_TOL * abs(vUB)
+        return (np.isnan(self.cached_vUB)
+                | (self.cached_vUB < vUB)
+                | ((self.cached_vUB > vUB) & is_new_scenario[:, None])
+                | (self.cached_vUB > refresh_vUB))
+
+    def _update_belotti_big_m_incremental(self, vUB):
         """
-        # Get the data from the chance instance
-        obj_vector = self.chance_instance.get_matrix_A(s)[i, :]
-        obj_constant = self.chance_instance.get_vector_b(s)[i]
-        lhs_vector = self.chance_instance.get_vector_c()
-        rhs = upper_bound
-        # Solve continous single-dimensional knapcksack
-        max_violation = solve_continuous_knapsack(
-            obj_vector, obj_constant, lhs_vector, rhs)
-        return max_violation
+        Update the cached Belotti et al big M's for the current partition
+        and vUB. A big M computed for a looser vUB remains valid, so only
+        the stale rows are recomputed.
+        """
+        A_matrices = self.chance_instance.get_matrices_A()
+        if self.cached_big_m is None:
+            self.cached_big_m = np.zeros(A_matrices.shape[:2])
+            self.cached_vUB = np.full(A_matrices.shape[:2], np.nan)
+        partition = self._get_partition()
+        if partition is None:
+            subsets = [[s] for s in range(A_matrices.shape[0])]
+        else:
+            subsets = partition
+        rows = self._stale_rows(vUB, subsets)
+        print('Reusing %d cached big M\'s.' % np.count_nonzero(~rows))
+        if rows.any():
+            print('Running Belotti et al for tightening big M\'s.')
+            table = self._belotti_table(vUB, gap=1e-8, use_one_thread=True,
+                                        verbose=False, use_lp_screening=True,
+                                        rows=rows)
+            self.cached_big_m[rows] = table[rows]
+            self.cached_vUB[rows] = vUB
+        self.cached_subsets = {frozenset(subset) for subset in subsets}
+        self._set_big_m_from_table(self.cached_big_m, partition)
+
+    def _get_partition(self):
+        """Returns the partition of the chance instance, if any."""
+        if isinstance(self.chance_instance, PartitionChanceKnapInstance):
+            return self.chance_instance.partition
+        return None
+
+    def _set_big_m_from_table(self, table, partition):
+        """
+        Set the big M's from the table of big M's of every (scenario,
+        constraint). The constraints of a subset are the stacked
+        constraints of its scenarios.
+        """
+        if partition is None:
+            for s in range(self.nb_scenarios):
+                self.bigM[s][:] = table[s]
+        else:
+            for c in range(self.nb_scenarios):
+                self.bigM[c][:] = table[partition[c]].reshape(-1)
 
     @staticmethod
     def _set_gurobi_params(model, gap, use_one_thread):
@@ -68,6 +252,13 @@ class BigMFinder(object):
         if use_one_thread:
             model.grb_model.setParam(GRB.Param.Threads, 1)
 
+    @staticmethod
+    def _get_deadline():
+        """Time at which the TimeManager runs out, None if not started."""
+        if TimeManager.get_start_time() is None:
+            return None
+        return time.time() + TimeManager.get_remaining_time()
+
     def _single_mip_belotti_iter(self, big_m_knapsack_model, s, i):
         """Belotti et al big M tightening method for binary variables.
 
@@ -76,33 +267,239 @@ class BigMFinder(object):
         Args:
            s (int): scenario index to be tightened
            i (int): constraint index to be tightened
-           upper_bound (float): bound used for the knapsack constraint
 
         Returns:
            new_big_m (float): new big m for constraint (s,i)
         """
-        big_m_knapsack_model.initialize_violation_objective(s, i)
+        big_m_knapsack_model.initialize_row_violation_objective(
+            self.chance_instance.get_matrices_A()[s, i, :],
+            self.chance_instance.get_vectors_b()[s, i])
         big_m_knapsack_model.solve()
         return big_m_knapsack_model.get_obj_bnd()
 
+    def _relaxed_belotti_table(self, upper_bound):
+        """
+        LP relaxation of the Belotti et al knapsacks of binary variables:
+        it is a continuous knapsack and gives an upper bound on the big M
+        of every (scenario, constraint). The bound is exact when the
+        greedy solution has no fractional item.
+
+        Returns:
+           table (np.array): relaxation bound of every (scenario, constraint)
+           is_integral (np.array): whether the relaxation bound is exact
+        """
+        A_matrices = self.chance_instance.get_matrices_A()
+        c = self.chance_instance.get_vector_c()
+        # Binary items without weight are only taken with positive revenue
+        revenues = np.where(c == 0.0, np.maximum(A_matrices, 0.0), A_matrices)
+        return solve_all_continuous_knapsacks(
+            revenues, self.chance_instance.get_vectors_b(), c, upper_bound,
+            return_is_integral=True)
+
+    def _parallel_mip_belotti_table(self, vUB, gap, use_one_thread,
+                                    table, needs_mip):
+        """Belotti et al big M tightening method for binary variables.
+
+        The (scenario, constraint) pairs that need a MIP are sharded over a
+        pool of processes, each solving the MIPs of its shard with its own
+        model. The pairs that are not solved within the remaining time of
+        the TimeManager keep their big M from the input table.
+
+        Returns:
+           table (np.array): new big M of every (scenario, constraint)
+        """
+        table = table.copy()
+        pairs = np.argwhere(needs_mip)
+        shards = [pairs[w::self.nb_workers].tolist()
+                  for w in range(self.nb_workers)]
+        deadline = self._get_deadline()
+        instance_args = self.chance_instance.get_instance_args()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.nb_workers,
+                                 mp_context=context) as executor:
+            results = executor.map(
+                _solve_belotti_shard, [instance_args] * self.nb_workers,
+                [vUB] * self.nb_workers, shards, [gap] * self.nb_workers,
+                [use_one_thread] * self.nb_workers,
+                [deadline] * self.nb_workers)
+            for w, big_ms in enumerate(results):
+                shard = pairs[w::self.nb_workers]
+                is_solved = ~np.isnan(big_ms)
+                table[shard[is_solved, 0], shard[is_solved, 1]] = \
+                    big_ms[is_solved]
+                if not is_solved.all():
+                    print('Time limit reached: %d big M\'s left naive.'
+                          % np.count_nonzero(~is_solved))
+        return table
+
     @staticmethod
     def _print_status(s, nb_scenarios):
         p = math.floor(100*s/nb_scenarios)
         if (p % 10) == 0:
             print('[%d%%] \r' % p, end="")
 
-    def _quantile_big_m(self, violations):
-        """Find the quantile of violations."""
-        violations.sort()
+    def _quantile_big_m(self, violations, axis=-1):
+        """Find the quantile of violations along the given axis."""
         epsilon = self.chance_instance.get_epsilon()
         q = int(math.floor(epsilon*self.nb_scenarios)+1)
-        return violations[q]
+        return np.take(np.partition(violations, q, axis=axis), q, axis=axis)
+
+    def _subset_quantile_table(self, partition):
+        """
+        Quantile over subsets of the violations of every (scenario,
+        constraint): the violation of a subset is the minimum over its
+        scenarios. The scenarios are ordered by subset so that the
+        minimums are a segmented reduction over contiguous blocks.
+
+        Returns:
+           table (np.array): big M of every (scenario, constraint).
+        """
+        nb_scenarios, _, nb_constraints = self.song_violations.shape
+        scenario_order, subset_offsets = Partition.as_partition(
+            partition, nb_scenarios).csr()
+        subset_starts = subset_offsets[:-1]
+        table = np.zeros((nb_scenarios, nb_constraints))
+        # Bound the size of the reordered copy of the violations
+        block_size = max(1, self.MAX_AGGREGATED_VIOLATIONS
+                         // (nb_scenarios * nb_constraints))
+        for start in range(0, len(scenario_order), block_size):
+            scenarios = scenario_order[start:start+block_size]
+            ordered_violations = self.song_violations[scenarios][
+                :, scenario_order, :]
+            subset_violations = np.minimum.reduceat(
+                ordered_violations, subset_starts, axis=1)
+            table[scenarios] = self._quantile_big_m(subset_violations, axis=1)
+        return table
+
+    def _song_big_m_from_tensor(self, chance_instance, partition):
+        """Song et al big M's from the dense tensor of all violations."""
+        # - Solve (card(S) * card(I))^2 single-dimensional continuous knapsacks
+        # Note that this is always calculated over scenarios even if
+        # the self.chance_instance is partitioned
+        if self.song_violations is None:
+            self.song_violations = ArtifactCache.load(chance_instance,
+                                                      "song-violations")
+        if self.song_violations is None:
+            print('Calculating all (s, i, s_prime, i_prime) violations.')
+            A_matrices = chance_instance.get_matrices_A()
+            b_vectors = chance_instance.get_vectors_b()
+            # Call Cython function
+            self.song_violations = compute_all_violations(
+                A_matrices, b_vectors, nb_threads=self.nb_threads)
+            ArtifactCache.save(chance_instance, "song-violations",
+                               self.song_violations)
+
+        # - Take quantile of violations over scenarios or subset
+        if partition is None:
+            table = self._quantile_big_m(self.song_violations, axis=1)
+        else:
+            table = self._subset_quantile_table(partition)
+        self._set_big_m_from_table(table, partition)
+
+    def _stream_song_violations(self, chance_instance):
+        """
+        Compute the violations by blocks of scenarios and only keep the
+        smallest violations of each (scenario, constraint), sorted in
+        increasing order, as well as the scenarios that produce them.
+        Peak memory is proportional to the number of kept violations
+        instead of the square of the number of scenarios.
+        """
+        A_matrices = chance_instance.get_matrices_A()
+        b_vectors = chance_instance.get_vectors_b()
+        nb_scenarios, nb_constraints, _ = A_matrices.shape
+        epsilon = chance_instance.get_epsilon()
+        q = int(math.floor(epsilon*nb_scenarios)+1)
+        nb_kept = min(nb_scenarios, self.SONG_KEPT_FACTOR * (q + 1))
+        self.song_smallest_violations = np.zeros(
+            (nb_scenarios, nb_kept, nb_constraints))
+        self.song_smallest_scenarios = np.zeros(
+            (nb_scenarios, nb_kept, nb_constraints), dtype=np.int32)
+        print('Streaming all (s, i, s_prime, i_prime) violations.')
+        for start in range(0, nb_scenarios, self.song_block_size):
+            self._print_status(start, nb_scenarios)
+            end = min(start + self.song_block_size, nb_scenarios)
+            block = compute_violations_block(
+                A_matrices, b_vectors, start, end, nb_threads=self.nb_threads)
+            # Select the smallest violations and sort them
+            kept = np.argpartition(block, nb_kept-1, axis=1)[:, :nb_kept, :]
+            kept_violations = np.take_along_axis(block, kept, axis=1)
+            order = np.argsort(kept_violations, axis=1, kind='stable')
+            self.song_smallest_violations[start:end] = np.take_along_axis(
+                kept_violations, order, axis=1)
+            self.song_smallest_scenarios[start:end] = np.take_along_axis(
+                kept, order, axis=1)
+
+    def _streamed_subset_quantile_table(self, chance_instance, partition):
+        """
+        Quantile over subsets of the violations of every (scenario,
+        constraint). The minimum violation of a subset is the first
+        violation of one of its scenarios in the sorted smallest
+        violations, so the quantile is the violation of the (q+1)-th
+        first occurrence of a subset. The rows whose smallest violations
+        do not cover enough subsets are computed in full.
+
+        Returns:
+           table (np.array): big M of every (scenario, constraint).
+        """
+        epsilon = self.chance_instance.get_epsilon()
+        q = int(math.floor(epsilon*self.nb_scenarios)+1)
+        nb_scenarios, nb_kept, nb_constraints = \
+            self.song_smallest_violations.shape
+        partition = Partition.as_partition(partition, nb_scenarios)
+        table = np.zeros((nb_scenarios, nb_constraints))
+        is_covered = np.zeros((nb_scenarios, nb_constraints), dtype=bool)
+        for start in range(0, nb_scenarios, self.song_block_size):
+            end = min(start + self.song_block_size, nb_scenarios)
+            subsets = partition.labels[
+                self.song_smallest_scenarios[start:end]]
+            # First occurrence of each subset: the first of its scenarios
+            # in a stable sort of the subsets
+            order = np.argsort(subsets, axis=1, kind='stable')
+            sorted_subsets = np.take_along_axis(subsets, order, axis=1)
+            is_sorted_first = np.ones(sorted_subsets.shape, dtype=bool)
+            is_sorted_first[:, 1:] = \
+                sorted_subsets[:, 1:] != sorted_subsets[:, :-1]
+            is_first = np.zeros(subsets.shape, dtype=bool)
+            np.put_along_axis(is_first, order, is_sorted_first, axis=1)
+            nb_first = np.cumsum(is_first, axis=1)
+            is_covered[start:end] = nb_first[:, -1] > q
+            quantile_index = np.argmax(nb_first > q, axis=1)[:, None, :]
+            table[start:end] = np.take_along_axis(
+                self.song_smallest_violations[start:end], quantile_index,
+                axis=1)[:, 0, :]
+        # Not enough subsets in the smallest violations: use the full rows
+        scenario_order, subset_offsets = partition.csr()
+        for scenario in np.flatnonzero(~is_covered.all(axis=1)):
+            full_row = compute_violations_block(
+                chance_instance.get_matrices_A(),
+                chance_instance.get_vectors_b(),
+                scenario, scenario+1, nb_threads=self.nb_threads)[0]
+            subset_violations = np.minimum.reduceat(
+                full_row[scenario_order], subset_offsets[:-1], axis=0)
+            is_missing = ~is_covered[scenario]
+            table[scenario, is_missing] = self._quantile_big_m(
+                subset_violations, axis=0)[is_missing]
+        return table
+
+    def _song_big_m_from_stream(self, chance_instance, partition):
+        """Song et al big M's from the streamed smallest violations."""
+        if self.song_smallest_violations is None:
+            self._stream_song_violations(chance_instance)
+        if partition is None:
+            epsilon = self.chance_instance.get_epsilon()
+            q = int(math.floor(epsilon*self.nb_scenarios)+1)
+            table = self.song_smallest_violations[:, q, :]
+        else:
+            table = self._streamed_subset_quantile_table(chance_instance,
+                                                         partition)
+        self._set_big_m_from_table(table, partition)
 
     #   - - - Public methods - - -
     def run_belotti_et_al_big_M(self, vUB,
                                 gap=1e-8,
                                 use_one_thread=True,
-                                verbose=False):
+                                verbose=False,
+                                use_lp_screening=True):
         """
         Applies the big M tightening from:
           Belotti, P., Bonami, P., Fischetti, M., Lodi, A.,
@@ -113,32 +510,13 @@ class BigMFinder(object):
 
         Args:
            vUB (float): upper bound on the objective of the CCLP model.
+           use_lp_screening (bool): only solve the MIPs of binary variables
+              whose LP relaxation bound is positive and not exact.
         """
-        # Check if we have integer variables
-        var_type = self.chance_instance.get_var_type()
-        integer_vars = (sum(var_type == 0) > 0)
-
         print('Running Belotti et al for tightening big M\'s.')
-        # Integer Vars = run MIP
-        if integer_vars:
-            # Initialize optimization model
-            big_m_knapsack_model = BigMKnapsackModel(self.chance_instance, vUB)
-            big_m_knapsack_model.build(verbose=verbose)
-            self._set_gurobi_params(big_m_knapsack_model, gap, use_one_thread)
-            for s in range(self.nb_scenarios):
-                self._print_status(s, self.nb_scenarios)
-                nb_constraints = self.chance_instance.get_nb_constraints(s)
-                for i in range(nb_constraints):
-                    self.bigM[s][i] = self._single_mip_belotti_iter(
-                        big_m_knapsack_model, s, i)
-        else:
-            # Only continuous vars: this is a single-dim knapsack
-            for s in range(self.nb_scenarios):
-                self._print_status(s, self.nb_scenarios)
-                nb_constraints = self.chance_instance.get_nb_constraints(s)
-                for i in range(nb_constraints):
-                    self.bigM[s][i] = self._single_continuous_belotti_iter(
-                        s, i, vUB)
+        table = self._belotti_table(vUB, gap, use_one_thread, verbose,
+                                    use_lp_screening)
+        self._set_big_m_from_table(table, self._get_partition())
 
         # Print average big M value
         avgBigM = np.mean([np.mean(self.bigM[s])
@@ -157,53 +535,18 @@ class BigMFinder(object):
            chance_instance: a non-partitioned chance instance.
         """
         print('Running Song et al for tightening big M\'s.')
-        nb_subsets = self.nb_scenarios
-        nb_constraints_per_scenario = chance_instance.get_nb_constraints(0)
-
-        # - Solve (card(S) * card(I))^2 single-dimensional continuous knapsacks
-        # Note that this is always calculated over scenarios even if
-        # the self.chance_instance is partitioned
-        if self.song_violations is None:
-            print('Calculating all (s, i, s_prime, i_prime) violations.')
-            A_matrices = chance_instance.get_matrices_A()
-            b_vectors = chance_instance.get_vectors_b()
-            # Call Cython function
-            self.song_violations = compute_all_violations(
-                A_matrices, b_vectors)
-
-        # - Take quantile of violations over scenarios or subset
         if isinstance(self.chance_instance, PartitionChanceKnapInstance):
             assert partition is not None
         else:
             assert partition is None
-        for c in range(nb_subsets):
-            nb_constraints = self.chance_instance.get_nb_constraints(c)
-            for j in range(nb_constraints):
-                if isinstance(self.chance_instance,
-                              PartitionChanceKnapInstance):
-                    s = j // nb_constraints_per_scenario  # subset index
-                    scenario = partition[c][s]
-                    constraint = j % nb_constraints_per_scenario
-                else:
-                    scenario = c
-                    constraint = j
-                # Get vector of all violations
-                all_violations = copy(
-                    self.song_violations[scenario, :, constraint])
-                if isinstance(self.chance_instance,
-                              PartitionChanceKnapInstance):
-                    # Aggregate scenarios in subsets if using a partition
-                    violations = np.zeros(len(partition))
-                    for m, subset in enumerate(partition):
-                        violations[m] = min([all_violations[sprime]
-                                             for sprime in subset])
-                else:
-                    violations = all_violations
-                # Get big M as quantile of violations
-                self.bigM[c][j] = self._quantile_big_m(violations)
+        if self.song_block_size is None:
+            self._song_big_m_from_tensor(chance_instance, partition)
+        else:
+            self._song_big_m_from_stream(chance_instance, partition)
 
         # - Print average big M value
-        avgBigM = np.mean([np.mean(self.bigM[s]) for s in range(nb_subsets)])
+        avgBigM = np.mean([np.mean(self.bigM[s])
+                           for s in range(self.nb_scenarios)])
         print('Average bigM value is ', avgBigM)
 
     def get_vector_big_M(self, scenario):
@@ -224,7 +567,10 @@ class BigMFinder(object):
               np.mean([np.mean(self.bigM[s])
                        for s in range(self.nb_scenarios)]))
 
-        if method == "belotti":
+        if method == "belotti" and self.incremental:
+            assert vUB is not None
+            self._update_belotti_big_m_incremental(vUB)
+        elif method == "belotti":
             assert vUB is not None
             self.run_belotti_et_al_big_M(vUB)
         elif method == 'song':
@@ -1,16 +1,51 @@
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from gurobipy import GRB
+
 from src.optim.DeterModel import DeterModel
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.ArtifactCache import ArtifactCache
 from math import floor
 
 
+def _solve_subset_shard(instance_args, subsets, return_duals):
+    """
+    Process pool worker: solve the deterministic models of a shard of
+    subsets with a single persistent model. If the instance uses its
+    binary cache, the constraint matrices are memory-mapped and shared
+    by all the workers.
+    """
+    chance_instance = ChanceKnapInstance(*instance_args)
+    evaluator = Evaluator(chance_instance)
+    evaluator._get_deter_model().grb_model.setParam(GRB.Param.Threads, 1)
+    return [evaluator.subset_cost(subset, return_duals=return_duals)
+            for subset in subsets]
+
+
 class Evaluator():
     """
     Class used to evaluate all deterministic models that may
     be used at several places in the code. For instance, it
     can calculate the cost of a scenario, subset, or partition.
+    By default, a single deterministic model is kept for all the
+    evaluations and only the constraints of the scenarios that change
+    between two subsets are swapped.
+    If nb_workers is larger than 1, the costs of many subsets are
+    computed by a pool of processes that read the instance from its
+    file: the chance instance must not be modified in memory.
     """
+    # Minimum number of subsets evaluated by the process pool
+    MIN_PARALLEL_SUBSETS = 64
 
-    def __init__(self, chance_instance):
+    def __init__(self, chance_instance, use_persistent_model=True,
+                 nb_workers=1):
         self.chance_instance = chance_instance
+        self.use_persistent_model = use_persistent_model
+        self.nb_workers = nb_workers
+        self.deter_model = None
+        # Number of deterministic models solved in this process
+        self.nb_solves = 0
 
     @staticmethod
     def _print_progress(s, nb_s):
@@ -18,30 +53,132 @@ class Evaluator():
         if (p % 10) == 0:
             print('[%d%%] \r' % p, end="")
 
+    def _get_deter_model(self):
+        """
+        Build the persistent deterministic model at the first call.
+        Continuous models are solved with the dual simplex, which
+        starts from the basis of the previous solve after rows are
+        added.
+        """
+        if self.deter_model is None:
+            self.deter_model = DeterModel(self.chance_instance)
+            self.deter_model.build([])
+            if (self.deter_model.grb_var_type == GRB.CONTINUOUS).all():
+                self.deter_model.grb_model.Params.Method = 1
+        return self.deter_model
+
+    def _use_parallel(self, nb_subsets):
+        return ((self.nb_workers > 1)
+                and (nb_subsets >= self.MIN_PARALLEL_SUBSETS))
+
+    def _parallel_subset_costs(self, subsets, return_duals=False):
+        """
+        Solve the deterministic models of the given subsets with a pool
+        of processes. The subsets are split in contiguous shards, one
+        per worker, and the results are returned in the input order.
+
+        Returns:
+            list[float]: optimal objectives
+            list[np.array(float/binary)]: optimal solution variables
+            list[dict]: only if return_duals is True, dual values of
+                the scenarios of each subset
+        """
+        shards = [shard.tolist() for shard in
+                  np.array_split(np.arange(len(subsets)), self.nb_workers)]
+        subset_shards = [[subsets[i] for i in shard] for shard in shards]
+        instance_args = self.chance_instance.get_instance_args()
+        context = multiprocessing.get_context("spawn")
+        subset_results = ([], [], []) if return_duals else ([], [])
+        with ProcessPoolExecutor(max_workers=self.nb_workers,
+                                 mp_context=context) as executor:
+            results = executor.map(_solve_subset_shard,
+                                   [instance_args] * self.nb_workers,
+                                   subset_shards,
+                                   [return_duals] * self.nb_workers)
+            for shard_results in results:
+                for result in shard_results:
+                    for values, value in zip(subset_results, result):
+                        values.append(value)
+        return subset_results
+
+    def _get_subset_model(self, subset):
+        """Returns the deterministic model of the subset, not solved."""
+        if self.use_persistent_model:
+            deterministicModel = self._get_deter_model()
+            deterministicModel.update(subset)
+        else:
+            deterministicModel = DeterModel(self.chance_instance)
+            deterministicModel.build(subset)
+        return deterministicModel
+
+    def _solve_subset_model(self, subset, x_start=None, cost_bound=None):
+        """Returns the solved deterministic model of the subset."""
+        deterministicModel = self._get_subset_model(subset)
+        deterministicModel.warm_start(x_start, cost_bound)
+        deterministicModel.solve()
+        self.nb_solves += 1
+        return deterministicModel
+
     #   - - - Public methods - - -
-    def subset_cost(self, subset):
+    def subset_cost(self, subset, x_start=None, cost_bound=None,
+                    return_duals=False):
         """Solve the deterministic model that satisfies
         all the scenarios in the given subset.
 
         Args:
             subset (list[int]): a (list of) scenario(s)
+            x_start (np.array(float/binary)): optional solution that is
+                feasible for the subset, e.g., the solution of its parent
+            cost_bound (float): optional objective of x_start
+            return_duals (bool): also return the dual values of the
+                scenarios, read after the same solve
 
         Returns:
             float: optimal objective
             np.array(float/binary): optimal solution variables
+            dict: only if return_duals is True, total dual value and
+                minimum rescaled slack of each scenario, None if the
+                model is cut off by the warm start
         """
-        deterministicModel = DeterModel(self.chance_instance)
-        deterministicModel.build(subset)
-        deterministicModel.solve()
-        subset_cost = deterministicModel.get_obj_val()
-        subset_sol = deterministicModel.get_var_x_val()
+        deterministicModel = self._solve_subset_model(subset, x_start,
+                                                      cost_bound)
+        if deterministicModel.grb_model.Status == GRB.CUTOFF:
+            # No solution is better than the warm start
+            subset_cost, subset_sol, scenario_duals = \
+                cost_bound, x_start, None
+        else:
+            subset_cost = deterministicModel.get_obj_val()
+            subset_sol = deterministicModel.get_var_x_val()
+            if return_duals:
+                scenario_duals = deterministicModel.get_scenario_duals()
+        if return_duals:
+            return subset_cost, subset_sol, scenario_duals
         return subset_cost, subset_sol
 
+    def subset_duals(self, subset):
+        """
+        Dual values of the deterministic model of the given subset. The
+        continuous model is solved, binary models only solve their
+        linear relaxation.
+
+        Returns:
+            dict: total dual value and minimum rescaled slack of the
+                constraints of each scenario in the subset
+        """
+        if self.chance_instance.continuous_var:
+            return self._solve_subset_model(subset).get_scenario_duals()
+        deterministicModel = self._get_subset_model(subset)
+        self.nb_solves += 1
+        return deterministicModel.get_scenario_duals()
+
     def scenario_costs(self, scenarios):
         """
         Evaluate the single-scenario cost of
         all the scenarios in the given list.
         """
+        if self._use_parallel(len(scenarios)):
+            subset_costs, _ = self._parallel_subset_costs(list(scenarios))
+            return subset_costs
         subset_costs = []
         for s in scenarios:
             self._print_progress(s, len(scenarios))
@@ -53,13 +190,20 @@ class Evaluator():
         """
         Evaluate the single-scenario cost of
         all the scenarios in the chance instance.
+        The costs are read from the artifact cache if it contains them.
         """
+        cached_costs = ArtifactCache.load(self.chance_instance,
+                                          "scenario-costs")
+        if cached_costs is not None:
+            return cached_costs.tolist()
         nb_scenarios = self.chance_instance.get_nb_scenarios()
         scenarios = range(nb_scenarios)
         scenario_costs = self.scenario_costs(scenarios)
+        ArtifactCache.save(self.chance_instance, "scenario-costs",
+                           scenario_costs)
         return scenario_costs
 
-    def partition_cost(self, partition):
+    def partition_cost(self, partition, return_duals=False):
         """
         Evaluate the subset cost of all the subsets
         in the given partition.
@@ -67,14 +211,17 @@ class Evaluator():
         Returns:
             list[float]: optimal objectives
             list[np.array(float/binary)]: optimal solution variables
+            list[dict]: only if return_duals is True, dual values of
+                the scenarios of each subset
         """
-        subset_costs = []
-        subset_sols = []
+        if self._use_parallel(len(partition)):
+            return self._parallel_subset_costs(partition, return_duals)
+        subset_results = ([], [], []) if return_duals else ([], [])
         count = 0
         for subset in partition:
             self._print_progress(count, len(partition))
             count += 1
-            cost, sol = self.subset_cost(subset)
-            subset_costs.append(cost)
-            subset_sols.append(sol)
-        return subset_costs, subset_sols
+            result = self.subset_cost(subset, return_duals=return_duals)
+            for values, value in zip(subset_results, result):
+                values.append(value)
+        return subset_results
@@ -6,11 +6,12 @@ from src.Evaluator import Evaluator
 
 class Initializer(object):
     """Create initial scenario partition."""
-    def __init__(self, chance_instance, chance_instance_part):
+    def __init__(self, chance_instance, chance_instance_part, nb_workers=1):
         self.chance_instance = chance_instance
         self.chance_instance_part = chance_instance_part
         self.nb_scenarios = chance_instance.get_nb_scenarios()
-        self.evaluator = Evaluator(self.chance_instance)
+        self.evaluator = Evaluator(self.chance_instance,
+                                   nb_workers=nb_workers)
 
     #   - - - Private methods - - -
     @staticmethod
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    In-memory cache of at most max_size items. When it is full, the
+    least recently used item is removed. The hits and misses of get
+    are counted.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.nb_hits = 0
+        self.nb_misses = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    #   - - - Public methods - - -
+    def get(self, key, default=None):
+        """Returns the item of the key and marks it as recently used."""
+        if key not in self.items:
+            self.nb_misses += 1
+            return default
+        self.nb_hits += 1
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        """Store an item and remove the least recently used if full."""
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+        self.nb_hits = 0
+        self.nb_misses = 0
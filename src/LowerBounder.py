@@ -32,25 +32,10 @@ class LowerBounder():
         Returns:
            scenario_violation (list[float]): the violation for every scenario
         """
-        scenario_violation = np.zeros(self.nb_scenarios)
-        for s in range(self.nb_scenarios):
-            # Compute violation
-            nb_constraints = self.chance_instance.get_nb_constraints(s)
-            A = self.chance_instance.get_matrix_A(s)
-            b = self.chance_instance.get_vector_b(s)
-            for i in range(nb_constraints):
-                violation = max(A[i, :].dot(self.xUB) - b[i], 0)
-                # Rescale violation
-                TOLERANCE = 1e-3
-                if violation < TOLERANCE:
-                    violation = 0
-                rescaling = np.linalg.norm(A[i, :])
-                if rescaling != 0:
-                    violation = violation/rescaling
-                # Find maximum violation over all scenarios
-                scenario_violation[s] = max(
-                    scenario_violation[s], violation)
-        return scenario_violation
+        TOLERANCE = 1e-3
+        evaluation = self.chance_instance.evaluate_solution(self.xUB)
+        # Find maximum rescaled violation over all constraints
+        return evaluation.get_rescaled_violations(TOLERANCE).max(axis=1)
 
     def _get_index_scenarios(self):
         """
@@ -100,22 +85,20 @@ class LowerBounder():
         """
         # Calculate the objective of all incumbent solutions
         vector_c = self.chance_instance.get_vector_c()
-        objList = np.matmul(np.array(incumbents), vector_c)
+        incumbents = np.array(incumbents)
+        objList = np.matmul(incumbents, vector_c)
         # Sort objective in decreasing order
         decreasing_indices = np.argsort(-objList)
         # Find which incumbents improved vLB while being lower than vUB
         TOL = 1e-8
         isImproving = (objList <= vUB) * (objList >= (vLB + TOL))
-        for i in decreasing_indices:
-            if isImproving[i]:
-                obj = objList[i]
-                x = incumbents[i]
-                isFeasible = self.chance_instance.is_feasible(x)[0]
-                if isFeasible:
-                    # Found a new, improving feasible solution:
-                    #    No need to continue since we sorted the
-                    #    objectives in decreasing order
-                    return True, x, obj
+        candidates = decreasing_indices[isImproving[decreasing_indices]]
+        # Evaluate all improving candidates in batch: the first feasible
+        #    candidate is the best since we sorted the objectives in
+        #    decreasing order
+        i = self.chance_instance.find_first_feasible(incumbents[candidates])
+        if i is not None:
+            return True, incumbents[candidates[i]], objList[candidates[i]]
         return False, None, None
 
     def _solve_deter_model(self, scenarios):
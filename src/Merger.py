@@ -1,4 +1,4 @@
-import numpy as np
+from src.Partition import Partition
 
 
 class Merger():
@@ -11,28 +11,17 @@ class Merger():
     #   - - - Private methods - - -
     def _single_subset_margin(self, c, xUB):
         """
-        Measure the constraint satisfaction margin
-        for each subset/constraint.
+        Measure the rescaled constraint satisfaction margin of a subset:
+        the minimum over all the constraints of its scenarios.
         """
-        nb_constraints = self.chance_instance_part.get_nb_constraints(c)
-        A = self.chance_instance_part.get_matrix_A(c)
-        b = self.chance_instance_part.get_vector_b(c)
-        subset_margin = np.inf
-        for i in range(nb_constraints):
-            temp_margin = b[i] - A[i, :].dot(xUB)
-            # Rescale margin
-            rescaling = np.linalg.norm(A[i, :])
-            if rescaling != 0:
-                temp_margin = temp_margin/rescaling
-            # Find minimum margin over all constraints
-            subset_margin = min(temp_margin, subset_margin)
-        return subset_margin
+        evaluation = self.chance_instance.evaluate_solution(xUB)
+        return evaluation.get_min_rescaled_slack(
+            self.chance_instance_part.partition[c])
 
     def _delete_subsets(self, partition):
         """Delete the right subsets from list of subsets"""
-        sorted_subsets = np.sort(self.deleted_subsets)[::-1]
-        for c in sorted_subsets:
-            del partition[c]
+        partition = Partition.as_partition(partition)
+        partition.delete_subsets(self.deleted_subsets)
         return partition
 
     def _merge_two_subsets_in_partition(self, partition, c1, c2):
@@ -0,0 +1,133 @@
+import numpy as np
+
+
+class Partition():
+    """
+    Partition of the scenarios in subsets, used as a list of lists of
+    scenarios. The label of the subset of each scenario is stored in an
+    array, so that splits and merges only relabel the scenarios of the
+    changed subsets and per-subset counts and sums are vectorized.
+    The scenarios ordered by subset and the offsets of the subsets in
+    this order, as in a CSR matrix, are computed when needed.
+    The lists of scenarios are replaced and never changed in place: a
+    copy of the partition shares them and is cheap.
+    """
+
+    def __init__(self, subsets=(), nb_scenarios=None):
+        self.subsets = [list(subset) for subset in subsets]
+        if nb_scenarios is None:
+            nb_scenarios = 1 + max((max(subset) for subset in self.subsets
+                                    if len(subset) > 0), default=-1)
+        # Label of the subset of each scenario, -1 if it has none
+        self.labels = np.full(nb_scenarios, -1, dtype=int)
+        for c, subset in enumerate(self.subsets):
+            self.labels[subset] = c
+        self._csr = None
+
+    def __len__(self):
+        return len(self.subsets)
+
+    def __iter__(self):
+        return iter(self.subsets)
+
+    def __getitem__(self, c):
+        return self.subsets[c]
+
+    def __setitem__(self, c, scenarios):
+        """Replace the scenarios of subset c."""
+        old_scenarios = np.asarray(self.subsets[c], dtype=int)
+        old_scenarios = old_scenarios[self.labels[old_scenarios] == c]
+        self.labels[old_scenarios] = -1
+        self.subsets[c] = list(scenarios)
+        self.labels[self.subsets[c]] = c
+        self._csr = None
+
+    def __delitem__(self, c):
+        self.delete_subsets([c])
+
+    def __eq__(self, other):
+        if not isinstance(other, (Partition, list)):
+            return NotImplemented
+        return [list(subset) for subset in self] == \
+            [list(subset) for subset in other]
+
+    def __repr__(self):
+        return repr(self.subsets)
+
+    #   - - - Public methods - - -
+    @staticmethod
+    def as_partition(partition, nb_scenarios=None):
+        """Returns the partition, or a new partition of the subsets."""
+        if isinstance(partition, Partition):
+            return partition
+        return Partition(partition, nb_scenarios=nb_scenarios)
+
+    def append(self, scenarios):
+        """Add a new subset of scenarios at the end of the partition."""
+        self.subsets.append(list(scenarios))
+        self.labels[self.subsets[-1]] = len(self.subsets) - 1
+        self._csr = None
+
+    def delete_subsets(self, subsets):
+        """
+        Delete the given subsets at once: the other subsets keep their
+        order and are relabeled with a single pass on the labels.
+        """
+        is_deleted = np.zeros(len(self.subsets), dtype=bool)
+        is_deleted[list(subsets)] = True
+        new_labels = np.cumsum(~is_deleted) - 1
+        new_labels[is_deleted] = -1
+        has_subset = self.labels >= 0
+        self.labels[has_subset] = new_labels[self.labels[has_subset]]
+        self.subsets = [subset for c, subset in enumerate(self.subsets)
+                        if not is_deleted[c]]
+        self._csr = None
+
+    def copy(self):
+        """Snapshot of the partition that shares the lists of scenarios."""
+        partition = Partition.__new__(Partition)
+        partition.subsets = list(self.subsets)
+        partition.labels = self.labels.copy()
+        partition._csr = self._csr
+        return partition
+
+    def sizes(self):
+        """Returns the number of scenarios of each subset."""
+        return np.array([len(subset) for subset in self.subsets], dtype=int)
+
+    def csr(self):
+        """
+        Returns:
+            np.array(int): scenarios ordered by subset
+            np.array(int): offset of each subset in the ordered
+                scenarios, followed by the number of scenarios
+        """
+        if self._csr is None:
+            offsets = np.zeros(len(self.subsets) + 1, dtype=int)
+            np.cumsum(self.sizes(), out=offsets[1:])
+            order = np.fromiter((s for subset in self.subsets
+                                 for s in subset),
+                                dtype=int, count=offsets[-1])
+            self._csr = (order, offsets)
+        return self._csr
+
+    def count(self, scenarios):
+        """Returns the number of the given scenarios in each subset."""
+        scenarios = np.asarray(scenarios, dtype=int)
+        labels = self.labels[scenarios[scenarios < len(self.labels)]]
+        return np.bincount(labels[labels >= 0], minlength=len(self))
+
+    def subset_sum(self, values):
+        """Returns the sum of the values of the scenarios of each subset."""
+        values = np.asarray(values)
+        has_subset = self.labels >= 0
+        sums = np.bincount(self.labels[has_subset],
+                           weights=values[:len(self.labels)][has_subset],
+                           minlength=len(self))
+        return sums.astype(values.dtype)
+
+    def subset_min(self, values):
+        """Returns the min of the values of the scenarios of each subset."""
+        order, offsets = self.csr()
+        assert (np.diff(offsets) > 0).all()
+        return np.minimum.reduceat(np.asarray(values)[order], offsets[:-1])
@@ -9,6 +9,8 @@ class UpperBounder():
     e.g., the quantile bound of Ahmed et al, or the upper bound
     obtained from solving a partitioned problem.
     """
+    # Subsets whose cost is below vLB - PRUNE_TOL are pruned
+    PRUNE_TOL = 1e-3
 
     def __init__(self, chance_instance_part, split_method,
                  initial_partition_type):
@@ -79,7 +81,8 @@ class UpperBounder():
 
     def partition_bound(self, adaptivePartitioner, subset_costs,
                         vLB, zUB, deleted_subsets, bigMFinder,
-                        real_time_left, use_big_M, use_lazy):
+                        real_time_left, use_big_M, use_lazy,
+                        cclp_model=None):
         """
         Get upper bound by solving partitioned chance-constrained
         problem.
@@ -96,6 +99,8 @@ class UpperBounder():
             real_time_left (float): in seconds
             use_big_M (bool): whether to use big M or Gurobi indicator
                               constrainst
+            cclp_model (PartitionCCLPModel): persistent model of the
+                                             partitioned problem, if any
 
         Returns:
             np.array(float/binary): optimal solution
@@ -108,8 +113,8 @@ class UpperBounder():
         z_start = self.warmstarter.get_z_start(zUB, deleted_subsets)
 
         # Pruning: find subsets whose indicator can be fixed to 0
-        TOL = 1e-3
-        prune_indices = np.where(np.array(subset_costs) <= (vLB - TOL))[0]
+        prune_indices = np.where(
+            np.array(subset_costs) <= (vLB - self.PRUNE_TOL))[0]
 
         # Solve lower-bound partitioned problem and get solution and cost
         x, z, v_obj, v_bnd = adaptivePartitioner.solve_cclp_model(
@@ -120,7 +125,8 @@ class UpperBounder():
             gap=1e-8,
             use_big_M=use_big_M,
             use_lazy=use_lazy,
-            verbose=True)
+            verbose=True,
+            cclp_model=cclp_model)
 
         # - Sanity check -
         self._check_results(x, v_obj, adaptivePartitioner)
@@ -11,6 +11,7 @@ class Warmstarter():
         and set their z_start to 1.
         """
         count = 0
+        deleted_subsets = set(deleted_subsets)
         for i, z in enumerate(zUB):
             if i not in deleted_subsets:
                 if (z == 1):
@@ -1,5 +1,6 @@
 import csv
 import os
+import numpy as np
 
 
 class ChanceInstance():
@@ -18,6 +19,50 @@ class ChanceInstance():
         else:
             raise NotImplementedError
 
+    def _get_cache_location(self):
+        """
+        Returns the folder of the binary cache of the instance file:
+        it is stored next to the file with the extension ".npcache".
+        """
+        return os.path.splitext(self.file_location)[0] + ".npcache"
+
+    def _get_cache_file(self, name):
+        return os.path.join(self._get_cache_location(), name + ".npy")
+
+    def _is_cache_fresh(self, header_name="header"):
+        """
+        The cache is fresh if its header exists and was written
+        after the last modification of the instance file.
+        The header is written last, so that a complete cache
+        always has a header.
+        """
+        header_file = self._get_cache_file(header_name)
+        if not os.path.exists(header_file):
+            return False
+        return (os.path.getmtime(header_file)
+                >= os.path.getmtime(self.file_location))
+
+    def _save_cache_array(self, name, array):
+        """
+        Atomically write an array of the cache: write to a temporary
+        file and replace the target, so that concurrent runs on the same
+        instance never read a partially written file.
+        """
+        target_file = self._get_cache_file(name)
+        temp_file = target_file + "." + str(os.getpid()) + ".tmp"
+        with open(temp_file, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(temp_file, target_file)
+
+    def _load_cache_array(self, name, mmap_mode=None):
+        """
+        Read an array of the cache. Large arrays should be memory-mapped
+        with mmap_mode="c": pages are then shared between all processes
+        that read the same instance.
+        """
+        return np.asarray(np.load(self._get_cache_file(name),
+                                  mmap_mode=mmap_mode))
+
     #   - - - Public methods - - -
     def read_data(self):
         """Read the file using the csv package"""
@@ -1,17 +1,34 @@
+import os
 import numpy as np
+from collections import OrderedDict
 
 from src.instance.ChanceInstance import ChanceInstance
+from src.instance.SolutionEvaluation import SolutionEvaluation
 
 
 class ChanceKnapInstance(ChanceInstance):
     """Multi-dimensional knapsack instance."""
+    # Maximum number of constraint evaluations held in memory when
+    # checking the feasibility of several solutions at once
+    MAX_BATCH_EVALUATIONS = 2**24
+    # Number of solutions whose constraint evaluation is kept in memory
+    NB_SAVED_EVALUATIONS = 4
 
-    def __init__(self, file_location, continuous_var, epsilon):
+    def __init__(self, file_location, continuous_var, epsilon,
+                 use_cache=False):
         super(ChanceKnapInstance, self).__init__(file_location)
         self.epsilon = epsilon
         self.continuous_var = continuous_var
-        self.read_data()
-        self.parse_data()
+        self.use_cache = use_cache
+        if use_cache and self._is_cache_fresh():
+            self.read_cache()
+        else:
+            self.read_data()
+            self.parse_data()
+            if use_cache:
+                self.write_cache()
+        self.row_norms = self._compute_row_norms()
+        self.solution_evaluations = OrderedDict()
 
     #   - - - Private methods - - -
     def _parse_indices(self):
@@ -58,53 +75,78 @@ class ChanceKnapInstance(ChanceInstance):
             self.var_lb = np.full(self.nb_vars, -float('inf'))
             self.var_ub = np.full(self.nb_vars, float('inf'))
 
-    @staticmethod
-    def _get_constraint_violation(A_si, var_x, b_si):
+    def _compute_row_norms(self):
+        """
+        Compute the norm of every constraint row, used to rescale
+        constraint violations. Rows with zero norm are not rescaled.
         """
-        Calculate the amount by which the variable var_x
-        violates the single constraint:
-                A_si * var_x <= b_si
+        row_norms = np.linalg.norm(self.matrices_A, axis=2)
+        row_norms[row_norms == 0] = 1.0
+        return row_norms
+
+    def _get_scenario_infeasibility(self, var_x_val):
+        """Measure the constraint violation for each scenario/constraint.
+
+        Returns:
+            np.array(float): array of shape (nb_scenarios, nb_constraints)
+                with the rescaled violation of each constraint, and zero
+                for constraints violated by less than the tolerance.
         """
-        return max(A_si.dot(var_x) - b_si, 0)
+        TOLERANCE = 1e-6
+        evaluation = self.evaluate_solution(var_x_val)
+        return evaluation.get_rescaled_violations(TOLERANCE)
 
     @staticmethod
-    def _is_scenario_infeasible(scenario_infeasibility):
+    def _get_infeasible_scenarios(scenario_infeasibility):
         """
-        A scenario is infeasible if at least one of
-        its constraint is violated.
+        Return boolean array: True if scenario infeasible, i.e.,
+        at least one of its constraints is violated.
         """
-        if len(scenario_infeasibility) > 0:
-            return True
-        else:
-            return False
-
-    def _get_scenario_infeasibility(self, var_x_val):
-        """Measure the constraint violation for each scenario/constraint."""
-        scenario_infeasibility = dict()
-        # Iterate over every scenario/constraint and check for feasibility
-        for s in range(self.nb_scenarios):
-            scenario_infeasibility[s] = []
-            for i in range(self.nb_constraints[s]):
-                violation = self._get_constraint_violation(
-                    self.matrices_A[s, i, :], var_x_val, self.vectors_b[s, i])
-                TOLERANCE = 1e-6
-                # Only add violation if larger than tolerance
-                if violation > TOLERANCE:
-                    rescaling = np.linalg.norm(self.matrices_A[s, i, :])
-                    if rescaling != 0:
-                        violation = violation/rescaling
-                    scenario_infeasibility[s].append(violation)
-        return scenario_infeasibility
-
-    def _get_infeasible_scenarios(self, scenario_infeasibility):
-        """Return boolean flag: True if scenario infeasible."""
-        is_scenario_infeasible = []
-        for s in range(self.nb_scenarios):
-            is_scenario_infeasible.append(self._is_scenario_infeasible(
-                scenario_infeasibility[s]))
-        return is_scenario_infeasible
+        return (scenario_infeasibility > 0).any(axis=1)
 
     #   - - - Public methods - - -
+    def get_instance_args(self):
+        """
+        Arguments to load the instance again, e.g., in the workers of a
+        process pool: they read the binary cache if it is used.
+        """
+        return (self.file_location, self.continuous_var, self.epsilon,
+                self.use_cache)
+
+    def write_cache(self):
+        """
+        Write the parsed instance data to a binary cache next to the
+        instance file. Failing to write the cache, e.g., in a read-only
+        folder, is not an error: the csv file is simply parsed again
+        in the next run.
+        """
+        try:
+            os.makedirs(self._get_cache_location(), exist_ok=True)
+            self._save_cache_array("vector_c", self.vector_c)
+            self._save_cache_array("matrices_A", self.matrices_A)
+            self._save_cache_array("vectors_b", self.vectors_b)
+            self._save_cache_array("proba", self.proba)
+            # Header: nb_vars, nb_constraints, nb_scenarios
+            self._save_cache_array("header", self.instance_info)
+        except OSError:
+            print('Warning: could not write binary cache of instance',
+                  self.file_location)
+
+    def read_cache(self):
+        """
+        Read the instance data from its binary cache. The constraint
+        matrices are memory-mapped instead of being read in memory.
+        """
+        self.instance_info = self._load_cache_array("header")
+        self.nb_vars = int(self.instance_info[0])
+        self.nb_scenarios = int(self.instance_info[2])
+        self._parse_additional_parameters()
+        self.vector_c = self._load_cache_array("vector_c")
+        self.matrices_A = self._load_cache_array("matrices_A",
+                                                 mmap_mode="c")
+        self.vectors_b = self._load_cache_array("vectors_b")
+        self.proba = self._load_cache_array("proba")
+
     def is_feasible(self, var_x_val):
         """
         Process the given point x_var. Determines if it is feasible
@@ -116,12 +158,78 @@ class ChanceKnapInstance(ChanceInstance):
         is_scenario_infeasible = self._get_infeasible_scenarios(
             scenario_infeasibility)
         # Check feasiblity using amount of infeasible scenarios
-        nb_infeasible_scenarios = np.sum(is_scenario_infeasible)
+        nb_infeasible_scenarios = int(np.count_nonzero(
+            is_scenario_infeasible))
         nb_scen_tolerance = self.epsilon*self.nb_scenarios
         sol_is_feasible = nb_infeasible_scenarios <= nb_scen_tolerance
         return (sol_is_feasible, nb_infeasible_scenarios, nb_scen_tolerance,
                 is_scenario_infeasible, scenario_infeasibility)
 
+    def evaluate_solution(self, var_x_val):
+        """
+        Returns the evaluation of all scenario constraints for the given
+        solution. The evaluations of the last few solutions are saved,
+        so that the constraints are evaluated only once per solution even
+        if several components measure its feasibility.
+
+        Returns:
+            SolutionEvaluation: slacks of all scenario constraints
+        """
+        key = np.asarray(var_x_val, dtype=float).tobytes()
+        if key in self.solution_evaluations:
+            self.solution_evaluations.move_to_end(key)
+        else:
+            self.solution_evaluations[key] = SolutionEvaluation(
+                self, var_x_val)
+            if len(self.solution_evaluations) > self.NB_SAVED_EVALUATIONS:
+                self.solution_evaluations.popitem(last=False)
+        return self.solution_evaluations[key]
+
+    def count_infeasible_scenarios(self, candidate_sols):
+        """
+        Count the infeasible scenarios of several solutions at once:
+        the constraints of all scenarios are evaluated for all solutions
+        with a single product of tensors.
+
+        Args:
+            candidate_sols (np.array): matrix of shape
+                (nb_candidates, nb_vars), one solution per row
+
+        Returns:
+            np.array(int): number of infeasible scenarios of each solution
+        """
+        TOLERANCE = 1e-6
+        candidate_sols = np.asarray(candidate_sols, dtype=float)
+        nb_constraints = self.nb_constraints[0]
+        A = self.matrices_A.reshape((self.nb_scenarios * nb_constraints,
+                                     self.nb_vars))
+        lhs = (candidate_sols @ A.T).reshape(
+            (len(candidate_sols), self.nb_scenarios, nb_constraints))
+        is_violated = (lhs - self.vectors_b) > TOLERANCE
+        return np.count_nonzero(is_violated.any(axis=2), axis=1)
+
+    def find_first_feasible(self, candidate_sols):
+        """
+        Find the first solution in the given list that is feasible for
+        the chance-constrained problem. The solutions are evaluated in
+        chunks to bound memory use, and the search stops at the first
+        chunk that contains a feasible solution.
+
+        Returns:
+            int: index of the first feasible solution, None if none is
+        """
+        nb_candidates = len(candidate_sols)
+        nb_evaluations = self.nb_scenarios * self.nb_constraints[0]
+        chunk_size = max(1, self.MAX_BATCH_EVALUATIONS // nb_evaluations)
+        nb_scen_tolerance = self.epsilon*self.nb_scenarios
+        for start in range(0, nb_candidates, chunk_size):
+            chunk = np.asarray(candidate_sols[start:start+chunk_size])
+            nb_infeasible_scenarios = self.count_infeasible_scenarios(chunk)
+            is_feasible = nb_infeasible_scenarios <= nb_scen_tolerance
+            if is_feasible.any():
+                return start + int(np.argmax(is_feasible))
+        return None
+
     def check_feasibility(self, var_x_val):
         """
         Checks the feasibility of a given solution,
@@ -132,15 +240,11 @@ class ChanceKnapInstance(ChanceInstance):
          nb_scen_tolerance, is_scenario_infeasible,
          scenario_infeasibility) = self.is_feasible(var_x_val)
         self.is_scenario_infeasible = is_scenario_infeasible
-        self.infeasible_scenarios = [
-            i for i, x in enumerate(is_scenario_infeasible) if x]
-
-        # Get total violation of a scenario
-        self.max_infeasibility_scenarios = np.zeros(self.nb_scenarios)
-        for s in range(self.nb_scenarios):
-            if len(scenario_infeasibility[s]) > 0:
-                self.max_infeasibility_scenarios[s] = np.max(
-                    scenario_infeasibility[s])
+        self.infeasible_scenarios = np.flatnonzero(
+            is_scenario_infeasible).tolist()
+
+        # Get maximum violation of a scenario
+        self.max_infeasibility_scenarios = scenario_infeasibility.max(axis=1)
 
         # Print summary of feasibility
         print('\n Checking feasibility of upper bound solution:')
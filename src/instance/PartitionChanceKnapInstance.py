@@ -1,6 +1,7 @@
 import numpy as np
 
 from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.Partition import Partition
 
 
 class PartitionChanceKnapInstance(ChanceKnapInstance):
@@ -13,16 +14,15 @@ class PartitionChanceKnapInstance(ChanceKnapInstance):
     #   - - - Public methods - - -
     def load_partition(self, nb_subsets, partition):
         """Setup instance with the input partition."""
+        assert nb_subsets == len(partition)
         self.nb_subsets = nb_subsets
-        self.partition = partition
+        self.partition = Partition.as_partition(partition,
+                                                len(self.nb_constraints))
         # Read the number of constraints: the sum over all the scenarios'
-        self.nb_constraints_part = np.array(
-            [self.nb_constraints[partition[subset]].sum()
-             for subset in range(nb_subsets)])
+        self.nb_constraints_part = self.partition.subset_sum(
+            self.nb_constraints)
         # Read probability of each subset: the min of its scenarios' proba
-        self.proba_part = np.array(
-            [self.proba[partition[subset]].min()
-             for subset in range(nb_subsets)])
+        self.proba_part = self.partition.subset_min(self.proba)
         # Normalize probability of all subsets to sum to 1
         total_proba = np.sum(self.proba_part)
         self.proba_part = self.proba_part/total_proba
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class SolutionEvaluation():
+    """
+    Evaluate the constraints of all scenarios for a single solution.
+    The slacks b - A x are computed once and are then shared by all the
+    components that measure the feasibility of the solution, e.g.,
+    the feasibility check, the lower-bound projection, and the merger.
+    """
+
+    def __init__(self, chance_instance, var_x_val):
+        A = chance_instance.get_matrices_A()
+        b = chance_instance.get_vectors_b()
+        # Slack of every (scenario, constraint): b - A x
+        self.slacks = b - A @ np.asarray(var_x_val, dtype=float)
+        # Slacks rescaled by the norm of the constraint rows
+        self.rescaled_slacks = self.slacks / chance_instance.row_norms
+
+    #   - - - Public methods - - -
+    def get_rescaled_violations(self, tolerance):
+        """
+        Returns the rescaled violation of every (scenario, constraint),
+        and zero for constraints violated by less than the tolerance.
+        """
+        is_violated = -self.slacks > tolerance
+        return np.where(is_violated, -self.rescaled_slacks, 0.0)
+
+    def get_min_rescaled_slack(self, scenarios):
+        """
+        Returns the minimum rescaled slack over all the constraints of
+        the given scenarios, i.e., the margin to the feasible region.
+        """
+        return self.rescaled_slacks[scenarios].min()
@@ -8,7 +8,12 @@ class AccObjModel(OptiModel):
     """
     Single-level optimization problem
     to minimize the maximum subset cost post-refinement.
+    The left and right subsets are symmetric: the first infeasible
+    scenario is always assigned to the left subset.
     """
+    # Relative tolerance of the cutoff, so that splits whose cost is
+    # equal to the cutoff are kept
+    CUTOFF_TOL = 1e-6
 
     def __init__(self, chance_instance, scenarios, infeasible_scenarios):
         super().__init__(chance_instance, "AccObjModel")
@@ -139,6 +144,14 @@ class AccObjModel(OptiModel):
                             for s in range(self.nb_scenarios)
                             if scenarios[s] in infeasible_scenarios) >= 1)
 
+    def _add_symmetry_breaking_constraints(self, scenarios,
+                                           infeasible_scenarios):
+        """Assign the first infeasible scenario to the left subset."""
+        for s in range(self.nb_scenarios):
+            if scenarios[s] in infeasible_scenarios:
+                self.grb_model.addConstr(self.left_var_pi[s] == 1)
+                return
+
     #   - - - Public methods - - -
     def build(self, verbose=False):
         """Build the Gurobi model: add all variables and constraints."""
@@ -154,6 +167,36 @@ class AccObjModel(OptiModel):
         self._add_dual_feasibility_constraints(self.scenarios)
         self._add_assignment_constraints(self.scenarios,
                                          self.infeasible_scenarios)
+        self._add_symmetry_breaking_constraints(self.scenarios,
+                                                self.infeasible_scenarios)
+
+    def warm_start(self, left_subset):
+        """
+        MIP start from a heuristic split of the scenarios. The subsets
+        are swapped if needed to satisfy the symmetry breaking.
+        """
+        left_subset = set(left_subset)
+        is_left = [s in left_subset for s in self.scenarios]
+        first_infeasible = next(i for i, s in enumerate(self.scenarios)
+                                if s in self.infeasible_scenarios)
+        if not is_left[first_infeasible]:
+            is_left = [not left for left in is_left]
+        for s in range(self.nb_scenarios):
+            self.left_var_pi[s].Start = 1.0 * is_left[s]
+            self.right_var_pi[s].Start = 1.0 - is_left[s]
+
+    def set_cutoff(self, cutoff):
+        """
+        Stop the solve as soon as no split can have a maximum subset
+        cost below cutoff. The best split found so far is kept.
+        """
+        self.grb_model.setParam(
+            GRB.Param.BestBdStop,
+            cutoff + self.CUTOFF_TOL*max(1.0, abs(cutoff)))
+
+    def is_cut_off(self):
+        """True if no split has a cost below the cutoff."""
+        return self.grb_model.Status == GRB.USER_OBJ_LIMIT
 
     def get_subsets(self):
         """Read assignment of solved model."""
@@ -21,14 +21,19 @@ class BigMKnapsackModel(OptiModel):
     using sorting operations.
     """
 
-    def __init__(self, chance_instance, vUB):
-        super().__init__(chance_instance, "BigMKnapsackModel")
+    def __init__(self, chance_instance, vUB, use_matrix_api=True):
+        super().__init__(chance_instance, "BigMKnapsackModel",
+                         use_matrix_api=use_matrix_api)
         self.vUB = vUB
 
     def _initialize_knapsack_ub(self):
         """Creates the upper bound knapsack constraint."""
         nb_vars = self.chance_instance.get_nb_vars()
         c = self.chance_instance.get_vector_c()
+        if self.use_matrix_api:
+            self.knapsack_ub_constraint = self.grb_model.addConstr(
+                c @ self.mvar_x <= self.vUB)
+            return
         lhs = gp.quicksum(c[j]*self.var_x[j] for j in range(nb_vars))
         self.knapsack_ub_constraint = self.grb_model.addConstr(
             lhs <= self.vUB)
@@ -39,11 +44,22 @@ class BigMKnapsackModel(OptiModel):
         Create the objective function:
         maximize violation of constraint (s,i).
         """
-        nb_vars = self.chance_instance.get_nb_vars()
         A = self.chance_instance.get_matrix_A(s)
         b = self.chance_instance.get_vector_b(s)
-        grb_objective = gp.quicksum(A[i, j]*self.var_x[j]
-                                    for j in range(nb_vars)) - b[i]
+        self.initialize_row_violation_objective(A[i, :], b[i])
+
+    def initialize_row_violation_objective(self, a, b_i):
+        """
+        Create the objective function:
+        maximize violation of constraint a x <= b_i.
+        """
+        if self.use_matrix_api:
+            self.obj = self.grb_model.setObjective(a @ self.mvar_x - b_i,
+                                                   GRB.MAXIMIZE)
+            return
+        nb_vars = self.chance_instance.get_nb_vars()
+        grb_objective = gp.quicksum(a[j]*self.var_x[j]
+                                    for j in range(nb_vars)) - b_i
         self.obj = self.grb_model.setObjective(grb_objective, GRB.MAXIMIZE)
 
     def build(self, verbose=False):
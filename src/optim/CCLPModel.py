@@ -6,8 +6,9 @@ from src.optim.OptiModel import OptiModel
 
 class CCLPModel(OptiModel):
     """Create and solve a CCLP model."""
-    def __init__(self, chance_instance, bigMFinder):
-        super().__init__(chance_instance, "CCLP")
+    def __init__(self, chance_instance, bigMFinder, use_matrix_api=True):
+        super().__init__(chance_instance, "CCLP",
+                         use_matrix_api=use_matrix_api)
         self.bigMFinder = bigMFinder
 
     #   - - - Private methods - - -
@@ -40,19 +41,41 @@ class CCLPModel(OptiModel):
 
     def _add_all_indicator_constraints(self):
         """Adds all indicator constraints to the gurobi model."""
+        if self.use_matrix_api:
+            self.ind_constraints = self._add_matrix_indicator_constraints(
+                range(self.nb_scenarios))
+            return
         # Loop over all scenarios and call
         # the private function to add the constraints
         self.ind_constraints = dict()
         for s in range(self.nb_scenarios):
             self.ind_constraints[s] = self._add_indicator_constraint(s)
 
+    def _add_matrix_indicator_constraints(self, scenarios):
+        """
+        Adds the indicator constraints of the given scenarios at once
+        with the matrix API: each stacked row is indicated by the z
+        variable of its scenario.
+
+        Returns:
+            dict: constraints of each scenario, by constraint index
+        """
+        A, b, row_scenarios, row_indices = self._stack_scenario_data(
+            scenarios)
+        ind_constraints = {s: dict() for s in scenarios}
+        if len(b) > 0:
+            constraints = self.grb_model.addGenConstrIndicator(
+                self.mvar_z[row_scenarios], True, A @ self.mvar_x <= b)
+            self._split_constraints(constraints, range(len(b)),
+                                    row_scenarios, row_indices,
+                                    ind_constraints)
+        return ind_constraints
+
     #   - - - Public methods - - -
     def get_var_z_val(self):
         """Returns the values of the z indicator variables."""
-        scenarios = range(self.nb_scenarios)
-        var_z_val = np.array([self.var_z[s].getAttr(GRB.Attr.X)
-                              for s in scenarios])
-        return var_z_val
+        return np.array(self.grb_model.getAttr(GRB.Attr.X,
+                                               self.var_z.values()))
 
     def fix_z_to_zero(self, s):
         """
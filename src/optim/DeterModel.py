@@ -1,11 +1,17 @@
+import numpy as np
+from gurobipy import GRB
+
 from src.optim.OptiModel import OptiModel
 
 
 class DeterModel(OptiModel):
     """Create and solve a deterministic model."""
+    # Relative tolerance of the cutoff of warm-started MIPs
+    CUTOFF_TOL = 1e-6
 
-    def __init__(self, chance_instance):
-        super().__init__(chance_instance, "DeterModel")
+    def __init__(self, chance_instance, use_matrix_api=True):
+        super().__init__(chance_instance, "DeterModel",
+                         use_matrix_api=use_matrix_api)
 
     #   - - - Private methods - - -
     def _add_constraints(self, scenario):
@@ -19,6 +25,23 @@ class DeterModel(OptiModel):
                 lhs <= b[i])
         return feasibility_constraint
 
+    def _add_matrix_constraints(self, scenarios):
+        """
+        Add the feasibility constraints of all the given scenarios at
+        once with the matrix API.
+        """
+        if scenarios.__class__ != list:
+            scenarios = [scenarios]
+        A, b, row_scenarios, row_indices = self._stack_scenario_data(
+            scenarios)
+        for s in scenarios:
+            self.feasibility_constraint[s] = dict()
+        if len(b) > 0:
+            constraints = self.grb_model.addConstr(A @ self.mvar_x <= b)
+            self._split_constraints(constraints, range(len(b)),
+                                    row_scenarios, row_indices,
+                                    self.feasibility_constraint)
+
     def _remove_feasibility_constraints(self, s: int):
         """
         Remove all the feasibility constraints linked to scenario s.
@@ -26,10 +49,8 @@ class DeterModel(OptiModel):
         Args:
             s (int): scenario index
         """
-        nb_constraints = self.chance_instance.get_nb_constraints(s)
-        for i in range(nb_constraints):
-            constraint = self.feasibility_constraint[s][i]
-            self.grb_model.remove(constraint)
+        constraints = self.feasibility_constraint.pop(s)
+        self.grb_model.remove(list(constraints.values()))
 
     #   - - - Public methods - - -
     def build(self, scenarios, verbose=False):
@@ -47,7 +68,9 @@ class DeterModel(OptiModel):
         Add the constraints of given subset(s)/scenario(s).
         The input can be a list or an integer.
         """
-        if scenarios.__class__ == list:
+        if self.use_matrix_api:
+            self._add_matrix_constraints(scenarios)
+        elif scenarios.__class__ == list:
             for s in scenarios:
                 self.feasibility_constraint[s] = self._add_constraints(s)
         else:
@@ -61,3 +84,90 @@ class DeterModel(OptiModel):
                 self._remove_feasibility_constraints(s)
         else:
             self._remove_feasibility_constraints(scenarios)
+
+    def update(self, scenarios):
+        """
+        Swap the constraints of the model for those of the given
+        subset/scenario: only the constraints of the scenarios that
+        are not in both are removed or added. Gurobi keeps the LP
+        basis of the previous solve to warm start the next one.
+        """
+        if scenarios.__class__ != list:
+            scenarios = [scenarios]
+        in_subset = set(scenarios)
+        unused_scenarios = [s for s in self.feasibility_constraint
+                            if s not in in_subset]
+        self.remove(unused_scenarios)
+        new_scenarios = list(dict.fromkeys(
+            s for s in scenarios if s not in self.feasibility_constraint))
+        self.add(new_scenarios)
+
+    def warm_start(self, x_start=None, cost_bound=None):
+        """
+        Warm start the model with a feasible solution x_start, e.g., the
+        solution of a subset that contains the scenarios of the model.
+        It is a MIP start of binary models and a primal start of
+        continuous models. The objective cost_bound of x_start is a lower
+        bound of the optimal cost: worse MIP solutions are cut off.
+        Without arguments, the previous warm start is removed.
+        """
+        var_x = list(self.var_x.values())
+        is_continuous = (self.grb_var_type == GRB.CONTINUOUS).all()
+        start_attr = GRB.Attr.PStart if is_continuous else GRB.Attr.Start
+        if x_start is None:
+            x_start = [GRB.UNDEFINED] * len(var_x)
+        self.grb_model.setAttr(start_attr, var_x, list(x_start))
+        if not is_continuous:
+            if cost_bound is None:
+                cutoff = self.grb_model.getParamInfo(GRB.Param.Cutoff)[-1]
+            else:
+                # Keep x_start itself above the cutoff
+                cutoff = cost_bound - self.CUTOFF_TOL*max(1.0,
+                                                          abs(cost_bound))
+            self.grb_model.setParam(GRB.Param.Cutoff, cutoff)
+
+    def get_scenario_duals(self):
+        """
+        Dual values and slacks of the feasibility constraints of each
+        scenario. Continuous models must be solved first. Binary models
+        have no dual values: their linear relaxation is solved instead,
+        which is an LP solve whether or not the MIP was solved.
+
+        Returns:
+            dict: total dual value and minimum slack of each scenario,
+                the slacks are rescaled by the norm of their row
+        """
+        scenarios = [s for s in self.feasibility_constraint
+                     if len(self.feasibility_constraint[s]) > 0]
+        rows = [i for s in scenarios for i in self.feasibility_constraint[s]]
+        constraints = [constraint for s in scenarios for constraint
+                       in self.feasibility_constraint[s].values()]
+        if (self.grb_var_type == GRB.CONTINUOUS).all():
+            duals = self.grb_model.getAttr(GRB.Attr.Pi, constraints)
+            slacks = self.grb_model.getAttr(GRB.Attr.Slack, constraints)
+        else:
+            # The relaxed model has the same constraints, in the same
+            # order, and is not cut off at the cost of a MIP start
+            self.grb_model.update()
+            relaxed_model = self.grb_model.relax()
+            relaxed_model.setParam(
+                GRB.Param.Cutoff,
+                relaxed_model.getParamInfo(GRB.Param.Cutoff)[-1])
+            relaxed_model.optimize()
+            relaxed_constraints = relaxed_model.getConstrs()
+            relaxed_constraints = [relaxed_constraints[constraint.index]
+                                   for constraint in constraints]
+            duals = relaxed_model.getAttr(GRB.Attr.Pi, relaxed_constraints)
+            slacks = relaxed_model.getAttr(GRB.Attr.Slack,
+                                           relaxed_constraints)
+            relaxed_model.dispose()
+        scenario_duals = dict()
+        start = 0
+        for s in scenarios:
+            end = start + len(self.feasibility_constraint[s])
+            row_norms = self.chance_instance.row_norms[s, rows[start:end]]
+            scenario_duals[s] = (
+                float(np.abs(duals[start:end]).sum()),
+                float((np.array(slacks[start:end]) / row_norms).min()))
+            start = end
+        return scenario_duals
@@ -6,13 +6,19 @@ import csv
 
 
 class OptiModel():
-    """Metaclass for optimization models."""
+    """
+    Metaclass for optimization models.
+    If use_matrix_api is True, the constraints are built with the Gurobi
+    matrix API directly from the numpy arrays of the instance, instead
+    of one quicksum expression per row.
+    """
     # Use single Gurobi environment for all optimization models:
     # avoid querying a license each time a model is solved
     env = gp.Env()
 
-    def __init__(self, chance_instance, modelName):
+    def __init__(self, chance_instance, modelName, use_matrix_api=True):
         self.chance_instance = chance_instance
+        self.use_matrix_api = use_matrix_api
         self.nb_scenarios = self.chance_instance.get_nb_scenarios()
         # Create gurobi model with name and Gurobi environment
         self.grb_model = gp.Model(modelName, env=self.env)
@@ -29,8 +35,15 @@ class OptiModel():
         self.grb_var_type = np.array([GRB.CONTINUOUS if var_type[i]
                                       else GRB.BINARY for i in range(nb_vars)])
         # Create x variables
-        self.var_x = self.grb_model.addVars(nb_vars, lb=var_lb, ub=var_ub,
-                                            vtype=self.grb_var_type, name="x")
+        if self.use_matrix_api:
+            self.mvar_x = self.grb_model.addMVar(
+                nb_vars, lb=var_lb, ub=var_ub, vtype=self.grb_var_type,
+                name="x")
+            self.var_x = gp.tupledict(enumerate(self.mvar_x.tolist()))
+        else:
+            self.var_x = self.grb_model.addVars(
+                nb_vars, lb=var_lb, ub=var_ub, vtype=self.grb_var_type,
+                name="x")
 
     def _read_scenario_data(self, scenario):
         """
@@ -85,17 +98,100 @@ class OptiModel():
                         bigM_cstrts[i].Lazy = 1
         return bigM_cstrts
 
+    def _add_matrix_bigM_constraints(self, scenarios, use_lazy=False):
+        """
+        Adds the bigM constraints of the given scenarios with the matrix
+        API: the rows with a z variable are added at once, each with the
+        z variable of its scenario times its big M, and so are the rows
+        with a negative big M.
+
+        Returns:
+            dict: constraints of each scenario, by constraint index
+        """
+        A, b, row_scenarios, row_indices = self._stack_scenario_data(
+            scenarios)
+        bigM_constraints = {s: dict() for s in scenarios}
+        if len(b) == 0:
+            return bigM_constraints
+        bigM = np.concatenate([self.bigMFinder.get_vector_big_M(s)
+                               for s in scenarios])
+        has_z = bigM >= -1e-6
+        self.skip_counter += int(np.count_nonzero(~has_z))
+        rows = np.flatnonzero(has_z)
+        if len(rows) > 0:
+            constraints = self.grb_model.addConstr(
+                A[rows] @ self.mvar_x
+                + bigM[rows] * self.mvar_z[row_scenarios[rows]]
+                <= b[rows] + bigM[rows])
+            self._split_constraints(constraints, rows, row_scenarios,
+                                    row_indices, bigM_constraints,
+                                    use_lazy=use_lazy)
+        rows = np.flatnonzero(~has_z)
+        is_continuous = (self.grb_var_type == GRB.CONTINUOUS).all()
+        if len(rows) > 0 and not is_continuous:
+            # Add constraints with fixed value for z and negative bigM
+            constraints = self.grb_model.addConstr(
+                A[rows] @ self.mvar_x <= b[rows] + bigM[rows])
+            self._split_constraints(constraints, rows, row_scenarios,
+                                    row_indices, bigM_constraints,
+                                    use_lazy=use_lazy)
+        return bigM_constraints
+
+    def _stack_scenario_data(self, scenarios):
+        """
+        Stack the uncertain constraints of the given scenarios.
+
+        Returns:
+            A (np.array): stacked constraint matrices
+            b (np.array): stacked right-hand sides
+            row_scenarios (np.array): scenario of each row
+            row_indices (np.array): index of each row in its scenario
+        """
+        scenarios = list(scenarios)
+        nb_vars = self.chance_instance.get_nb_vars()
+        if len(scenarios) == 0:
+            empty = np.zeros(0, dtype=int)
+            return np.zeros((0, nb_vars)), np.zeros(0), empty, empty
+        nb_constraints = [int(self.chance_instance.get_nb_constraints(s))
+                          for s in scenarios]
+        A = np.concatenate([self.chance_instance.get_matrix_A(s)
+                            for s in scenarios])
+        b = np.concatenate([self.chance_instance.get_vector_b(s)
+                            for s in scenarios])
+        row_scenarios = np.repeat(scenarios, nb_constraints)
+        row_indices = np.concatenate([np.arange(n) for n in nb_constraints])
+        return A, b, row_scenarios, row_indices
+
+    def _split_constraints(self, constraints, rows, row_scenarios,
+                           row_indices, scenario_constraints,
+                           use_lazy=False):
+        """
+        Store each constraint of a matrix constraint, built from the
+        given stacked rows, in the dict of constraints of its scenario.
+        """
+        constraints = constraints.tolist()
+        if use_lazy:
+            self.grb_model.setAttr(GRB.Attr.Lazy, constraints,
+                                   [1] * len(constraints))
+        for r, constraint in zip(rows, constraints):
+            s = int(row_scenarios[r])
+            scenario_constraints[s][int(row_indices[r])] = constraint
+
     def _add_all_bigM_constraints(self, use_lazy=False):
         """Adds all bigM constraints of all scenario to the Gurobi model."""
-        # Loop over all scenarios and call the private function
-        #    to add the constraints
-        self.bigM_constraints = dict()
         self.feasibility_constraints = dict()
         self.skip_counter = 0
-        for s in range(self.nb_scenarios):
-            bigM = self.bigMFinder.get_vector_big_M(s)
-            self.bigM_constraints[s] = self._add_bigM_constraint(
-                s, bigM, use_lazy=use_lazy)
+        if self.use_matrix_api:
+            self.bigM_constraints = self._add_matrix_bigM_constraints(
+                range(self.nb_scenarios), use_lazy=use_lazy)
+        else:
+            # Loop over all scenarios and call the private function
+            #    to add the constraints
+            self.bigM_constraints = dict()
+            for s in range(self.nb_scenarios):
+                bigM = self.bigMFinder.get_vector_big_M(s)
+                self.bigM_constraints[s] = self._add_bigM_constraint(
+                    s, bigM, use_lazy=use_lazy)
         # Print summary of constraint implementation based on negative bigMs
         if (self.grb_var_type == GRB.CONTINUOUS).all():
             print('Could skip ', self.skip_counter, ' constraints'
@@ -109,6 +205,10 @@ class OptiModel():
         # Get data from chance instance class
         proba = self.chance_instance.get_proba()
         epsilon = self.chance_instance.get_epsilon()
+        if self.use_matrix_api:
+            self.chance_constraint = self.grb_model.addConstr(
+                proba @ self.mvar_z >= 1-epsilon)
+            return
         # The chance constraint is added to the model using gurobi quicksum
         self.chance_constraint = self.grb_model.addConstr(
             gp.quicksum(self.var_z[s]*proba[s]
@@ -118,12 +218,14 @@ class OptiModel():
         """
         Adds the binary indicator variables "z" to the gurobi model
         """
-        if relax:
-            self.var_z = self.grb_model.addVars(self.nb_scenarios,
-                                                vtype=GRB.CONTINUOUS, name="z")
+        vtype = GRB.CONTINUOUS if relax else GRB.BINARY
+        if self.use_matrix_api:
+            self.mvar_z = self.grb_model.addMVar(self.nb_scenarios,
+                                                 vtype=vtype, name="z")
+            self.var_z = gp.tupledict(enumerate(self.mvar_z.tolist()))
         else:
             self.var_z = self.grb_model.addVars(self.nb_scenarios,
-                                                vtype=GRB.BINARY, name="z")
+                                                vtype=vtype, name="z")
 
     @staticmethod
     def _lhs_constraint(i, A, x, nb_vars):
@@ -147,9 +249,12 @@ class OptiModel():
         vector_c = self.chance_instance.get_vector_c()
         nb_vars = self.chance_instance.get_nb_vars()
 
-        # Create objective using grb quicksum
-        self.grb_objective = gp.quicksum(
-            vector_c[i]*self.var_x[i] for i in range(nb_vars))
+        if self.use_matrix_api:
+            self.grb_objective = vector_c @ self.mvar_x
+        else:
+            # Create objective using grb quicksum
+            self.grb_objective = gp.quicksum(
+                vector_c[i]*self.var_x[i] for i in range(nb_vars))
         # Set objective
         self.obj = self.grb_model.setObjective(self.grb_objective,
                                                GRB.MAXIMIZE)
@@ -211,10 +316,9 @@ class OptiModel():
         return self.grb_model.ObjBound
 
     def get_var_x_val(self):
-        items = range(self.chance_instance.get_nb_vars())
-        var_x_val = np.array([self.var_x[j].getAttr(GRB.Attr.X)
-                             for j in items])
-        return var_x_val
+        """Returns the values of the x variables, read in bulk."""
+        return np.array(self.grb_model.getAttr(GRB.Attr.X,
+                                               self.var_x.values()))
 
     def write_model_to_file(self, model_file):
         """
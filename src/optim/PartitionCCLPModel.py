@@ -0,0 +1,183 @@
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+
+from src.optim.CCLPModel import CCLPModel
+
+
+class PartitionCCLPModel(CCLPModel):
+    """
+    Persistent CCLP model of a partitioned instance. The x variables and
+    the objective are built once. Before each solve, the model is
+    synchronized with the current partition of the instance: the z
+    variables and constraints of new subsets are added, those of deleted
+    subsets are removed, and the big M's and probabilities of the other
+    subsets are changed in place. The cost of an update is proportional
+    to the change of the partition, not to its size.
+    """
+
+    def __init__(self, chance_instance_part, bigMFinder, use_big_M=False,
+                 use_lazy=False, use_matrix_api=True):
+        super().__init__(chance_instance_part, bigMFinder,
+                         use_matrix_api=use_matrix_api)
+        self.use_big_M = use_big_M
+        self.use_lazy = use_lazy
+        # Indicator variable, constraints, big M's and probability of
+        # each subset in the model, keyed by the scenarios of the subset
+        self.subset_var_z = dict()
+        self.subset_constraints = dict()
+        self.subset_bigM = dict()
+        self.subset_proba = dict()
+        # Size of the last update
+        self.nb_added_subsets = 0
+        self.nb_removed_subsets = 0
+        self.nb_changed_bigM = 0
+
+    #   - - - Private methods - - -
+    def _remove_subset_constraints(self, key):
+        constraints = self.subset_constraints.pop(key)
+        self.grb_model.remove(list(constraints.values()))
+
+    def _remove_subset(self, key):
+        """Remove the indicator variable and constraints of a subset."""
+        self._remove_subset_constraints(key)
+        self.grb_model.remove(self.subset_var_z.pop(key))
+        self.subset_bigM.pop(key, None)
+        del self.subset_proba[key]
+
+    def _add_subset_constraints(self, subsets):
+        """
+        Add the constraints of the given subsets of the partition.
+
+        Returns:
+            dict: constraints of each subset, by constraint index
+        """
+        if self.use_big_M and self.use_matrix_api:
+            return self._add_matrix_bigM_constraints(subsets,
+                                                     use_lazy=self.use_lazy)
+        if self.use_big_M:
+            return {c: self._add_bigM_constraint(
+                        c, self.bigMFinder.get_vector_big_M(c),
+                        use_lazy=self.use_lazy)
+                    for c in subsets}
+        if self.use_matrix_api:
+            return self._add_matrix_indicator_constraints(subsets)
+        return {c: self._add_indicator_constraint(c) for c in subsets}
+
+    def _change_bigM(self, c, key):
+        """
+        Change the big M's of a subset in place: the coefficient of its z
+        variable and the right-hand side of the rows whose big M changed.
+        A row with a negative big M has no z variable.
+
+        Returns:
+            bool: False if the rows of the subset must be built again,
+                i.e., if a big M of continuous variables changed sign
+        """
+        bigM = np.array(self.bigMFinder.get_vector_big_M(c), dtype=float)
+        old_bigM = self.subset_bigM[key]
+        has_z = bigM >= -1e-6
+        is_continuous = (self.grb_var_type == GRB.CONTINUOUS).all()
+        if is_continuous and (has_z != (old_bigM >= -1e-6)).any():
+            return False
+        b = self.chance_instance.get_vector_b(c)
+        constraints = self.subset_constraints[key]
+        var_z = self.subset_var_z[key]
+        for i in np.flatnonzero(bigM != old_bigM).tolist():
+            # Rows with negative big M are skipped for continuous variables
+            if i not in constraints:
+                continue
+            self.grb_model.chgCoeff(constraints[i], var_z,
+                                    bigM[i] if has_z[i] else 0.0)
+            constraints[i].RHS = b[i] + bigM[i]
+            self.nb_changed_bigM += 1
+        self.subset_bigM[key] = bigM
+        return True
+
+    def _set_var_z(self, keys):
+        """Order the indicator variables as the subsets of the partition."""
+        self.var_z = gp.tupledict(enumerate(self.subset_var_z[key]
+                                            for key in keys))
+        if self.use_matrix_api:
+            self.mvar_z = gp.MVar.fromlist(list(self.var_z.values()))
+
+    def _update_chance_constraint(self, keys):
+        """Only rewrite the coefficients of probabilities that changed."""
+        proba = self.chance_instance.get_proba()
+        for c, key in enumerate(keys):
+            if self.subset_proba.get(key) != proba[c]:
+                self.grb_model.chgCoeff(self.chance_constraint,
+                                        self.subset_var_z[key], proba[c])
+                self.subset_proba[key] = proba[c]
+        self.chance_constraint.RHS = 1 - self.chance_instance.get_epsilon()
+
+    #   - - - Public methods - - -
+    def fix_z_to_zero(self, s):
+        """
+        ''Prune'' a subset with the upper bound of its indicator
+        variable, which is reset at the next update.
+        """
+        self.var_z[s].UB = 0.0
+
+    def update_partition(self):
+        """Synchronize the subsets of the model with the partition."""
+        self.nb_scenarios = self.chance_instance.get_nb_scenarios()
+        keys = [tuple(subset) for subset in self.chance_instance.partition]
+        self.skip_counter = 0
+        self.nb_changed_bigM = 0
+        # Remove the deleted subsets
+        partition_keys = set(keys)
+        removed_keys = [key for key in self.subset_var_z
+                        if key not in partition_keys]
+        for key in removed_keys:
+            self._remove_subset(key)
+        # Change the big M's of the other subsets
+        if self.use_big_M:
+            for c, key in enumerate(keys):
+                if ((key in self.subset_var_z)
+                        and not self._change_bigM(c, key)):
+                    self._remove_subset_constraints(key)
+        # Add the indicator variables of the new subsets
+        new_subsets = [c for c, key in enumerate(keys)
+                       if key not in self.subset_var_z]
+        for c in new_subsets:
+            self.subset_var_z[keys[c]] = self.grb_model.addVar(
+                vtype=GRB.BINARY, name="z")
+        self._set_var_z(keys)
+        # Add the constraints of the new subsets and of the subsets
+        # that must be built again
+        missing_subsets = [c for c, key in enumerate(keys)
+                           if key not in self.subset_constraints]
+        constraints = self._add_subset_constraints(missing_subsets)
+        for c in missing_subsets:
+            self.subset_constraints[keys[c]] = constraints[c]
+            if self.use_big_M:
+                self.subset_bigM[keys[c]] = np.array(
+                    self.bigMFinder.get_vector_big_M(c), dtype=float)
+        self.grb_model.update()
+        self._update_chance_constraint(keys)
+        self.nb_added_subsets = len(new_subsets)
+        self.nb_removed_subsets = len(removed_keys)
+
+    def update(self, z_start=None):
+        """
+        Update the model for the current partition, reset the pruned
+        subsets and warm start the indicator variables.
+        """
+        self.update_partition()
+        var_z = list(self.var_z.values())
+        self.grb_model.setAttr(GRB.Attr.UB, var_z, [1.0] * len(var_z))
+        self.grb_model.setAttr(GRB.Attr.Start, var_z,
+                               [GRB.UNDEFINED] * len(var_z))
+        self._warm_start_binary_var_z(z_start=z_start)
+
+    def build(self, verbose=True):
+        """Build the variables x, the objective and the partition."""
+        if not verbose:
+            self.grb_model.Params.LogToConsole = 0
+        self._initialize_var_x()
+        self._initialize_obj()
+        epsilon = self.chance_instance.get_epsilon()
+        self.chance_constraint = self.grb_model.addConstr(
+            gp.LinExpr() >= 1 - epsilon)
+        self.update_partition()
@@ -1,18 +1,51 @@
 import numpy as np
 import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from gurobipy import GRB
 
 from src.optim.AccObjModel import AccObjModel
 from src.refiner.Refiner import Refiner
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.LRUCache import LRUCache
+from src.Evaluator import Evaluator
+
+# Chance instance of a process pool worker, read once per worker
+_worker_chance_instance = None
+
+
+def _init_accurate_split_worker(instance_args):
+    global _worker_chance_instance
+    _worker_chance_instance = ChanceKnapInstance(*instance_args)
+
+
+def _solve_accurate_split(scenarios, infeasible_scenarios, cutoff,
+                          left_start):
+    """Process pool worker: solve the accurate obj model of a subset."""
+    return CostRefiner.solve_accurate_obj_model(
+        _worker_chance_instance, scenarios, infeasible_scenarios,
+        use_one_thread=True, cutoff=cutoff, left_start=left_start)
 
 
 class CostRefiner(Refiner):
     """Refiner class that splits subsets according to their subset costs."""
+    MEMORY_SIZE = 2**14
 
-    def __init__(self, chance_instance, use_acc_obj=False):
+    def __init__(self, chance_instance, use_acc_obj=False, nb_workers=1,
+                 memory_size=MEMORY_SIZE, use_screening=True):
         super().__init__(chance_instance, use_acc_obj)
-        self.memory_costs = dict()
-        self.memory_left_subset = dict()
-        self.memory_right_subset = dict()
+        self.vUB = np.inf
+        self.subset_costs = None
+        self.nb_workers = nb_workers
+        self.use_screening = use_screening
+        self.evaluator = Evaluator(chance_instance)
+        # Bounds on the post-split cost of the candidates that are not
+        # solved exactly, and candidates that were never solved
+        self.post_split_bounds = dict()
+        self.screened_subsets = set()
+        # Post-split cost, left and right subsets of the accurate split
+        # of each (scenarios, infeasible scenarios) key
+        self.memory = LRUCache(memory_size)
 
     #   - - - Private methods - - -
     def _get_sorted_scenarios(self, scenarios):
@@ -26,30 +59,178 @@ class CostRefiner(Refiner):
             np.array(self.subset_costs)).tolist()
         return index_min_subset_cost
 
-    def _evaluate_single_accurate_split(self, c):
-        # Read scenarios and infeasible scenarios in input subset
+    def _get_accurate_split_key(self, c):
+        """Returns the scenarios, infeasible scenarios and key of c."""
         scenarios = self.partition[c]
         infeasible_scenarios = [s for s in scenarios
                                 if s in self.infeasible_scenarios]
-        # Get key of dictionary
         key = (frozenset(scenarios), frozenset(infeasible_scenarios))
-        if key not in self.memory_costs:
-            # Solve accurate obj model
-            post_split_costs, left_subsets, right_subsets = (
-                    self.accurate_obj_split(scenarios, infeasible_scenarios))
-            self.post_split_costs[c] = post_split_costs
-            self.left_subsets[c] = left_subsets
-            self.right_subsets[c] = right_subsets
+        return scenarios, infeasible_scenarios, key
+
+    def _store_accurate_split(self, c, accurate_split):
+        """
+        Store the solution of an accurate obj model. A cut off model
+        only bounds the post-split cost from below by its cutoff, and
+        its best split is kept to warm start its exact solve.
+        """
+        post_split_cost, left_subset, right_subset = accurate_split
+        self.left_subsets[c] = left_subset
+        self.right_subsets[c] = right_subset
+        if post_split_cost == np.inf:
+            self.post_split_costs.pop(c, None)
+            self.post_split_bounds[c] = (self._cutoff_bound(), np.inf)
+            return
+        self.post_split_costs[c] = post_split_cost
+        self.post_split_bounds.pop(c, None)
+
+    def _cutoff_bound(self):
+        """Lower bound of the post-split cost of a cut off model."""
+        return self.vUB + AccObjModel.CUTOFF_TOL*max(1.0, abs(self.vUB))
+
+    def _get_cost_lower_bound(self, c):
+        """
+        Lower bound of the post-split cost of candidate c. The children
+        of a subset cost at least as much as the subset, and the subsets
+        were only split since their costs were computed.
+        """
+        if c in self.post_split_bounds:
+            return self.post_split_bounds[c][0]
+        if (self.subset_costs is None) or (c >= len(self.subset_costs)):
+            return -np.inf
+        return self.subset_costs[c]
+
+    def _get_cutoff(self, lower_bound):
+        """
+        Cutoff at vUB of an accurate obj model whose post-split cost is
+        at least lower_bound, or None if the model is sure to be cut off
+        and would only be solved again.
+        """
+        if lower_bound > self._cutoff_bound():
+            return None
+        return self.vUB
+
+    def _evaluate_single_accurate_split(self, c, lower_bound):
+        scenarios, infeasible_scenarios, key = \
+            self._get_accurate_split_key(c)
+        accurate_split = self.memory.get(key)
+        if accurate_split is None:
+            # Solve accurate obj model and store solution in memory
+            accurate_split = self.accurate_obj_split(
+                scenarios, infeasible_scenarios,
+                cutoff=self._get_cutoff(lower_bound))
+            self.memory.put(key, accurate_split)
             self.count += 1
-            # Store solution in memory
-            self.memory_costs[key] = post_split_costs
-            self.memory_left_subset[key] = left_subsets
-            self.memory_right_subset[key] = right_subsets
-        else:
-            # Read solution of accurate obj from memory
-            self.post_split_costs[c] = self.memory_costs[key]
-            self.left_subsets[c] = self.memory_left_subset[key]
-            self.right_subsets[c] = self.memory_right_subset[key]
+        self._store_accurate_split(c, accurate_split)
+
+    def _store_accurate_splits(self, split_keys, accurate_splits):
+        """Store the solutions of the accurate obj models of each key."""
+        for (key, (_, _, subsets)), accurate_split in zip(
+                split_keys.items(), accurate_splits):
+            self.memory.put(key, accurate_split)
+            self.count += 1
+            for c in subsets:
+                self.screened_subsets.discard(c)
+                self._store_accurate_split(c, accurate_split)
+
+    def _solve_accurate_splits(self, subsets, cutoff):
+        """
+        Solve the accurate obj models of the given subsets, with the
+        process pool if there are several workers, and store them. The
+        subsets with the same key share a single model. The models that
+        were cut off start from their best split.
+        """
+        split_keys = dict()
+        for c in subsets:
+            scenarios, infeasible_scenarios, key = \
+                self._get_accurate_split_key(c)
+            split_keys.setdefault(
+                key, (scenarios, infeasible_scenarios, []))[2].append(c)
+        cutoffs = []
+        left_starts = []
+        for _, _, same_subsets in split_keys.values():
+            c = same_subsets[0]
+            cutoffs.append(None if cutoff is None else
+                           self._get_cutoff(self._get_cost_lower_bound(c)))
+            left_starts.append(self.left_subsets.get(c)
+                               if c in self.post_split_bounds else None)
+        if (self.nb_workers <= 1) or (len(split_keys) <= 1):
+            self._store_accurate_splits(split_keys, (
+                self.accurate_obj_split(scenarios, infeasible_scenarios,
+                                        cutoff=subset_cutoff,
+                                        left_start=left_start)
+                for (scenarios, infeasible_scenarios, _), subset_cutoff,
+                left_start in zip(split_keys.values(), cutoffs,
+                                  left_starts)))
+            return
+        instance_args = self.chance_instance.get_instance_args()
+        context = multiprocessing.get_context("spawn")
+        nb_workers = min(self.nb_workers, len(split_keys))
+        with ProcessPoolExecutor(max_workers=nb_workers, mp_context=context,
+                                 initializer=_init_accurate_split_worker,
+                                 initargs=(instance_args,)) as executor:
+            self._store_accurate_splits(split_keys, executor.map(
+                _solve_accurate_split,
+                [scenarios for scenarios, _, _ in split_keys.values()],
+                [infeasible for _, infeasible, _ in split_keys.values()],
+                cutoffs, left_starts))
+
+    def _post_split_cost_bounds(self, c):
+        """
+        Bounds of the post-split cost of subset c without solving its
+        accurate obj model. The children of a subset cost at least as
+        much as the subset. The heuristic split is one of the splits of
+        the model: for continuous variables, the cost of its children
+        bounds the post-split cost from above. The model is the linear
+        relaxation of binary instances, whose costs are not bounds.
+        """
+        lower_bound = -np.inf
+        if self.subset_costs is not None:
+            lower_bound = self.subset_costs[c]
+        upper_bound = np.inf
+        if self.chance_instance.continuous_var:
+            scenarios, infeasible_scenarios, _ = \
+                self._get_accurate_split_key(c)
+            upper_bound = max(self.evaluator.subset_cost(subset)[0]
+                              for subset in self.heuristic_split(
+                                  scenarios, infeasible_scenarios))
+        return lower_bound, upper_bound
+
+    def _get_undecided_splits(self):
+        """
+        Returns the screened subsets whose bounds do not exclude them
+        from the choice of _perform_accurate_split, and the cutoff of
+        their models. The choice is the largest post-split cost below
+        vUB or, if there is none, the smallest post-split cost. The
+        models are only cut off at vUB once a post-split cost below vUB
+        is known, so that a cut off model is never chosen.
+        """
+        bounds = self.post_split_bounds
+        free_costs = [v for v in self.post_split_costs.values()
+                      if v <= self.vUB]
+        free_costs += [lb for lb, ub in bounds.values() if ub <= self.vUB]
+        if len(free_costs) > 0:
+            # The largest post-split cost below vUB is at least max_cost
+            max_cost = max(free_costs)
+            return [c for c, (lb, ub) in bounds.items()
+                    if lb <= self.vUB and min(ub, self.vUB) >= max_cost], \
+                self.vUB
+        # Solve the smallest lower bounds first, until one is below vUB
+        maybe_free = sorted([c for c, (lb, ub) in bounds.items()
+                             if lb <= self.vUB], key=lambda c: bounds[c][0])
+        if len(maybe_free) > 0:
+            return maybe_free[:max(1, self.nb_workers)], None
+        # Solve the smallest lower bounds first
+        min_cost = min(self.post_split_costs.values(), default=np.inf)
+        undecided = sorted([c for c, (lb, ub) in bounds.items()
+                            if lb <= min_cost], key=lambda c: bounds[c][0])
+        return undecided[:max(1, self.nb_workers)], None
+
+    def _solve_undecided_splits(self):
+        """Solve the screened subsets until the choice is decided."""
+        undecided, cutoff = self._get_undecided_splits()
+        while len(undecided) > 0:
+            self._solve_accurate_splits(undecided, cutoff)
+            undecided, cutoff = self._get_undecided_splits()
 
     def _evaluate_accurate_splits(self, sorted_subsets, nb_top=None):
         if nb_top is None:
@@ -65,21 +246,44 @@ class CostRefiner(Refiner):
         print('Evaluate accurate obj when splitting top', nb_candidates,
               'candidate subsets.')
         self.post_split_costs = dict()
+        self.post_split_bounds = dict()
+        self.screened_subsets = set()
         self.left_subsets = dict()
         self.right_subsets = dict()
         self.count = 0
-        for i in range(nb_candidates):
-            p = math.floor(100*i/nb_candidates)
-            if (p % 10) == 0:
-                print('[%d%%] \r' % p, end="")
-            self._evaluate_single_accurate_split(candidate_subsets[i])
+        new_subsets = []
+        for c in candidate_subsets[:nb_candidates]:
+            _, _, key = self._get_accurate_split_key(c)
+            accurate_split = self.memory.get(key)
+            if accurate_split is not None:
+                self._store_accurate_split(c, accurate_split)
+            else:
+                new_subsets.append(c)
+        if self.use_screening:
+            # Only bound the new subsets, they are solved when needed
+            for c in new_subsets:
+                self.post_split_bounds[c] = self._post_split_cost_bounds(c)
+            self.screened_subsets = set(new_subsets)
+            self._solve_undecided_splits()
+        else:
+            self._solve_accurate_splits(new_subsets, None)
         print('Solved', self.count, 'new accurate obj models and '
               'reused previous solutions for',
-              nb_candidates-self.count, 'others.')
+              nb_candidates-len(new_subsets), 'others.')
+        print('Memory of accurate splits:', len(self.memory), 'subsets,',
+              self.memory.nb_hits, 'hits and', self.memory.nb_misses,
+              'misses.')
+
+    def _split_top_mu_subset(self):
+        super()._split_top_mu_subset()
+        if self.use_acc_obj and self.use_screening:
+            print('Pre-screening saved', len(self.screened_subsets),
+                  'accurate obj models in this iteration.')
 
     def _perform_accurate_split(self):
         # - Perfom split -
         # Find the ``best`` candidate subset to split
+        self._solve_undecided_splits()
         free_mergers = [c for c, v in self.post_split_costs.items()
                         if v <= self.vUB]
         if len(free_mergers) > 0:
@@ -92,6 +296,8 @@ class CostRefiner(Refiner):
         else:
             split_c = min(self.post_split_costs, key=self.post_split_costs.get)
         print(' -> subset ', split_c)
+        # The children of the split subset cost at least as much
+        lower_bound = self._get_cost_lower_bound(split_c)
         # Update partition with split
         self.partition[split_c] = self.left_subsets[split_c]
         self.partition.append(self.right_subsets[split_c])
@@ -99,12 +305,13 @@ class CostRefiner(Refiner):
         nb_inf_scenarios = self._count_infeasible_scenarios(
             self.partition, self.infeasible_scenarios)
         if nb_inf_scenarios[split_c] >= 2:
-            self._evaluate_single_accurate_split(split_c)
+            self._evaluate_single_accurate_split(split_c, lower_bound)
         else:
             self.post_split_costs.pop(split_c)
+            self.post_split_bounds.pop(split_c, None)
         new_c = len(self.partition)-1
         if nb_inf_scenarios[new_c] >= 2:
-            self._evaluate_single_accurate_split(new_c)
+            self._evaluate_single_accurate_split(new_c, lower_bound)
         # Update counter
         self.mu_counter += 1
         # Store new or modified subsets
@@ -115,12 +322,51 @@ class CostRefiner(Refiner):
         self.new_subsets.append(len(self.partition)-1)
 
     #   - - - Public methods - - -
-    def accurate_obj_split(self, scenarios, infeasible_scenarios):
+    @staticmethod
+    def heuristic_split(scenarios, infeasible_scenarios):
+        """
+        Alternate split of the infeasible and of the feasible scenarios,
+        as in the split of other refiners.
+        """
+        infeasible = [s for s in scenarios if s in infeasible_scenarios]
+        feasible = [s for s in scenarios if s not in infeasible_scenarios]
+        left_infeasible, right_infeasible = Refiner._split_sorted_subset(
+            infeasible)
+        return (left_infeasible + feasible[0::2],
+                right_infeasible + feasible[1::2])
+
+    @staticmethod
+    def solve_accurate_obj_model(chance_instance, scenarios,
+                                 infeasible_scenarios, use_one_thread=False,
+                                 cutoff=None, left_start=None):
+        """
+        Solve the accurate obj model, warm started from the left subset
+        left_start, or from the heuristic split by default. If no split
+        has a cost below the cutoff, the post-split cost is infinite and
+        the best split found is returned.
+        """
+        left_subset, right_subset = CostRefiner.heuristic_split(
+            scenarios, infeasible_scenarios)
         # - Solve optimization model -
-        model = AccObjModel(self.chance_instance, scenarios,
+        model = AccObjModel(chance_instance, scenarios,
                             infeasible_scenarios)
         model.build()
+        model.warm_start(left_subset if left_start is None else left_start)
+        if use_one_thread:
+            model.grb_model.setParam(GRB.Param.Threads, 1)
+        if (cutoff is not None) and (cutoff < np.inf):
+            model.set_cutoff(cutoff)
         model.solve()
+        if model.is_cut_off():
+            if model.grb_model.SolCount > 0:
+                left_subset, right_subset = model.get_subsets()
+            return np.inf, left_subset, right_subset
         max_cost = model.get_obj_val()
         left_subset, right_subset = model.get_subsets()
-        return max_cost, left_subset, right_subset
\ No newline at end of file
+        return max_cost, left_subset, right_subset
+
+    def accurate_obj_split(self, scenarios, infeasible_scenarios,
+                           cutoff=None, left_start=None):
+        return self.solve_accurate_obj_model(
+            self.chance_instance, scenarios, infeasible_scenarios,
+            cutoff=cutoff, left_start=left_start)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import numpy as np
+
+from src.refiner.Refiner import Refiner
+from src.Evaluator import Evaluator
+from src.LRUCache import LRUCache
+
+
+class DualRefiner(Refiner):
+    """
+    Refiner class that split subsets with the dual values of their
+    deterministic model, without solving an accurate obj model.
+    The scenarios whose constraints have the largest dual values bind
+    the cost of the subset: they are sorted first, so that the split
+    of sorted scenarios separates them into the two new subsets.
+    The subsets whose binding scenarios are the most violated by the
+    last upper bound solution are split first.
+    The dual values of a subset are kept in a cache of at most
+    memory_size subsets. They are given by the adaptive partitioner,
+    which reads them when it solves the subset costs, and are only
+    solved by the refiner for the subsets that it did not solve.
+    """
+    MEMORY_SIZE = 2**14
+
+    def __init__(self, chance_instance, use_acc_obj=False,
+                 memory_size=MEMORY_SIZE):
+        super().__init__(chance_instance, use_acc_obj)
+        self.evaluator = Evaluator(chance_instance)
+        # Dual value and slack of each scenario of each subset
+        self.memory = LRUCache(memory_size)
+
+    #   - - - Private methods - - -
+    def _get_subset_duals(self, scenarios):
+        """Returns the dual value and slack of each scenario."""
+        key = frozenset(scenarios)
+        subset_duals = self.memory.get(key)
+        if subset_duals is None:
+            subset_duals = self.evaluator.subset_duals(list(scenarios))
+            self.memory.put(key, subset_duals)
+        return subset_duals
+
+    def _get_sorted_scenarios(self, scenarios):
+        """
+        Sort scenarios in decreasing order of their dual value, and in
+        increasing order of their slack for equal dual values.
+        """
+        subset_duals = self._get_subset_duals(scenarios)
+        return sorted(scenarios, key=lambda s: (-subset_duals[s][0],
+                                                subset_duals[s][1]))
+
+    def _get_sorted_subsets(self, partition):
+        """
+        Sort subsets in decreasing order of the dual-weighted
+        infeasibility of their scenarios, then of the dual value of
+        their infeasible scenarios. Only subsets that can be split are
+        evaluated, the others are last.
+        """
+        nb_inf_scenarios = self._count_infeasible_scenarios(
+            partition, self.infeasible_scenarios)
+        infeasibility = np.asarray(self.max_infeasibility_scenarios)
+        scores = []
+        for c, scenarios in enumerate(partition):
+            if not self._is_splittable(nb_inf_scenarios[c]):
+                scores.append((-np.inf, -np.inf))
+                continue
+            subset_duals = self._get_subset_duals(scenarios)
+            scores.append((
+                sum(subset_duals[s][0] * infeasibility[s]
+                    for s in scenarios),
+                sum(subset_duals[s][0] for s in scenarios
+                    if self.is_scenario_infeasible[s])))
+        print('Memory of dual values:', len(self.memory), 'subsets,',
+              self.memory.nb_hits, 'hits and', self.memory.nb_misses,
+              'misses.')
+        return sorted(range(len(partition)), key=lambda c: scores[c],
+                      reverse=True)
+
+    #   - - - Public methods - - -
+    def add_subset_duals(self, partition, subset_duals):
+        """
+        Store the dual values of the subsets of the partition, None for
+        the subsets whose dual values are unknown.
+        """
+        for scenarios, scenario_duals in zip(partition, subset_duals):
+            if scenario_duals is not None:
+                self.memory.put(frozenset(scenarios), scenario_duals)
@@ -1,7 +1,7 @@
 import math
-from copy import deepcopy
 
 from src.TimeManager import TimeManager
+from src.Partition import Partition
 
 
 class Refiner():
@@ -24,7 +24,9 @@ class Refiner():
         self.splitted_subsets = []  # Store subsets that are splitted
         self.new_subsets = []  # Store new subsets
         self.old_partition = partition
-        self.partition = deepcopy(partition)
+        # Subsets are replaced and not changed: a copy is enough
+        self.partition = Partition.as_partition(
+            partition, self.chance_instance.get_nb_scenarios()).copy()
 
     def _read_infeasible_scenarios_from_chance_instance(self):
         """Read infeasibility data from chance_instance."""
@@ -53,11 +55,8 @@ class Refiner():
         if len(infeasible_scenarios) == 0:
             return nb_inf_scenarios
         # Otherwise, count the nb of infeasible scenarios in each subset
-        for c in range(nb_subsets):
-            for s in partition[c]:
-                if s in infeasible_scenarios:
-                    nb_inf_scenarios[c] += 1
-        return nb_inf_scenarios
+        partition = Partition.as_partition(partition)
+        return partition.count(infeasible_scenarios).tolist()
 
     def _find_infeasible_subsets(self, partition):
         """Returns the list of feasible and infeasible subsets."""
@@ -230,6 +229,18 @@ class Refiner():
             self.partition, self.old_partition)
 
     #   - - - Public methods - - -
+    def get_parent_subsets(self):
+        """
+        Returns the subset of the partition before refinement that
+        contains each new subset: all the scenarios of a split subset
+        come from the same parent subset.
+        """
+        parent_of_scenario = {s: c for c, subset
+                              in enumerate(self.old_partition)
+                              for s in subset}
+        return [parent_of_scenario[self.partition[c][0]]
+                for c in self.new_subsets]
+
     def refine(self, partition, x_UB):
         # - Pre-processing -
         self._initialize_refinement(partition, x_UB)
@@ -5,13 +5,16 @@ import numpy as np
 from src.instance.PartitionChanceKnapInstance import \
     PartitionChanceKnapInstance
 from src.Initializer import Initializer
+from src.Partition import Partition
 from src.refiner.CostRefiner import CostRefiner
 from src.refiner.RandomRefiner import RandomRefiner
+from src.refiner.DualRefiner import DualRefiner
 from src.UpperBounder import UpperBounder
 from src.LowerBounder import LowerBounder
 from src.Informer import Informer
 from src.Merger import Merger
 from src.solver.Solver import Solver
+from src.optim.PartitionCCLPModel import PartitionCCLPModel
 
 
 class AdaptivePartitioner(Solver):
@@ -19,16 +22,33 @@ class AdaptivePartitioner(Solver):
     Main class for solving chance-constrained problems
     by iteratively solving reduced problems and
     adapting the partition.
+    If use_persistent_model is True, the partitioned problem is kept
+    in a single model that is updated at each iteration.
+    The deterministic models of the initial partition and the accurate
+    splits of the cost refiner are solved by nb_eval_workers processes.
+    If use_lazy_costs is True, the cost of a new subset is only bounded
+    after a split: from below by the cost of its parent and from above
+    by the single-scenario costs of its scenarios. The lazy costs are
+    solved when a bound is not enough to decide a pruning, a merge or
+    an ordering of the subsets.
     """
+    # Relative width of the cost interval of a subset under which
+    # its cost is known without a solve
+    LAZY_COST_TOL = 1e-9
+
     def __init__(self, chance_instance,
                  split_method='random',
                  initial_partition_type='cost',
                  projection_method='rescaled_max_violation',
                  use_acc_obj=False,
                  time_limit=1800,
-                 gap=1e-4):
+                 gap=1e-4,
+                 use_persistent_model=True,
+                 nb_eval_workers=1,
+                 use_lazy_costs=False):
         super(AdaptivePartitioner, self).__init__(
-            chance_instance, time_limit, gap)
+            chance_instance, time_limit, gap,
+            nb_eval_workers=nb_eval_workers)
         self.xUB = None
         self.zUB = None
         self.did_merge = False
@@ -36,6 +56,17 @@ class AdaptivePartitioner(Solver):
         self.split_method = split_method
         self.projection_method = projection_method
         self.initial_partition_type = initial_partition_type
+        self.use_persistent_model = use_persistent_model
+        self.partition_cclp_model = None
+        self.use_lazy_costs = use_lazy_costs
+        self.scenario_costs = None
+        # Lower bound and feasible solution of each lazy subset cost,
+        # None if the cost is exact. The upper bound of a lazy cost is
+        # stored in subset_costs.
+        self.subset_cost_bounds = []
+        # Dual values of the scenarios of each subset, read when its
+        # cost is solved if the refiner splits with them, else None
+        self.subset_duals = []
         self.chance_instance_part = PartitionChanceKnapInstance(
             chance_instance)
         self._create_components(use_acc_obj)
@@ -50,10 +81,14 @@ class AdaptivePartitioner(Solver):
             # Cost refiner needs to use accurate obj. split
             assert use_acc_obj
             refiner = CostRefiner(self.chance_instance,
+                                  use_acc_obj=use_acc_obj,
+                                  nb_workers=self.evaluator.nb_workers)
+        elif split_method == 'dual':
+            refiner = DualRefiner(self.chance_instance,
                                   use_acc_obj=use_acc_obj)
         else:
             print('Unknown splitting method, use:')
-            print('[\'random\', \'cost\']')
+            print('[\'random\', \'cost\', \'dual\']')
             raise ValueError
         return refiner
 
@@ -62,7 +97,8 @@ class AdaptivePartitioner(Solver):
         Create all components of the adaptive partitioner.
         """
         self.initializer = Initializer(self.chance_instance,
-                                       self.chance_instance_part)
+                                       self.chance_instance_part,
+                                       nb_workers=self.evaluator.nb_workers)
         self.refiner = self._init_refiner(self.split_method, use_acc_obj)
         self.upperbounder = UpperBounder(self.chance_instance_part,
                                          self.split_method,
@@ -86,12 +122,15 @@ class AdaptivePartitioner(Solver):
         self.minimum_partition_size = math.floor(epsilon*nb_scenarios) + 1
         self.nb_subsets = math.floor(nb_scenarios*epsilon) + 1
         # Generate initial partition and load it
-        self.partition = self.initializer.create_first_partition(
-            self.nb_subsets, partition_type=self.initial_partition_type)
+        self.partition = Partition(
+            self.initializer.create_first_partition(
+                self.nb_subsets, partition_type=self.initial_partition_type),
+            nb_scenarios)
         self.chance_instance_part.load_partition(self.nb_subsets,
                                                  self.partition)
         # Determine quantile bound if possible
         if self.initial_partition_type == "cost":
+            self.scenario_costs = np.array(self.initializer.scenario_costs)
             self.vUB = self.upperbounder.ahmed_et_al_bound(
                 self.initializer.scenario_costs,
                 self.chance_instance.get_proba(),
@@ -106,6 +145,81 @@ class AdaptivePartitioner(Solver):
             self.xLB = xLB
             self.vLB = vLB
 
+    def _cost_upper_bound(self, subset):
+        """
+        Upper bound of a subset cost: the minimum single-scenario cost of
+        its scenarios, if the single-scenario costs are available.
+        """
+        if self.scenario_costs is None:
+            return np.inf
+        return float(np.min(self.scenario_costs[subset]))
+
+    def _cost_lower_bound(self, c):
+        """
+        Lower bound of the cost of subset c, and a feasible solution of
+        this cost, which are valid for any subset of its scenarios.
+        """
+        if self.subset_cost_bounds[c] is None:
+            return self.subset_costs[c], self.subset_sols[c]
+        return self.subset_cost_bounds[c]
+
+    def _subset_cost(self, subset, x_start=None, cost_bound=None):
+        """
+        Solve the cost of a subset, and read the dual values of its
+        scenarios in the same solve if the refiner splits with them.
+        """
+        if self.split_method != 'dual':
+            cost, sol = self.evaluator.subset_cost(subset, x_start,
+                                                   cost_bound)
+            return cost, sol, None
+        return self.evaluator.subset_cost(subset, x_start, cost_bound,
+                                          return_duals=True)
+
+    def _store_subset_cost(self, c, cost, sol, cost_bounds=None,
+                           duals=None):
+        if c < len(self.subset_costs):
+            self.subset_costs[c] = cost
+            self.subset_sols[c] = sol
+            self.subset_cost_bounds[c] = cost_bounds
+            self.subset_duals[c] = duals
+        else:
+            self.subset_costs.append(cost)
+            self.subset_sols.append(sol)
+            self.subset_cost_bounds.append(cost_bounds)
+            self.subset_duals.append(duals)
+
+    def _is_lazy(self, c):
+        return self.subset_cost_bounds[c] is not None
+
+    def _tighten_subset_costs(self, subsets):
+        """
+        Solve the deterministic models of the given subsets whose cost
+        is lazy, starting from the solution of their parent.
+        """
+        lazy_subsets = [c for c in subsets if self._is_lazy(c)]
+        if len(lazy_subsets) == 0:
+            return
+        print('Evaluating the cost of', len(lazy_subsets), 'lazy subsets.')
+        sols = []
+        for c in lazy_subsets:
+            lower_bound, x_start = self.subset_cost_bounds[c]
+            cost, sol, duals = self._subset_cost(
+                self.partition[c], x_start=x_start, cost_bound=lower_bound)
+            self._store_subset_cost(c, cost, sol, duals=duals)
+            sols.append(sol)
+        # Improve bound with candidate solutions
+        self._improve_vlb_with_candidate_sols(sols)
+
+    def _tighten_undecided_subset_costs(self, subsets, threshold):
+        """
+        Solve the lazy costs of the given subsets for which the bounds
+        do not decide whether the cost is above the threshold.
+        """
+        self._tighten_subset_costs(
+            [c for c in subsets if self._is_lazy(c)
+             and (self.subset_cost_bounds[c][0] <= threshold
+                  < self.subset_costs[c])])
+
     def _big_M(self, bigMFinder, use_big_M, use_tightening=False):
         """Determine big M parameters for current partition."""
         if use_big_M and (self.nb_subsets > self.minimum_partition_size):
@@ -116,6 +230,17 @@ class AdaptivePartitioner(Solver):
                                     chance_instance=self.chance_instance,
                                     partition=self.partition)
 
+    def _get_partition_cclp_model(self, bigMFinder, use_big_M, use_lazy):
+        """Persistent model of the partitioned problem, built at first use."""
+        if not self.use_persistent_model:
+            return None
+        if self.partition_cclp_model is None:
+            self.partition_cclp_model = PartitionCCLPModel(
+                self.chance_instance_part, bigMFinder, use_big_M=use_big_M,
+                use_lazy=use_lazy)
+            self.partition_cclp_model.build(verbose=True)
+        return self.partition_cclp_model
+
     def _upper_bound(self, bigMFinder, use_big_M, use_lazy=False):
         """ Solve upper-bound partitioned problem and check if feasible.
 
@@ -128,14 +253,21 @@ class AdaptivePartitioner(Solver):
         """
         if self.nb_subsets == self.minimum_partition_size:
             # Obtain first upper bound solution by simple sorting
+            self._tighten_subset_costs(range(self.nb_subsets))
             xUB, z, v_obj, v_bnd = self.upperbounder.first_iteration_bound(
                 self.subset_costs, self.subset_sols)
         else:
+            # Decide which subsets are pruned
+            self._tighten_undecided_subset_costs(
+                range(self.nb_subsets),
+                self.vLB - self.upperbounder.PRUNE_TOL)
             # Solve the partitioned problem to obtain an upper bound
             xUB, z, v_obj, v_bnd = self.upperbounder.partition_bound(
                 self, self.subset_costs,
                 self.vLB, self.zUB, self.merger.deleted_subsets,
-                bigMFinder, self._available_time(), use_big_M, use_lazy)
+                bigMFinder, self._available_time(), use_big_M, use_lazy,
+                cclp_model=self._get_partition_cclp_model(
+                    bigMFinder, use_big_M, use_lazy))
 
         if self._available_time() <= 0:
             return self.xUB, False
@@ -177,6 +309,7 @@ class AdaptivePartitioner(Solver):
 
     def _merge_all_feasible_subsets(self, feasible_subsets):
         print("\n - Merge: all feasible subsets with top infeasible subsets -")
+        self._tighten_subset_costs(range(self.nb_subsets))
         # Find the infeasible subset with largest subset cost
         sorted_subsets = self.merger.sort_subset_costs(
             range(self.nb_subsets), self.subset_costs)
@@ -210,12 +343,13 @@ class AdaptivePartitioner(Solver):
         for c in sorted_subsets:
             del self.subset_costs[c]
             del self.subset_sols[c]
+            del self.subset_cost_bounds[c]
+            del self.subset_duals[c]
         # Evaluate cost of new subset
         sols = []
         for c1 in self.merger.target_subsets:
-            self.subset_costs[c1], sol = self.evaluator.subset_cost(
-                self.partition[c1])
-            self.subset_sols[c1] = sol
+            cost, sol, duals = self._subset_cost(self.partition[c1])
+            self._store_subset_cost(c1, cost, sol, duals=duals)
             sols.append(sol)
             print('New cost of subset ', c1,
                   ' with scenarios', self.partition[c1],
@@ -226,6 +360,11 @@ class AdaptivePartitioner(Solver):
     def _merge(self, xUB, new_subset_costs, use_merger):
         self.did_merge = False
         if use_merger:
+            # Decide whether the new subsets are cheaper than vUB
+            self._tighten_undecided_subset_costs(self.refiner.new_subsets,
+                                                 self.vUB)
+            new_subset_costs = [self.subset_costs[c]
+                                for c in self.refiner.new_subsets]
             if max(new_subset_costs) <= self.vUB:
                 feasible_subsets = self.refiner.feasible_subsets
                 nb_feasible = len(feasible_subsets)
@@ -240,31 +379,52 @@ class AdaptivePartitioner(Solver):
 
     def _split(self, xUB):
         print("\n - Split - ")
+        if self.split_method == 'cost':
+            # The subsets are sorted by cost
+            self._tighten_subset_costs(range(self.nb_subsets))
         self.refiner.vUB = self.vUB
         self.refiner.subset_costs = self.subset_costs
+        if self.split_method == 'dual':
+            self.refiner.add_subset_duals(self.partition, self.subset_duals)
         # Compute a new partition from partition refiner
         self.nb_subsets, self.partition = self.refiner.refine(self.partition,
                                                               xUB)
         self.chance_instance_part.load_partition(
             self.nb_subsets, self.partition)
-        # Evaluate cost of new subsets
+        # Evaluate cost of new subsets: the solution of their parent
+        # subset is feasible and its cost is a bound
         print('Evaluating the cost of new subsets.')
+        parent_bounds = [self._cost_lower_bound(p)
+                         for p in self.refiner.get_parent_subsets()]
         new_subset_sols = []
         new_subset_costs = []
-        for c in self.refiner.new_subsets:
+        for c, (lower_bound, x_start) in zip(self.refiner.new_subsets,
+                                             parent_bounds):
             subset = self.partition[c]
-            cost, sol = self.evaluator.subset_cost(subset)
+            upper_bound = self._cost_upper_bound(subset)
+            if self.use_lazy_costs and (
+                    upper_bound - lower_bound
+                    > self.LAZY_COST_TOL * max(1.0, abs(lower_bound))):
+                self._store_subset_cost(c, upper_bound, None,
+                                        (lower_bound, x_start))
+                new_subset_costs.append(upper_bound)
+                continue
+            if self.use_lazy_costs:
+                # The bounds meet: the parent solution is optimal
+                cost, sol, duals = lower_bound, x_start, None
+            else:
+                cost, sol, duals = self._subset_cost(
+                    subset, x_start=x_start, cost_bound=lower_bound)
             new_subset_sols.append(sol)
             new_subset_costs.append(cost)
-            if c < len(self.subset_costs):
-                self.subset_costs[c] = cost
-                self.subset_sols[c] = sol
-            else:
-                self.subset_costs.append(cost)
-                self.subset_sols.append(sol)
+            self._store_subset_cost(c, cost, sol, duals=duals)
         for c in self.refiner.new_subsets:
             print(' Subset ', c, ' with scenarios: ', self.partition[c])
-            print('        has cost: ', self.subset_costs[c])
+            if self._is_lazy(c):
+                print('        has cost in: [', self.subset_cost_bounds[c][0],
+                      ',', self.subset_costs[c], ']')
+            else:
+                print('        has cost: ', self.subset_costs[c])
         # Improve bound with candidate solutions
         self._improve_vlb_with_candidate_sols(new_subset_sols)
         return new_subset_costs
@@ -278,8 +438,15 @@ class AdaptivePartitioner(Solver):
 
         #   - Subset cost -
         print('\n Calculating cost of each subset in the initial partition.')
-        self.subset_costs, self.subset_sols = self.evaluator.partition_cost(
-            self.partition)
+        if self.split_method == 'dual':
+            self.subset_costs, self.subset_sols, self.subset_duals = \
+                self.evaluator.partition_cost(self.partition,
+                                              return_duals=True)
+        else:
+            self.subset_costs, self.subset_sols = \
+                self.evaluator.partition_cost(self.partition)
+            self.subset_duals = [None] * self.nb_subsets
+        self.subset_cost_bounds = [None] * self.nb_subsets
         # Improve bound with candidate solutions
         self._improve_vlb_with_candidate_sols(self.subset_sols)
 
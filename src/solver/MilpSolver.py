@@ -9,10 +9,17 @@ class MilpSolver(Solver):
     """
     Solve chance-constrained problem in extended formulation,
     i.e., having one binary indicator variable per scenario.
+    The single-scenario costs are solved by nb_eval_workers processes.
     """
-    def __init__(self, chance_instance, time_limit=1800, gap=1e-4):
-        super(MilpSolver, self).__init__(chance_instance, time_limit, gap)
-        self.big_m_finder = BigMFinder(self.chance_instance)
+    def __init__(self, chance_instance, time_limit=1800, gap=1e-4,
+                 nb_threads=1, song_block_size=None, nb_workers=1,
+                 nb_eval_workers=1):
+        super(MilpSolver, self).__init__(chance_instance, time_limit, gap,
+                                         nb_eval_workers=nb_eval_workers)
+        self.big_m_finder = BigMFinder(self.chance_instance,
+                                       nb_threads=nb_threads,
+                                       song_block_size=song_block_size,
+                                       nb_workers=nb_workers)
         self.upper_bounder = UpperBounder(None, None, None)
 
     #   - - - Private methods - - -
@@ -13,14 +13,15 @@ class Solver():
     chance-constrained problem.
     """
 
-    def __init__(self, chance_instance, time_limit, gap):
+    def __init__(self, chance_instance, time_limit, gap, nb_eval_workers=1):
         self.vUB = np.inf
         self.vLB = -np.inf
         self.time_limit = time_limit
         self.gap = gap
         TimeManager.set_limit_and_start_time(time_limit)
         self.chance_instance = chance_instance
-        self.evaluator = Evaluator(self.chance_instance)
+        self.evaluator = Evaluator(self.chance_instance,
+                                   nb_workers=nb_eval_workers)
 
     #   - - - Private methods - - -
     def _compute_gap(self):
@@ -80,17 +81,26 @@ class Solver():
                          use_lazy=False,
                          save_bounds=False,
                          path=None,
-                         verbose=False):
+                         verbose=False,
+                         use_matrix_api=True,
+                         cclp_model=None):
         """
         Instantiate and solve a chance-constrained problem.
         This function is used equivalently for partitioned and original
         problems depending on whether the first input is a chance_instance
-        or a chance_instance_part.
+        or a chance_instance_part. If use_matrix_api is False, the model
+        is built row by row instead of with the Gurobi matrix API.
+        If a persistent cclp_model is given, it is updated with the
+        current partition instead of building a new model.
         """
         start_build = time.time()
-        cclp_model = CCLPModel(chance_instance_part, bigMFinder)
-        cclp_model.build(use_big_M=use_big_M, use_lazy=use_lazy,
-                         verbose=verbose, z_start=z_start)
+        if cclp_model is None:
+            cclp_model = CCLPModel(chance_instance_part, bigMFinder,
+                                   use_matrix_api=use_matrix_api)
+            cclp_model.build(use_big_M=use_big_M, use_lazy=use_lazy,
+                             verbose=verbose, z_start=z_start)
+        else:
+            cclp_model.update(z_start=z_start)
         # - Pruning -
         # Set the indicator variables to 0 for the given indices
         if len(prune_indices) > 0:
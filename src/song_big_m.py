@@ -1,7 +1,56 @@
 import numpy as np
 
 
-def solve_continuous_knapsack(revenue, obj_constant, weights, capacity):
+def select_best_items(values, weights, capacity):
+    """
+    Weighted selection of Balas and Zemel: find the items of largest
+    marginal values, up to the critical item that fills the capacity,
+    in expected linear time instead of sorting all the items.
+
+    Returns:
+        selected (np.array): unordered indices of the selected items.
+    """
+    candidates = np.arange(len(values))
+    selected = []
+    remaining = capacity
+    while len(candidates) > 0 and remaining > 0.0:
+        candidate_values = values[candidates]
+        pivot = candidate_values[len(candidates) // 2]
+        is_greater = candidate_values > pivot
+        greater_weight = weights[candidates[is_greater]].sum()
+        if is_greater.any() and greater_weight >= remaining:
+            candidates = candidates[is_greater]
+            continue
+        is_equal = candidate_values == pivot
+        selected.append(candidates[is_greater | is_equal])
+        remaining -= greater_weight + weights[candidates[is_equal]].sum()
+        candidates = candidates[candidate_values < pivot]
+    return np.concatenate(selected + [np.zeros(0, dtype=int)])
+
+
+def _sort_items(items, values):
+    """Order items by decreasing marginal values, ties by index."""
+    items = np.sort(items)
+    return items[np.argsort(-values[items], kind='stable')]
+
+
+def _fill_knapsack(ordered_items, revenue, weights, capacity,
+                   profit, knapsack_weight):
+    """ Add items in order until the knapsack constraint is tight. """
+    for i in ordered_items:
+        available_capacity = capacity - knapsack_weight
+        if available_capacity > 0.0:
+            quantity = min(available_capacity / weights[i], 1.0)
+            assert quantity >= 0.0
+            profit += revenue[i] * quantity
+            knapsack_weight += weights[i] * quantity
+        else:
+            break
+    return profit, knapsack_weight
+
+
+def solve_continuous_knapsack(revenue, obj_constant, weights, capacity,
+                              use_selection=True):
     """ Add items until the knapsack constraint is tight. """
     profit = -obj_constant
 
@@ -10,25 +59,186 @@ def solve_continuous_knapsack(revenue, obj_constant, weights, capacity):
     for i in zero_indices:
         profit += revenue[i]
 
-    revenue = revenue[weights != 0.0]
-    weights = weights[weights != 0.0]
+    # Only items with a positive revenue are added to the knapsack
+    is_added = (weights != 0.0) & (revenue > 0.0)
+    revenue = revenue[is_added]
+    weights = weights[is_added]
     # Compute the items' marginal values
     values = np.divide(revenue, weights)
-    ordered_values_index = np.argsort(-values)
+    items = np.arange(len(values))
+    if use_selection:
+        # Only sort the items up to the critical item
+        selected = select_best_items(values, weights, capacity)
+        profit, knapsack_weight = _fill_knapsack(
+            _sort_items(selected, values), revenue, weights, capacity,
+            profit, 0.0)
+        is_selected = np.zeros(len(values), dtype=bool)
+        is_selected[selected] = True
+        items = items[~is_selected]
+    else:
+        knapsack_weight = 0.0
+    # Add the other items if the knapsack is not full
+    if capacity - knapsack_weight > 0.0:
+        profit, _ = _fill_knapsack(_sort_items(items, values), revenue,
+                                   weights, capacity, profit,
+                                   knapsack_weight)
+    return profit
 
-    knapsack_weight = 0.0
-    for i in ordered_values_index:
-        available_capacity = capacity - knapsack_weight
-        if available_capacity > 0.0:
-            quantity = min(available_capacity / weights[i], 1.0)
-            assert quantity >= 0.0
-            if revenue[i] > 0.0:
-                profit += revenue[i] * quantity
-                knapsack_weight += weights[i] * quantity
-        else:
-            break
 
-    return profit
+def solve_all_continuous_knapsacks(revenues, obj_constants, weights, capacity,
+                                   return_is_integral=False, tol=1e-9):
+    """
+    Solve all the continuous knapsacks that share the same (positive)
+    weights and capacity in one vectorized pass.
+
+    Args:
+        revenues (np.array): revenues of the items, the last axis
+            indexes the items and the other axes the knapsacks.
+        obj_constants (np.array): constant of each knapsack objective.
+        weights (np.array): weights of the items.
+        capacity (float): capacity of the knapsacks.
+        return_is_integral (bool): also return whether the greedy
+            solution of each knapsack has no fractional item.
+        tol (float): tolerance on the integrality of the items.
+
+    Returns:
+        profits (np.array): optimal profit of each knapsack.
+        is_integral (np.array): only if return_is_integral is True.
+    """
+    revenues = np.asarray(revenues, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    # Add all items with zero weight
+    is_zero_weight = (weights == 0.0)
+    profits = (revenues[..., is_zero_weight].sum(axis=-1)
+               - np.asarray(obj_constants, dtype=float))
+
+    revenues = revenues[..., ~is_zero_weight]
+    weights = weights[~is_zero_weight]
+    # Order the items by decreasing marginal values
+    order = np.argsort(-(revenues / weights), axis=-1)
+    sorted_revenues = np.take_along_axis(revenues, order, axis=-1)
+    sorted_weights = weights[order]
+    # Only items with a positive revenue are added to the knapsack:
+    # each takes the capacity left by the previous ones
+    is_added = sorted_revenues > 0.0
+    added_weights = np.where(is_added, sorted_weights, 0.0)
+    previous_weights = np.cumsum(added_weights, axis=-1) - added_weights
+    quantities = np.clip((capacity - previous_weights) / sorted_weights,
+                         0.0, 1.0)
+    profits += np.where(is_added, sorted_revenues * quantities,
+                        0.0).sum(axis=-1)
+    if return_is_integral:
+        is_fractional = is_added & (quantities > tol) & (quantities < 1 - tol)
+        return profits, ~is_fractional.any(axis=-1)
+    return profits
+
+
+# Weights below this tolerance are considered zero, as in violations.h
+ZERO_WEIGHT_TOL = 1e-6
+# Maximum number of knapsack items solved in a NumPy batch
+MAX_BATCH_SIZE = 2**18
+
+
+def _batched_knapsack_violations(profits, losses, weights, is_zero_weight,
+                                 capacities):
+    """
+    Maximum violation of each constraint profits[j] x <= losses[j] over
+    each of the continuous knapsacks weights[r] x <= capacities[r],
+    following the C++ kernel: zero-weight items are always added and
+    the other items are added by decreasing ratios until the capacity
+    is reached.
+
+    Returns:
+        violations (np.array): of shape (len(profits), len(weights)).
+    """
+    profits = profits[:, None, :]
+    shape = (profits.shape[0],) + weights.shape
+    violations = (np.where(is_zero_weight, profits, 0.0).sum(axis=-1)
+                  - losses[:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(is_zero_weight, -np.inf, profits / weights)
+    order = np.argsort(-ratios, axis=-1)
+    sorted_weights = np.take_along_axis(np.broadcast_to(weights, shape),
+                                        order, axis=-1)
+    sorted_profits = np.take_along_axis(np.broadcast_to(profits, shape),
+                                        order, axis=-1)
+    cumulated_weights = np.cumsum(sorted_weights, axis=-1)
+    thresholds = capacities[:, None] - ZERO_WEIGHT_TOL
+    # Items that fit entirely, then the critical item that fills the
+    # knapsack with its residual weight
+    is_full = cumulated_weights < thresholds
+    is_critical = ~is_full
+    is_critical[..., 1:] &= is_full[..., :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fractions = ((capacities[:, None]
+                      - (cumulated_weights - sorted_weights))
+                     / sorted_weights)
+    quantities = np.where(is_full, 1.0, np.where(is_critical, fractions, 0.0))
+    quantities[sorted_weights == 0.0] = 0.0
+    return violations + (sorted_profits * quantities).sum(axis=-1)
+
+
+def vectorized_violations_block(A_matrices, b_vectors, s_start, s_end,
+                                nb_threads=1, use_selection=True,
+                                max_batch_size=MAX_BATCH_SIZE):
+    """
+    NumPy implementation of violations.compute_violations_block: the
+    knapsacks of all the (s_prime, i_prime) constraints are solved at
+    once for a batch of (s, i) constraints, with batched sorts of the
+    ratios and cumulative sums of the weights.
+
+    Args:
+        A_matrices (np.array): constraint matrices, of shape
+            (nb_scenarios, nb_constraints, nb_vars).
+        b_vectors (np.array): right-hand sides, of shape
+            (nb_scenarios, nb_constraints).
+        s_start, s_end (int): rows [s_start, s_end) of the violations.
+        nb_threads, use_selection: ignored, only kept to share the
+            signature of the compiled kernel.
+        max_batch_size (int): maximum number of knapsack items solved
+            in a batch, which bounds the size of the temporary arrays.
+
+    Returns:
+        violations (np.array): of shape (s_end - s_start, nb_scenarios,
+            nb_constraints).
+    """
+    A_matrices = np.asarray(A_matrices, dtype=float)
+    b_vectors = np.asarray(b_vectors, dtype=float)
+    nb_scenarios, nb_constraints, nb_vars = A_matrices.shape
+    assert 0 <= s_start < s_end <= nb_scenarios
+    # All the knapsacks share the weights of the (s_prime, i_prime) rows
+    weights = A_matrices.reshape(-1, nb_vars)
+    is_zero_weight = weights <= ZERO_WEIGHT_TOL
+    weights = np.where(is_zero_weight, 0.0, weights)
+    capacities = b_vectors.reshape(-1)
+    # Batch the (s, i) constraints: all the constraints of a scenario
+    # unless the temporary arrays would be too large
+    batch_size = int(np.clip(max_batch_size // weights.size,
+                             1, nb_constraints))
+
+    violations = np.zeros((s_end - s_start, nb_scenarios, nb_constraints))
+    for s in range(s_start, s_end):
+        for i_start in range(0, nb_constraints, batch_size):
+            rows = np.arange(i_start, min(i_start + batch_size,
+                                          nb_constraints))
+            row_violations = _batched_knapsack_violations(
+                A_matrices[s, rows], b_vectors[s, rows], weights,
+                is_zero_weight, capacities).reshape(
+                    len(rows), nb_scenarios, nb_constraints)
+            # A constraint is not a knapsack of itself
+            row_violations[np.arange(len(rows)), s, rows] = np.inf
+            scenario_violations = row_violations.min(axis=2)
+            scenario_violations[:, s] = np.minimum(
+                scenario_violations[:, s], 0.0)
+            violations[s - s_start, :, rows] = scenario_violations
+    return violations
+
+
+def vectorized_all_violations(A_matrices, b_vectors, nb_threads=1,
+                              use_selection=True):
+    """NumPy implementation of violations.compute_all_violations."""
+    return vectorized_violations_block(A_matrices, b_vectors, 0,
+                                       np.shape(A_matrices)[0])
 
 
 def song_min_s_prime_violation(nb_constraints, A_sprime, b_sprime, A_si, b_si):
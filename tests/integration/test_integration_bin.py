@@ -59,7 +59,7 @@ class test_IntegrationBinary(unittest.TestCase):
 
     # Parameters for AdaptivePartitioners test sequence
     initPartitions = ['random', 'cost']
-    splitMethods = ['random', 'cost']
+    splitMethods = ['random', 'cost', 'dual']
     bigMMethods = ["naive", "belotti", "song"]
 
     @parameterized.expand(
@@ -84,3 +84,21 @@ class test_IntegrationBinary(unittest.TestCase):
         # Compare output of adaptive partitioner and Gurobi baseline
         self.assertAlmostEqual(method.vUB, self.v, places=5)
         self._compare_two_vectors_of_solutions(self.x, method.xUB)
+
+    @parameterized.expand(
+            itertools.product(initPartitions, splitMethods, [False, True]))
+    def test_adaptive_partitioners_lazy_costs(self, init_part, split_method,
+                                              useMerger):
+        # Only solve the subset costs that are needed
+        method = AdaptivePartitioner(
+            self.chance_instance, split_method=split_method,
+            initial_partition_type=init_part,
+            projection_method='rescaled_max_violation',
+            use_acc_obj=(split_method == 'cost'),
+            use_lazy_costs=True)
+        partitionBigMFinder = BigMFinder(method.chance_instance_part)
+        method.solve(partitionBigMFinder, use_big_M=True,
+                     big_m_method="song", use_merger=useMerger)
+        # Compare output of adaptive partitioner and Gurobi baseline
+        self.assertAlmostEqual(method.vUB, self.v)
+        self._compare_two_vectors_of_solutions(self.x, method.xUB)
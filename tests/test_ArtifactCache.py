@@ -0,0 +1,104 @@
+import os
+import time
+import tempfile
+import unittest
+import numpy as np
+
+from src.ArtifactCache import ArtifactCache
+from src.BigMFinder import BigMFinder
+from src.Evaluator import Evaluator
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.instance.PartitionChanceKnapInstance import \
+    PartitionChanceKnapInstance
+
+
+class test_ArtifactCache(unittest.TestCase):
+    file_location = "./tests/files-for-tests/ccmknap-6-10-30.csv"
+    epsilon = 0.2
+    chance_instance = ChanceKnapInstance(file_location, True, epsilon)
+
+    def setUp(self):
+        self.cache_folder = tempfile.TemporaryDirectory()
+        ArtifactCache.configure(self.cache_folder.name)
+
+    def tearDown(self):
+        ArtifactCache.disable()
+        self.cache_folder.cleanup()
+
+    def test_disabled_cache(self):
+        ArtifactCache.disable()
+        ArtifactCache.save(self.chance_instance, "costs", np.ones(3))
+        self.assertIsNone(ArtifactCache.load(self.chance_instance, "costs"))
+
+    def test_save_and_load(self):
+        self.assertIsNone(ArtifactCache.load(self.chance_instance, "costs"))
+        ArtifactCache.save(self.chance_instance, "costs", np.arange(3.0))
+        np.testing.assert_array_equal(
+            ArtifactCache.load(self.chance_instance, "costs"), np.arange(3.0))
+        # No temporary file is left in the cache
+        self.assertEqual(len(os.listdir(self.cache_folder.name)), 1)
+
+    def test_key_depends_on_var_type(self):
+        binary_instance = ChanceKnapInstance(self.file_location, False,
+                                             self.epsilon)
+        ArtifactCache.save(self.chance_instance, "costs", np.ones(3))
+        self.assertIsNone(ArtifactCache.load(binary_instance, "costs"))
+        # But not on epsilon
+        other_instance = ChanceKnapInstance(self.file_location, True, 0.1)
+        self.assertIsNotNone(ArtifactCache.load(other_instance, "costs"))
+
+    def test_arrays_are_hashed_once(self):
+        chance_instance = ChanceKnapInstance(self.file_location, True,
+                                             self.epsilon)
+        key = ArtifactCache._instance_key(chance_instance)
+        # The hash of the arrays is read from the instance
+        chance_instance.artifact_key = "other-arrays"
+        self.assertNotEqual(ArtifactCache._instance_key(chance_instance), key)
+        # The key still depends on the partition
+        partition_instance = PartitionChanceKnapInstance(chance_instance)
+        partition_instance.load_partition(2, [[0, 1], [2, 3]])
+        first_key = ArtifactCache._instance_key(partition_instance)
+        partition_instance.load_partition(2, [[0, 2], [1, 3]])
+        self.assertNotEqual(ArtifactCache._instance_key(partition_instance),
+                            first_key)
+
+    def test_evict_least_recently_used(self):
+        ArtifactCache.configure(self.cache_folder.name, max_size=2000)
+        ArtifactCache.save(self.chance_instance, "first", np.ones(100))
+        ArtifactCache.save(self.chance_instance, "second", np.ones(100))
+        # Use the first artifact after the second one was written
+        time.sleep(0.01)
+        ArtifactCache.load(self.chance_instance, "first")
+        ArtifactCache.save(self.chance_instance, "third", np.ones(100))
+        self.assertIsNotNone(ArtifactCache.load(self.chance_instance,
+                                                "first"))
+        self.assertIsNone(ArtifactCache.load(self.chance_instance, "second"))
+        self.assertIsNotNone(ArtifactCache.load(self.chance_instance,
+                                                "third"))
+        # Artifacts larger than the cache are not saved
+        ArtifactCache.save(self.chance_instance, "large", np.ones(1000))
+        self.assertIsNone(ArtifactCache.load(self.chance_instance, "large"))
+
+    def test_evaluator_reuses_scenario_costs(self):
+        costs = Evaluator(self.chance_instance).get_all_single_scenario_costs()
+        cached_costs = ArtifactCache.load(self.chance_instance,
+                                          "scenario-costs")
+        np.testing.assert_array_equal(cached_costs, costs)
+        # The cached costs are used instead of solving the scenarios
+        ArtifactCache.save(self.chance_instance, "scenario-costs",
+                           np.zeros(len(costs)))
+        self.assertEqual(
+            Evaluator(self.chance_instance).get_all_single_scenario_costs(),
+            [0.0] * len(costs))
+
+    def test_song_big_m_reuses_violations(self):
+        big_m_finder = BigMFinder(self.chance_instance)
+        big_m_finder.run_song_et_al_big_m(self.chance_instance)
+        other_big_m_finder = BigMFinder(self.chance_instance)
+        other_big_m_finder.run_song_et_al_big_m(self.chance_instance)
+        np.testing.assert_array_equal(other_big_m_finder.song_violations,
+                                      big_m_finder.song_violations)
+        for s in range(self.chance_instance.get_nb_scenarios()):
+            np.testing.assert_array_equal(
+                other_big_m_finder.get_vector_big_M(s),
+                big_m_finder.get_vector_big_M(s))
@@ -5,8 +5,18 @@ from parameterized import parameterized
 
 from src.BigMFinder import BigMFinder
 from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.instance.PartitionChanceKnapInstance import \
+    PartitionChanceKnapInstance
 from violations import compute_all_violations as cpp_song
+from violations import compute_violations_block
+from violations import solve_knapsack as cpp_knapsack
 from src.song_big_m import compute_all_violations as python_song
+from src.song_big_m import solve_continuous_knapsack
+from src.song_big_m import solve_all_continuous_knapsacks
+from src.song_big_m import select_best_items
+from src.song_big_m import vectorized_all_violations
+from src.song_big_m import vectorized_violations_block
+from src.TimeManager import TimeManager
 
 
 class test_BigMFinder(unittest.TestCase):
@@ -33,9 +43,11 @@ class test_BigMFinder(unittest.TestCase):
         naiveBigM = (A[i, 0] + A[i, 1] - b[i])
         self.assertEqual(naiveBigM, bigMFinder.bigM[s][i])
 
-    def _assert_all_big_M_equal_naive(self, bigMFinder):
-        self.nb_scenarios = self.chance_instance.get_nb_scenarios()
-        self.nb_constraints = self.chance_instance.get_nb_constraints(0)
+    def _assert_all_big_M_equal_naive(self, bigMFinder, chance_instance=None):
+        if chance_instance is None:
+            chance_instance = self.chance_instance
+        self.nb_scenarios = chance_instance.get_nb_scenarios()
+        self.nb_constraints = chance_instance.get_nb_constraints(0)
         for s in range(self.nb_scenarios):
             for i in range(self.nb_constraints):
                 self.assertEqual(bigMFinder._naive_bigM(s)[i],
@@ -62,6 +74,130 @@ class test_BigMFinder(unittest.TestCase):
         upper_bound = 3000
         bigMFinder.run_belotti_et_al_big_M(upper_bound)
 
+    def test_belotti_et_al_binary_with_workers(self):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+        chance_instance = ChanceKnapInstance(file_location, False, 0.2)
+        partition = [[0, 3, 7], [1], [2, 4, 5, 6], [8, 9]]
+        part_instance = PartitionChanceKnapInstance(chance_instance)
+        part_instance.load_partition(len(partition), partition)
+        upper_bound = 3000
+        for instance in [chance_instance, part_instance]:
+            bigMFinder = BigMFinder(instance)
+            bigMFinder.run_belotti_et_al_big_M(upper_bound)
+            parallelBigMFinder = BigMFinder(instance, nb_workers=2)
+            parallelBigMFinder.run_belotti_et_al_big_M(upper_bound)
+            for c in range(instance.get_nb_scenarios()):
+                np.testing.assert_array_equal(parallelBigMFinder.bigM[c],
+                                              bigMFinder.bigM[c])
+
+    @parameterized.expand([1, 2])
+    def test_belotti_et_al_binary_with_workers_time_limit(self, nb_workers):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+        chance_instance = ChanceKnapInstance(file_location, False, 0.2)
+        bigMFinder = BigMFinder(chance_instance, nb_workers=nb_workers)
+        start_time, time_limit = (TimeManager.start_time,
+                                  TimeManager.time_limit)
+        TimeManager.set_limit_and_start_time(0)
+        try:
+            # No time left: all big M's are the relaxation bounds
+            bigMFinder.run_belotti_et_al_big_M(3000)
+            table, _ = bigMFinder._relaxed_belotti_table(3000)
+            np.testing.assert_array_equal(bigMFinder.bigM, table)
+            # or the naive big M's without screening
+            bigMFinder.run_belotti_et_al_big_M(3000, use_lp_screening=False)
+            self._assert_all_big_M_equal_naive(bigMFinder, chance_instance)
+        finally:
+            TimeManager.start_time = start_time
+            TimeManager.time_limit = time_limit
+
+    @parameterized.expand([20, 3000])
+    def test_belotti_et_al_binary_lp_screening(self, upper_bound):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+        chance_instance = ChanceKnapInstance(file_location, False, 0.2)
+        bigMFinder = BigMFinder(chance_instance)
+        bigMFinder.run_belotti_et_al_big_M(upper_bound)
+        self.assertGreater(bigMFinder.nb_mips_avoided, 0)
+        mipBigMFinder = BigMFinder(chance_instance)
+        mipBigMFinder.run_belotti_et_al_big_M(upper_bound,
+                                              use_lp_screening=False)
+        self.assertEqual(mipBigMFinder.nb_mips_avoided, 0)
+        for s in range(chance_instance.get_nb_scenarios()):
+            for i in range(chance_instance.get_nb_constraints(s)):
+                screened_big_m = bigMFinder.bigM[s][i]
+                mip_big_m = mipBigMFinder.bigM[s][i]
+                if screened_big_m > 0.0:
+                    self.assertAlmostEqual(screened_big_m, mip_big_m)
+                else:
+                    self.assertLessEqual(mip_big_m, screened_big_m + 1e-6)
+
+    @parameterized.expand([True, False])
+    def test_belotti_et_al_incremental(self, continuous_var):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+        chance_instance = ChanceKnapInstance(file_location, continuous_var,
+                                             0.2)
+        first_partition = [[0, 3, 7], [1], [2, 4, 5, 6], [8, 9]]
+        second_partition = [[0, 3, 7], [1], [2, 4], [5, 6], [8, 9]]
+        part_instance = PartitionChanceKnapInstance(chance_instance)
+        part_instance.load_partition(len(first_partition), first_partition)
+        bigMFinder = BigMFinder(part_instance, incremental=True)
+        for partition, vUB in [(first_partition, 3000),
+                               (second_partition, 2900)]:
+            part_instance.load_partition(len(partition), partition)
+            bigMFinder.update_big_M(len(partition), vUB)
+            refBigMFinder = BigMFinder(part_instance)
+            refBigMFinder.update_big_M(len(partition), vUB)
+            for c, subset in enumerate(partition):
+                is_new = (partition is second_partition
+                          and subset in [[2, 4], [5, 6]])
+                if partition is first_partition or is_new:
+                    np.testing.assert_array_equal(bigMFinder.bigM[c],
+                                                  refBigMFinder.bigM[c])
+                else:
+                    # Big M's of a looser vUB remain valid
+                    self.assertTrue(
+                        (bigMFinder.bigM[c] >= refBigMFinder.bigM[c]).all())
+        # Only the rows of new subsets or of a too loose vUB are stale
+        self.assertFalse(bigMFinder._stale_rows(2900, second_partition).any())
+        stale_rows = bigMFinder._stale_rows(2800, [[0, 3, 7, 1], [2, 4],
+                                                   [5, 6], [8, 9]])
+        self.assertEqual(np.flatnonzero(stale_rows.any(axis=1)).tolist(),
+                         [0, 1, 3, 7, 8, 9])
+        self.assertTrue(bigMFinder._stale_rows(2000, second_partition).all())
+        self.assertTrue(bigMFinder._stale_rows(3100, second_partition).all())
+
+    @parameterized.expand(itertools.product(range(3), [-1.0, 0.5, 3.0]))
+    def test_all_continuous_knapsacks_same_as_single(self, i, capacity):
+        np.random.seed(i)
+        k, m, n = (6, 4, 10)
+        revenues = np.random.rand(k, m, n) - 0.3
+        obj_constants = np.random.rand(k, m)
+        weights = np.random.rand(n)
+        weights[weights <= 0.2] = 0.0
+        profits = solve_all_continuous_knapsacks(revenues, obj_constants,
+                                                 weights, capacity)
+        for s in range(k):
+            for j in range(m):
+                profit = solve_continuous_knapsack(
+                    revenues[s, j], obj_constants[s, j], weights, capacity)
+                self.assertAlmostEqual(profits[s, j], profit)
+
+    def test_belotti_et_al_on_partition(self):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+        chance_instance = ChanceKnapInstance(file_location, True, 0.2)
+        partition = [[0, 3, 7], [1], [2, 4, 5, 6], [8, 9]]
+        part_instance = PartitionChanceKnapInstance(chance_instance)
+        part_instance.load_partition(len(partition), partition)
+        bigMFinder = BigMFinder(part_instance)
+        upper_bound = 3000
+        bigMFinder.run_belotti_et_al_big_M(upper_bound)
+        for c in range(len(partition)):
+            A = part_instance.get_matrix_A(c)
+            b = part_instance.get_vector_b(c)
+            for j in range(part_instance.get_nb_constraints(c)):
+                big_m = solve_continuous_knapsack(
+                    A[j], b[j], chance_instance.get_vector_c(), upper_bound)
+                self.assertAlmostEqual(bigMFinder.bigM[c][j], big_m)
+
     def test_song(self):
         file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
         epsilon = 0.2
@@ -97,6 +233,101 @@ class test_BigMFinder(unittest.TestCase):
         python_violations = python_song(A, b)
         np.testing.assert_array_almost_equal(cpp_violations, python_violations)
 
+    @parameterized.expand(
+            itertools.product(range(3), [1, 2, 4]))
+    def test_song_cpp_same_for_all_nb_threads(self, i, nb_threads):
+        np.random.seed(i)
+        k, m, n = (12, 6, 8)
+        A = np.random.rand(k, m, n)
+        b = np.random.rand(k, m)
+        A[A <= 0.3] = 0.0
+        serial_violations = cpp_song(A, b)
+        parallel_violations = cpp_song(A, b, nb_threads=nb_threads)
+        np.testing.assert_array_equal(serial_violations,
+                                      parallel_violations)
+
+    def test_song_with_threads(self):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+        chance_instance = ChanceKnapInstance(file_location, True, 0.2)
+        bigMFinder = BigMFinder(chance_instance, nb_threads=2)
+        bigMFinder.run_song_et_al_big_m(chance_instance)
+        serialBigMFinder = BigMFinder(chance_instance)
+        serialBigMFinder.run_song_et_al_big_m(chance_instance)
+        np.testing.assert_array_equal(bigMFinder.bigM,
+                                      serialBigMFinder.bigM)
+
+    @parameterized.expand(range(3))
+    def test_song_violations_block_same_as_full(self, i):
+        np.random.seed(i)
+        k, m, n = (12, 6, 8)
+        A = np.random.rand(k, m, n)
+        b = np.random.rand(k, m)
+        A[A <= 0.3] = 0.0
+        full_violations = cpp_song(A, b)
+        for start, end in [(0, 5), (5, 12), (11, 12)]:
+            block = compute_violations_block(A, b, start, end)
+            np.testing.assert_array_equal(full_violations[start:end], block)
+
+    @parameterized.expand([1, 3, 10])
+    def test_song_streamed_same_as_tensor(self, block_size):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-30.csv"
+        chance_instance = ChanceKnapInstance(file_location, True, 0.2)
+        streamBigMFinder = BigMFinder(chance_instance,
+                                      song_block_size=block_size)
+        streamBigMFinder.run_song_et_al_big_m(chance_instance)
+        bigMFinder = BigMFinder(chance_instance)
+        bigMFinder.run_song_et_al_big_m(chance_instance)
+        np.testing.assert_array_equal(streamBigMFinder.bigM, bigMFinder.bigM)
+
+    @parameterized.expand([(1, 2**24), (3, 100)])
+    def test_song_partition_same_as_loop(self, seed, max_aggregated):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-30.csv"
+        chance_instance = ChanceKnapInstance(file_location, True, 0.2)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        np.random.seed(seed)
+        scenarios = np.random.permutation(nb_scenarios).tolist()
+        partition = [scenarios[:5], scenarios[5:6], scenarios[6:14]]
+        partition += [[s] for s in scenarios[14:]]
+        part_instance = PartitionChanceKnapInstance(chance_instance)
+        part_instance.load_partition(len(partition), partition)
+        bigMFinder = BigMFinder(part_instance)
+        bigMFinder.MAX_AGGREGATED_VIOLATIONS = max_aggregated
+        bigMFinder.update_big_M(len(partition), None, method='song',
+                                chance_instance=chance_instance,
+                                partition=partition)
+        # Reference: aggregate each row of violations in a loop
+        q = int(np.floor(part_instance.get_epsilon()*len(partition)) + 1)
+        m = chance_instance.get_nb_constraints(0)
+        for c, subset in enumerate(partition):
+            for j in range(len(subset) * m):
+                all_violations = bigMFinder.song_violations[
+                    subset[j // m], :, j % m]
+                violations = np.sort([min(all_violations[sub])
+                                      for sub in partition])
+                self.assertEqual(bigMFinder.bigM[c][j], violations[q])
+
+    @parameterized.expand([2, 1])
+    def test_song_streamed_same_as_tensor_on_partition(self, kept_factor):
+        file_location = "./tests/files-for-tests/ccmknap-6-10-30.csv"
+        chance_instance = ChanceKnapInstance(file_location, True, 0.2)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        partition = [list(range(s, nb_scenarios, 10)) for s in range(10)]
+        part_instance = PartitionChanceKnapInstance(chance_instance)
+        part_instance.load_partition(len(partition), partition)
+        # A kept factor of one forces the computation of full rows
+        streamBigMFinder = BigMFinder(part_instance, song_block_size=7)
+        streamBigMFinder.SONG_KEPT_FACTOR = kept_factor
+        streamBigMFinder.update_big_M(len(partition), None, method='song',
+                                      chance_instance=chance_instance,
+                                      partition=partition)
+        bigMFinder = BigMFinder(part_instance)
+        bigMFinder.update_big_M(len(partition), None, method='song',
+                                chance_instance=chance_instance,
+                                partition=partition)
+        for c in range(len(partition)):
+            np.testing.assert_array_equal(streamBigMFinder.bigM[c],
+                                          bigMFinder.bigM[c])
+
     @parameterized.expand(
             itertools.product(range(10),
                               [(8, 8, 5), (5, 5, 10),  (12, 10, 5)]))
@@ -144,3 +375,110 @@ class test_BigMFinder(unittest.TestCase):
                                 cpp_violations, python_violations)
         np.testing.assert_array_almost_equal(cpp_violations,
                                              python_violations)
+
+    @parameterized.expand(fileNames)
+    def test_song_numpy_same_as_cpp(self, filename):
+        chance_instance = ChanceKnapInstance(filename, True, 0.2)
+        A = chance_instance.get_matrices_A()
+        b = chance_instance.get_vectors_b()
+        numpy_violations = vectorized_all_violations(A, b)
+        np.testing.assert_array_almost_equal(cpp_song(A, b),
+                                             numpy_violations)
+        nb_scenarios = A.shape[0]
+        np.testing.assert_array_equal(
+            vectorized_violations_block(A, b, nb_scenarios // 2,
+                                        nb_scenarios),
+            numpy_violations[nb_scenarios // 2:])
+
+    @parameterized.expand(
+            itertools.product(range(5), [(8, 8, 5), (5, 5, 10)]))
+    def test_song_numpy_same_as_python_random(self, i, sizes):
+        np.random.seed(i)
+        A = np.random.rand(*sizes)
+        b = np.random.rand(*sizes[:2])
+        A[A <= 0.3] = 0.0
+        np.testing.assert_array_almost_equal(vectorized_all_violations(A, b),
+                                             python_song(A, b))
+
+    @parameterized.expand([1, 3])
+    def test_song_numpy_batches_of_constraints(self, nb_batch_constraints):
+        np.random.seed(nb_batch_constraints)
+        k, m, n = (6, 8, 5)
+        A = np.random.rand(k, m, n)
+        b = np.random.rand(k, m)
+        A[A <= 0.3] = 0.0
+        np.testing.assert_array_equal(
+            vectorized_violations_block(
+                A, b, 0, k, max_batch_size=nb_batch_constraints * k * m * n),
+            vectorized_all_violations(A, b))
+
+    @parameterized.expand(fileNames)
+    def test_song_cpp_selection_same_as_sort_on_instances(self, filename):
+        chance_instance = ChanceKnapInstance(filename, True, 0.2)
+        A = chance_instance.get_matrices_A()
+        b = chance_instance.get_vectors_b()
+        sort_violations = cpp_song(A, b, use_selection=False)
+        np.testing.assert_array_equal(cpp_song(A, b), sort_violations)
+        np.testing.assert_array_equal(
+            compute_violations_block(A, b, 0, A.shape[0]), sort_violations)
+
+    @parameterized.expand(
+            itertools.product(range(10),
+                              [(8, 8, 5), (5, 5, 10),  (12, 10, 5)]))
+    def test_song_cpp_selection_same_as_sort_random(self, i, sizes):
+        np.random.seed(i)
+        A = np.random.rand(*sizes)
+        b = np.random.rand(*sizes[:2])
+        A[A <= 0.3] = 0.0
+        np.testing.assert_array_equal(cpp_song(A, b),
+                                      cpp_song(A, b, use_selection=False))
+
+    @parameterized.expand(range(5))
+    def test_single_knapsack_selection_same_as_sort(self, i):
+        np.random.seed(i)
+        for _ in range(100):
+            n = np.random.randint(1, 200)
+            revenue = np.random.rand(n)
+            weights = np.random.rand(n)
+            weights[weights <= 0.2] = 0.0
+            capacity = np.random.rand() * n / 2
+            if i % 2 == 1:
+                # Ties between the marginal values of items
+                revenue = np.round(revenue * 4) / 4
+                weights = np.round(weights * 4) / 4
+            python_profit = solve_continuous_knapsack(
+                revenue, 0.3, weights, capacity, use_selection=False)
+            self.assertEqual(solve_continuous_knapsack(
+                revenue, 0.3, weights, capacity), python_profit)
+            cpp_profit = cpp_knapsack(revenue, 0.3, weights, capacity,
+                                      use_selection=False)
+            self.assertEqual(cpp_knapsack(revenue, 0.3, weights, capacity),
+                             cpp_profit)
+            self.assertAlmostEqual(cpp_profit, python_profit)
+
+    @parameterized.expand(range(5))
+    def test_select_best_items_up_to_critical_item(self, i):
+        np.random.seed(i)
+        n = 5000
+        values = np.random.rand(n)
+        if i % 2 == 1:
+            values = np.round(values * 8) / 8
+        weights = np.random.rand(n) + 0.1
+        capacity = np.random.rand() * n / 4
+        selected = select_best_items(values, weights, capacity)
+        is_selected = np.zeros(n, dtype=bool)
+        is_selected[selected] = True
+        # Selected items have larger values than the others
+        if (~is_selected).any():
+            self.assertGreaterEqual(values[selected].min(),
+                                    values[~is_selected].max())
+        # The selected items fill the knapsack, up to the critical item
+        self.assertGreaterEqual(weights[selected].sum(), capacity)
+        is_critical = values == values[selected].min()
+        self.assertLess(weights[is_selected & ~is_critical].sum(), capacity)
+        # Same profit as sorting all the items
+        self.assertAlmostEqual(
+            solve_continuous_knapsack(values * weights, 0.0, weights,
+                                      capacity),
+            solve_continuous_knapsack(values * weights, 0.0, weights,
+                                      capacity, use_selection=False))
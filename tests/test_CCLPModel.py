@@ -0,0 +1,65 @@
+import unittest
+import itertools
+from parameterized import parameterized
+
+from src.BigMFinder import BigMFinder
+from src.optim.CCLPModel import CCLPModel
+from src.optim.BigMKnapsackModel import BigMKnapsackModel
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+
+
+class test_CCLPModel(unittest.TestCase):
+    file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+    epsilon = 0.2
+
+    def _build_and_solve(self, chance_instance, big_m_finder,
+                         use_matrix_api, use_big_M, use_lazy):
+        cclp_model = CCLPModel(chance_instance, big_m_finder,
+                               use_matrix_api=use_matrix_api)
+        cclp_model.build(use_big_M=use_big_M, use_lazy=use_lazy,
+                         verbose=False)
+        cclp_model.solve()
+        return cclp_model
+
+    @parameterized.expand(itertools.product([True, False], [True, False],
+                                            [True, False]))
+    def test_matrix_api_same_as_rows(self, continuous_var, use_big_M,
+                                     use_lazy):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             continuous_var, self.epsilon)
+        big_m_finder = BigMFinder(chance_instance)
+        big_m_finder.run_song_et_al_big_m(chance_instance)
+        matrix_model = self._build_and_solve(
+            chance_instance, big_m_finder, True, use_big_M, use_lazy)
+        row_model = self._build_and_solve(
+            chance_instance, big_m_finder, False, use_big_M, use_lazy)
+        self.assertEqual(matrix_model.grb_model.NumConstrs,
+                         row_model.grb_model.NumConstrs)
+        self.assertEqual(matrix_model.grb_model.NumGenConstrs,
+                         row_model.grb_model.NumGenConstrs)
+        if use_big_M:
+            self.assertEqual(matrix_model.skip_counter,
+                             row_model.skip_counter)
+        self.assertAlmostEqual(matrix_model.get_obj_val(),
+                               row_model.get_obj_val(), places=5)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        self.assertEqual(len(matrix_model.get_var_z_val()), nb_scenarios)
+        self.assertEqual(len(matrix_model.get_var_x_val()),
+                         chance_instance.get_nb_vars())
+
+    def test_knapsack_matrix_api_same_as_rows(self):
+        chance_instance = ChanceKnapInstance(self.file_location, False,
+                                             self.epsilon)
+        models = []
+        for use_matrix_api in [True, False]:
+            model = BigMKnapsackModel(chance_instance, 30.0,
+                                      use_matrix_api=use_matrix_api)
+            model.build()
+            models.append(model)
+        for s, i in [(0, 0), (3, 2), (9, 9)]:
+            bounds = []
+            for model in models:
+                model.initialize_violation_objective(s, i)
+                model.solve()
+                bounds.append(model.get_obj_bnd())
+            self.assertAlmostEqual(bounds[0], bounds[1], places=5)
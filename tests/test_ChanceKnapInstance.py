@@ -1,5 +1,8 @@
 import unittest
 import math
+import os
+import shutil
+import tempfile
 import numpy as np
 
 from src.instance.ChanceKnapInstance import ChanceKnapInstance
@@ -108,13 +111,17 @@ class test_ChanceKnapInstance(unittest.TestCase):
         for i in range(knap_constraint_qty):
             violation = matrix_A3[i, :].dot(var_x_val) - b_vector[i]
             if violation > 1e-7:
-                scenario_infeasibility.append(violation)
+                violation = violation/np.linalg.norm(matrix_A3[i, :])
+            else:
+                violation = 0.0
+            scenario_infeasibility.append(violation)
         chance_instance = ChanceKnapInstance(self.file_location,
                                              self.continuous_var,
                                              self.epsilon)
         object_scenario_inf = chance_instance._get_scenario_infeasibility(
             var_x_val)
-        self.assertEqual(object_scenario_inf[3], scenario_infeasibility)
+        np.testing.assert_allclose(object_scenario_inf[3],
+                                   scenario_infeasibility)
 
     def test_get_inf_scenarios(self):
         chance_instance = ChanceKnapInstance(self.file_location,
@@ -139,7 +146,8 @@ class test_ChanceKnapInstance(unittest.TestCase):
             var_x_val)
         object_is_scenario_inf = chance_instance._get_infeasible_scenarios(
             object_scenario_inf)
-        self.assertEqual(is_scenario_infeasible, object_is_scenario_inf)
+        self.assertEqual(is_scenario_infeasible,
+                         object_is_scenario_inf.tolist())
 
     def test_check_infeasibility(self):
         chance_instance = ChanceKnapInstance(self.file_location,
@@ -192,3 +200,98 @@ class test_ChanceKnapInstance(unittest.TestCase):
         sol_is_feasible = qty_feas_scenarios >= feas_scenarios_needed
         object_sol_is_feasible = chance_instance.check_feasibility(var_x_val)
         self.assertEqual(sol_is_feasible, object_sol_is_feasible)
+
+    def test_binary_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_location = os.path.join(temp_dir, "instance.csv")
+            shutil.copyfile(self.file_location, file_location)
+            # First run parses the csv file and writes the cache
+            parsed_instance = ChanceKnapInstance(file_location,
+                                                 self.continuous_var,
+                                                 self.epsilon,
+                                                 use_cache=True)
+            self.assertTrue(parsed_instance._is_cache_fresh())
+            # Second run reads the memory-mapped cache
+            cached_instance = ChanceKnapInstance(file_location,
+                                                 self.continuous_var,
+                                                 self.epsilon,
+                                                 use_cache=True)
+            self.assertFalse(hasattr(cached_instance, "complete_file"))
+            self.assertTrue(isinstance(cached_instance.matrices_A.base,
+                                       np.memmap))
+            self.assertEqual(cached_instance.get_nb_vars(),
+                             parsed_instance.get_nb_vars())
+            self.assertEqual(cached_instance.get_nb_scenarios(),
+                             parsed_instance.get_nb_scenarios())
+            self.assertEqual(cached_instance.get_nb_constraints(0),
+                             parsed_instance.get_nb_constraints(0))
+            np.testing.assert_array_equal(cached_instance.get_vector_c(),
+                                          parsed_instance.get_vector_c())
+            np.testing.assert_array_equal(cached_instance.get_matrices_A(),
+                                          parsed_instance.get_matrices_A())
+            np.testing.assert_array_equal(cached_instance.get_vectors_b(),
+                                          parsed_instance.get_vectors_b())
+            np.testing.assert_array_equal(cached_instance.get_proba(),
+                                          parsed_instance.get_proba())
+            # Cache is stale once the csv file is modified
+            mtime = os.path.getmtime(file_location) + 10
+            os.utime(file_location, (mtime, mtime))
+            self.assertFalse(cached_instance._is_cache_fresh())
+
+    def test_no_binary_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_location = os.path.join(temp_dir, "instance.csv")
+            shutil.copyfile(self.file_location, file_location)
+            # The cache is only written on demand
+            chance_instance = ChanceKnapInstance(file_location,
+                                                 self.continuous_var,
+                                                 self.epsilon)
+            self.assertFalse(chance_instance._is_cache_fresh())
+
+    def test_scenario_infeasibility_matches_row_loop(self):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             self.continuous_var,
+                                             self.epsilon)
+        var_x_val = np.ones(6)
+        var_x_val[[1, 5]] = 0
+        object_scenario_inf = chance_instance._get_scenario_infeasibility(
+            var_x_val)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        self.assertEqual(object_scenario_inf.shape, (nb_scenarios, 10))
+        for s in range(nb_scenarios):
+            matrix_A = chance_instance.get_matrix_A(s)
+            vector_b = chance_instance.get_vector_b(s)
+            for i in range(10):
+                violation = matrix_A[i, :].dot(var_x_val) - vector_b[i]
+                if violation > 1e-6:
+                    violation = violation/np.linalg.norm(matrix_A[i, :])
+                else:
+                    violation = 0.0
+                self.assertAlmostEqual(object_scenario_inf[s, i], violation)
+
+    def test_count_infeasible_scenarios_in_batch(self):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             self.continuous_var,
+                                             self.epsilon)
+        np.random.seed(0)
+        candidate_sols = np.random.rand(20, 6)
+        candidate_sols[0, :] = 0.0
+        nb_infeasible_scenarios = chance_instance.count_infeasible_scenarios(
+            candidate_sols)
+        for x, nb_infeasible in zip(candidate_sols, nb_infeasible_scenarios):
+            self.assertEqual(chance_instance.is_feasible(x)[1],
+                             nb_infeasible)
+
+    def test_find_first_feasible(self):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             self.continuous_var,
+                                             self.epsilon)
+        # Evaluate a single candidate per chunk
+        chance_instance.MAX_BATCH_EVALUATIONS = 1
+        infeasible_x = np.ones(6)
+        feasible_x = np.zeros(6)
+        self.assertEqual(chance_instance.find_first_feasible(
+            [infeasible_x, infeasible_x, feasible_x, feasible_x]), 2)
+        self.assertIsNone(chance_instance.find_first_feasible(
+            [infeasible_x, infeasible_x]))
+        self.assertIsNone(chance_instance.find_first_feasible([]))
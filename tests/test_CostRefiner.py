@@ -0,0 +1,177 @@
+import unittest
+import itertools
+import numpy as np
+from parameterized import parameterized
+
+from src.refiner.CostRefiner import CostRefiner
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.Evaluator import Evaluator
+from src.LRUCache import LRUCache
+
+
+class test_CostRefiner(unittest.TestCase):
+    # Read chance instance from data
+    file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+    epsilon = 0.2
+    partition = [[0, 1, 2], [3, 4, 5, 6], [7, 8, 9]]
+    infeasible_scenarios = [0, 2, 3, 4, 5, 7]
+
+    def _evaluate_accurate_splits(self, nb_workers, memory_size=16,
+                                  vUB=np.inf, use_screening=False):
+        chance_instance = ChanceKnapInstance(
+            self.file_location, True, self.epsilon)
+        refiner = CostRefiner(chance_instance, use_acc_obj=True,
+                              nb_workers=nb_workers,
+                              memory_size=memory_size,
+                              use_screening=use_screening)
+        refiner.partition = [list(subset) for subset in self.partition]
+        refiner.infeasible_scenarios = self.infeasible_scenarios
+        refiner.vUB = vUB
+        refiner.subset_costs = [
+            Evaluator(chance_instance).subset_cost(subset)[0]
+            for subset in self.partition]
+        refiner._evaluate_accurate_splits([0, 1, 2])
+        return refiner
+
+    def _perform_accurate_split(self, refiner):
+        refiner.mu_counter = 0
+        refiner.splitted_subsets = []
+        refiner.new_subsets = []
+        refiner._perform_accurate_split()
+
+    def test_memory_of_accurate_splits(self):
+        refiner = self._evaluate_accurate_splits(1)
+        # The last subset has a single infeasible scenario
+        self.assertEqual(sorted(refiner.post_split_costs), [0, 1])
+        self.assertEqual(refiner.count, 2)
+        # Solutions are read from memory in the next evaluation
+        refiner._evaluate_accurate_splits([0, 1, 2])
+        self.assertEqual(refiner.count, 0)
+        self.assertEqual(refiner.memory.nb_hits, 2)
+        # Memory is capped
+        refiner = self._evaluate_accurate_splits(1, memory_size=1)
+        self.assertEqual(len(refiner.memory), 1)
+        refiner._evaluate_accurate_splits([0, 1, 2])
+        self.assertEqual(refiner.count, 1)
+
+    def test_parallel_same_as_sequential(self):
+        refiner = self._evaluate_accurate_splits(1)
+        parallel_refiner = self._evaluate_accurate_splits(2)
+        self.assertEqual(parallel_refiner.count, 2)
+        for c in refiner.post_split_costs:
+            self.assertAlmostEqual(refiner.post_split_costs[c],
+                                   parallel_refiner.post_split_costs[c],
+                                   places=5)
+            self.assertEqual(
+                sorted(refiner.left_subsets[c] + refiner.right_subsets[c]),
+                sorted(parallel_refiner.left_subsets[c]
+                       + parallel_refiner.right_subsets[c]))
+
+    @parameterized.expand([1, 2])
+    def test_same_key_solved_once(self, nb_workers):
+        refiner = self._evaluate_accurate_splits(nb_workers)
+        exact_costs = dict(refiner.post_split_costs)
+        refiner.memory = LRUCache(16)
+        refiner.count = 0
+        refiner._solve_accurate_splits([0, 1, 0, 1], None)
+        self.assertEqual(refiner.count, 2)
+        self.assertEqual(len(refiner.memory), 2)
+        for c, cost in exact_costs.items():
+            self.assertAlmostEqual(refiner.post_split_costs[c], cost,
+                                   places=5)
+
+    def test_accurate_obj_same_as_brute_force(self):
+        chance_instance = ChanceKnapInstance(
+            self.file_location, True, self.epsilon)
+        evaluator = Evaluator(chance_instance)
+        scenarios = [0, 1, 2, 3, 4, 5, 6]
+        infeasible_scenarios = [1, 2, 4, 6]
+        # Minimum over all the splits of the maximum subset cost
+        best_cost = np.inf
+        for is_left in itertools.product([True, False],
+                                         repeat=len(scenarios)):
+            left = [s for s, l in zip(scenarios, is_left) if l]
+            right = [s for s, l in zip(scenarios, is_left) if not l]
+            if ((set(left) & set(infeasible_scenarios))
+                    and (set(right) & set(infeasible_scenarios))):
+                best_cost = min(best_cost, max(evaluator.subset_cost(left)[0],
+                                               evaluator.subset_cost(right)[0]))
+        cost, left, right = CostRefiner.solve_accurate_obj_model(
+            chance_instance, scenarios, infeasible_scenarios)
+        self.assertAlmostEqual(cost, best_cost, delta=1e-4*best_cost)
+        # Symmetry breaking: the first infeasible scenario is on the left
+        self.assertIn(1, left)
+        self.assertEqual(sorted(left + right), scenarios)
+
+    def test_cut_off_splits(self):
+        refiner = self._evaluate_accurate_splits(1)
+        exact_costs = dict(refiner.post_split_costs)
+        # No split can beat a lower vUB
+        vUB = min(exact_costs.values()) - 1.0
+        refiner.vUB = vUB
+        refiner.memory = LRUCache(16)
+        refiner.post_split_costs = dict()
+        refiner._solve_accurate_splits(list(exact_costs), vUB)
+        self.assertGreater(len(refiner.post_split_bounds), 0)
+        for c, cost in exact_costs.items():
+            if c in refiner.post_split_costs:
+                self.assertAlmostEqual(refiner.post_split_costs[c], cost,
+                                       places=5)
+                continue
+            self.assertNotIn(c, refiner.post_split_costs)
+            self.assertGreater(refiner.post_split_bounds[c][0], vUB)
+            # The best split found is kept
+            self.assertEqual(sorted(refiner.left_subsets[c]
+                                    + refiner.right_subsets[c]),
+                             self.partition[c])
+        # The cut off splits are solved exactly when they must be compared
+        refiner._solve_accurate_splits(list(refiner.post_split_bounds), None)
+        for c, cost in exact_costs.items():
+            self.assertAlmostEqual(refiner.post_split_costs[c], cost,
+                                   places=5)
+
+    def test_no_cutoff_above_subset_costs(self):
+        chance_instance = ChanceKnapInstance(
+            self.file_location, True, self.epsilon)
+        vUB = min(Evaluator(chance_instance).subset_cost(subset)[0]
+                  for subset in self.partition) - 1.0
+        refiner = self._evaluate_accurate_splits(1, vUB=vUB)
+        self.assertEqual(refiner.count, 2)
+        self.assertEqual(refiner.post_split_bounds, dict())
+        self._perform_accurate_split(refiner)
+        # Each accurate obj model is solved once, and exactly
+        self.assertEqual(refiner.count, len(refiner.memory))
+        for post_split_cost, _, _ in refiner.memory.items.values():
+            self.assertLess(post_split_cost, np.inf)
+
+    @parameterized.expand([4150.0, 4165.0])
+    def test_no_candidate_solved_twice(self, vUB):
+        # vUB is between the cost of a subset and its post-split cost
+        # Without screening, the candidates are solved as without vUB
+        refiner = self._evaluate_accurate_splits(1, vUB=vUB)
+        self.assertEqual(refiner.count,
+                         self._evaluate_accurate_splits(1).count)
+        self.assertEqual(refiner.post_split_bounds, dict())
+        # With screening, the models are only solved when needed
+        screened_refiner = self._evaluate_accurate_splits(
+            1, vUB=vUB, use_screening=True)
+        self._perform_accurate_split(screened_refiner)
+        self.assertEqual(screened_refiner.count, len(screened_refiner.memory))
+
+    @parameterized.expand([np.inf, 4100.0, 4000.0])
+    def test_screening_same_split(self, vUB):
+        refiner = self._evaluate_accurate_splits(1, vUB=vUB)
+        screened_refiner = self._evaluate_accurate_splits(
+            1, vUB=vUB, use_screening=True)
+        self.assertLess(screened_refiner.count, refiner.count)
+        self.assertEqual(len(screened_refiner.screened_subsets),
+                         refiner.count - screened_refiner.count)
+        # The children of a subset cost at least as much as the subset
+        exact_costs = self._evaluate_accurate_splits(1).post_split_costs
+        for c, (lower_bound, upper_bound) in \
+                screened_refiner.post_split_bounds.items():
+            self.assertLessEqual(lower_bound, exact_costs[c])
+            self.assertGreaterEqual(upper_bound, exact_costs[c] - 1e-4)
+        self._perform_accurate_split(refiner)
+        self._perform_accurate_split(screened_refiner)
+        self.assertEqual(refiner.partition, screened_refiner.partition)
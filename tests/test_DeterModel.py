@@ -53,3 +53,40 @@ class test_DeterModel(unittest.TestCase):
             self.assertTrue(detModel.get_obj_val() < objUnbounded)
             # Test objective with all constraint is smaller
             self.assertTrue(detModel.get_obj_val() > allScenariosObj)
+
+    def test_matrix_api_same_as_rows(self):
+        nb_scenarios = self.chance_instance.get_nb_scenarios()
+        for scenarios in [0, 3, list(range(nb_scenarios))]:
+            detModel = DeterModel(self.chance_instance)
+            detModel.build(scenarios)
+            detModel.solve()
+            rowModel = DeterModel(self.chance_instance, use_matrix_api=False)
+            rowModel.build(scenarios)
+            rowModel.solve()
+            self.assertEqual(detModel.grb_model.NumConstrs,
+                             rowModel.grb_model.NumConstrs)
+            self.assertAlmostEqual(detModel.get_obj_val(),
+                                   rowModel.get_obj_val())
+        # Constraints of the matrix API can be removed
+        detModel.remove(0)
+        detModel.solve()
+        self.assertEqual(detModel.grb_model.NumConstrs,
+                         rowModel.grb_model.NumConstrs
+                         - self.chance_instance.get_nb_constraints(0))
+
+    def test_scenario_duals(self):
+        for continuous_var in [True, False]:
+            chance_instance = ChanceKnapInstance(self.file_location,
+                                                 continuous_var, self.epsilon)
+            nb_scenarios = chance_instance.get_nb_scenarios()
+            detModel = DeterModel(chance_instance)
+            detModel.build(list(range(nb_scenarios)))
+            detModel.solve()
+            scenario_duals = detModel.get_scenario_duals()
+            self.assertEqual(sorted(scenario_duals), list(range(nb_scenarios)))
+            # The solution satisfies all scenarios and some of them bind
+            for dual, slack in scenario_duals.values():
+                self.assertGreaterEqual(dual, 0.0)
+                self.assertGreaterEqual(slack, -1e-6)
+            self.assertGreater(max(dual for dual, _
+                                   in scenario_duals.values()), 0.0)
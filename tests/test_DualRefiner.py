@@ -0,0 +1,78 @@
+import unittest
+from parameterized import parameterized
+
+from src.refiner.DualRefiner import DualRefiner
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.optim.DeterModel import DeterModel
+from src.Evaluator import Evaluator
+
+
+class test_DualRefiner(unittest.TestCase):
+    # Read chance instance from data
+    file_location = "./tests/files-for-tests/ccmknap-6-10-30.csv"
+    epsilon = 0.2
+
+    def _load(self, continuous_var):
+        chance_instance = ChanceKnapInstance(
+            self.file_location, continuous_var, self.epsilon)
+        # Make the scenarios of an unconstrained solution infeasible
+        detModel = DeterModel(chance_instance)
+        detModel.build([])
+        detModel.solve()
+        chance_instance.check_feasibility(detModel.get_var_x_val())
+        return chance_instance
+
+    def test_Initialize(self):
+        chance_instance = ChanceKnapInstance(
+            self.file_location, True, self.epsilon)
+        DualRefiner(chance_instance)
+
+    def test_get_sorted_scenarios(self):
+        chance_instance = self._load(True)
+        refiner = DualRefiner(chance_instance)
+        scenarios = list(range(10))
+        sorted_scenarios = refiner._get_sorted_scenarios(scenarios)
+        self.assertEqual(sorted(sorted_scenarios), scenarios)
+        self.assertEqual(refiner.evaluator.nb_solves, 1)
+        subset_duals = Evaluator(chance_instance).subset_duals(scenarios)
+        duals = [subset_duals[s][0] for s in sorted_scenarios]
+        self.assertEqual(duals, sorted(duals, reverse=True))
+        # Dual values are read from memory
+        refiner._get_sorted_scenarios(scenarios[::-1])
+        self.assertEqual(refiner.memory.nb_hits, 1)
+        self.assertEqual(refiner.evaluator.nb_solves, 1)
+
+    @parameterized.expand([True, False])
+    def test_duals_of_solved_subsets(self, continuous_var):
+        chance_instance = self._load(continuous_var)
+        refiner = DualRefiner(chance_instance)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        partition = [list(range(c, nb_scenarios, 3)) for c in range(3)]
+        # The dual values are read when the subset costs are solved
+        _, _, subset_duals = Evaluator(chance_instance).partition_cost(
+            partition, return_duals=True)
+        refiner.add_subset_duals(partition, subset_duals)
+        refiner.refine(partition, None)
+        # Only the subsets created by the refiner are solved
+        self.assertEqual(refiner.evaluator.nb_solves,
+                         len(refiner.memory) - len(partition))
+        self.assertEqual(refiner.memory.nb_misses,
+                         refiner.evaluator.nb_solves)
+
+    @parameterized.expand([True, False])
+    def test_refine(self, continuous_var):
+        chance_instance = self._load(continuous_var)
+        refiner = DualRefiner(chance_instance)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        partition = [list(range(c, nb_scenarios, 3)) for c in range(3)]
+        nb_subsets, new_partition = refiner.refine(partition, None)
+        self.assertGreater(nb_subsets, len(partition))
+        self.assertEqual(sorted(s for subset in new_partition
+                                for s in subset), list(range(nb_scenarios)))
+        # The scenarios with the largest dual values are separated
+        for c in refiner.splitted_subsets:
+            sorted_scenarios = [
+                s for s in refiner._get_sorted_scenarios(partition[c])
+                if refiner.is_scenario_infeasible[s]]
+            self.assertIn(sorted_scenarios[0], new_partition[c])
+            self.assertNotIn(sorted_scenarios[1], new_partition[c])
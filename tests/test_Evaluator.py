@@ -1,4 +1,7 @@
 import unittest
+import numpy as np
+from gurobipy import GRB
+from parameterized import parameterized
 
 from src.Evaluator import Evaluator
 from src.instance.ChanceKnapInstance import ChanceKnapInstance
@@ -17,7 +20,8 @@ class test_Evaluator(unittest.TestCase):
         evaluator.subset_cost([0])
 
     def test_subset_cost_decreases(self):
-        evaluator = Evaluator(self.chance_instance)
+        evaluator = Evaluator(self.chance_instance,
+                              use_persistent_model=False)
         nb_scenarios = self.chance_instance.get_nb_scenarios()
         subset = [0]
         subset_cost, _ = evaluator.subset_cost(subset)
@@ -27,6 +31,18 @@ class test_Evaluator(unittest.TestCase):
             self.assertGreaterEqual(subset_cost, new_cost)
             subset_cost = new_cost
 
+    def test_persistent_subset_cost_decreases(self):
+        evaluator = Evaluator(self.chance_instance)
+        nb_scenarios = self.chance_instance.get_nb_scenarios()
+        subset = [0]
+        subset_cost, _ = evaluator.subset_cost(subset)
+        for i in range(1, nb_scenarios):
+            subset.append(i)
+            new_cost, _ = evaluator.subset_cost(subset)
+            # Warm-started solves are exact up to the LP tolerance
+            self.assertGreaterEqual(subset_cost, new_cost - 1e-6)
+            subset_cost = new_cost
+
     def test_scenario_costs(self):
         evaluator = Evaluator(self.chance_instance)
         costs = evaluator.scenario_costs([0, 1])
@@ -38,3 +54,97 @@ class test_Evaluator(unittest.TestCase):
         costs, sols = evaluator.partition_cost([[0, 1], [2, 3]])
         self.assertEqual(len(costs), 2)
         self.assertEqual(len(sols), 2)
+
+    @parameterized.expand([True, False])
+    def test_persistent_model_same_as_fresh_models(self, continuous_var):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             continuous_var, self.epsilon)
+        evaluator = Evaluator(chance_instance)
+        fresh_evaluator = Evaluator(chance_instance,
+                                    use_persistent_model=False)
+        rng = np.random.default_rng(1)
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        subsets = [[0], [0, 1], 2, [1, 2, 3]]
+        subsets += [rng.choice(nb_scenarios, 5, replace=False).tolist()
+                    for _ in range(10)]
+        for subset in subsets:
+            cost, sol = evaluator.subset_cost(subset)
+            fresh_cost, _ = fresh_evaluator.subset_cost(subset)
+            self.assertAlmostEqual(cost, fresh_cost, places=5)
+            self.assertEqual(len(sol), chance_instance.get_nb_vars())
+        # Only the constraints of the last subset are in the model
+        self.assertEqual(sorted(evaluator.deter_model.feasibility_constraint),
+                         sorted(subsets[-1]))
+
+    @parameterized.expand([True, False])
+    def test_parallel_same_as_sequential(self, continuous_var):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             continuous_var, self.epsilon)
+        evaluator = Evaluator(chance_instance)
+        parallel_evaluator = Evaluator(chance_instance, nb_workers=2)
+        parallel_evaluator.MIN_PARALLEL_SUBSETS = 1
+        nb_scenarios = chance_instance.get_nb_scenarios()
+        scenarios = list(range(nb_scenarios))
+        for cost, parallel_cost in zip(
+                evaluator.scenario_costs(scenarios),
+                parallel_evaluator.scenario_costs(scenarios)):
+            self.assertAlmostEqual(cost, parallel_cost, places=5)
+        # Results are returned in the order of the partition
+        partition = [[s, (s + 1) % nb_scenarios] for s in scenarios][::-1]
+        costs, sols = evaluator.partition_cost(partition)
+        parallel_costs, parallel_sols = parallel_evaluator.partition_cost(
+            partition)
+        self.assertEqual(len(parallel_sols), len(partition))
+        for cost, parallel_cost in zip(costs, parallel_costs):
+            self.assertAlmostEqual(cost, parallel_cost, places=5)
+
+    @parameterized.expand([True, False])
+    def test_warm_start_from_parent(self, continuous_var):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             continuous_var, self.epsilon)
+        evaluator = Evaluator(chance_instance)
+        fresh_evaluator = Evaluator(chance_instance,
+                                    use_persistent_model=False)
+        parent = list(range(10))
+        parent_cost, parent_sol = evaluator.subset_cost(parent)
+        # Children with a lower cost, and with the cost of their parent
+        for child in [[0, 2, 4, 6, 8], [1, 3, 5, 7, 9], parent]:
+            cost, sol = evaluator.subset_cost(
+                child, x_start=parent_sol, cost_bound=parent_cost)
+            fresh_cost, _ = fresh_evaluator.subset_cost(
+                child, x_start=parent_sol, cost_bound=parent_cost)
+            self.assertAlmostEqual(cost, fresh_cost, places=5)
+            self.assertGreaterEqual(cost, parent_cost - 1e-6)
+            self.assertAlmostEqual(
+                cost, Evaluator(chance_instance).subset_cost(child)[0],
+                places=5)
+        # The warm start is removed for the next subsets
+        self.assertAlmostEqual(evaluator.subset_cost(parent)[0],
+                               parent_cost, places=5)
+
+    @parameterized.expand([True, False])
+    def test_duals_read_with_subset_cost(self, continuous_var):
+        chance_instance = ChanceKnapInstance(self.file_location,
+                                             continuous_var, self.epsilon)
+        evaluator = Evaluator(chance_instance)
+        subset = list(range(10))
+        cost, sol, subset_duals = evaluator.subset_cost(subset,
+                                                        return_duals=True)
+        self.assertEqual(evaluator.nb_solves, 1)
+        self.assertEqual(cost, evaluator.subset_cost(subset)[0])
+        self.assertEqual(sorted(subset_duals), subset)
+        # Same dual values when they are solved on their own
+        duals_evaluator = Evaluator(chance_instance)
+        for s, (dual, slack) in duals_evaluator.subset_duals(subset).items():
+            self.assertAlmostEqual(subset_duals[s][0], dual, places=5)
+            self.assertAlmostEqual(subset_duals[s][1], slack, places=5)
+        if not continuous_var:
+            # Only the linear relaxation of binary models is solved
+            self.assertEqual(duals_evaluator.deter_model.grb_model.Status,
+                             GRB.LOADED)
+        # Duals of a whole partition
+        partition = [subset, list(range(10, 20))]
+        costs, _, partition_duals = evaluator.partition_cost(
+            partition, return_duals=True)
+        self.assertEqual(len(partition_duals), len(partition))
+        self.assertEqual(partition_duals[0], subset_duals)
@@ -0,0 +1,30 @@
+import unittest
+
+from src.LRUCache import LRUCache
+
+
+class test_LRUCache(unittest.TestCase):
+
+    def test_least_recently_used_is_removed(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        # Use "a": "b" is now the least recently used item
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("b", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_hits_and_misses(self):
+        cache = LRUCache(4)
+        self.assertEqual(cache.get("a", default=0), 0)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("a")
+        self.assertEqual(cache.nb_hits, 2)
+        self.assertEqual(cache.nb_misses, 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nb_hits, 0)
@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+
+from src.Partition import Partition
+
+
+class test_Partition(unittest.TestCase):
+    subsets = [[4, 0, 2], [1, 5], [3, 6, 7]]
+
+    def _assert_labels(self, partition):
+        for c, subset in enumerate(partition):
+            self.assertTrue((partition.labels[subset] == c).all())
+        self.assertEqual((partition.labels >= 0).sum(),
+                         sum(len(subset) for subset in partition))
+
+    def test_initialize(self):
+        partition = Partition(self.subsets)
+        self.assertEqual(len(partition), 3)
+        self.assertEqual(partition, self.subsets)
+        self.assertEqual(partition[0], [4, 0, 2])
+        self._assert_labels(partition)
+        # Scenarios that are not in the partition have no label
+        partition = Partition(self.subsets, nb_scenarios=10)
+        self.assertEqual(partition.labels[9], -1)
+
+    def test_split_and_merge(self):
+        partition = Partition(self.subsets)
+        # Split as a list of lists
+        partition[0] = [4, 2]
+        partition.append([0])
+        self.assertEqual(partition, [[4, 2], [1, 5], [3, 6, 7], [0]])
+        self._assert_labels(partition)
+        # Merge two subsets and delete the merged one
+        partition[1] = partition[1] + partition[3]
+        partition.delete_subsets([3])
+        self.assertEqual(partition, [[4, 2], [1, 5, 0], [3, 6, 7]])
+        self._assert_labels(partition)
+        del partition[0]
+        self.assertEqual(partition, [[1, 5, 0], [3, 6, 7]])
+        self._assert_labels(partition)
+
+    def test_copy_is_a_snapshot(self):
+        partition = Partition(self.subsets)
+        snapshot = partition.copy()
+        partition[0] = [4]
+        partition.append([0, 2])
+        self.assertEqual(snapshot, self.subsets)
+        self._assert_labels(snapshot)
+
+    def test_per_subset_values(self):
+        partition = Partition(self.subsets)
+        order, offsets = partition.csr()
+        self.assertEqual(order.tolist(), [4, 0, 2, 1, 5, 3, 6, 7])
+        self.assertEqual(offsets.tolist(), [0, 3, 5, 8])
+        self.assertEqual(partition.count([0, 2, 6, 8]).tolist(), [2, 0, 1])
+        values = np.arange(8) + 1
+        self.assertEqual(partition.subset_sum(values).tolist(), [9, 8, 19])
+        self.assertEqual(partition.subset_min(values).tolist(), [1, 2, 4])
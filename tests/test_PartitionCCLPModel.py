@@ -0,0 +1,108 @@
+import unittest
+import itertools
+from parameterized import parameterized
+
+from src.BigMFinder import BigMFinder
+from src.optim.CCLPModel import CCLPModel
+from src.optim.PartitionCCLPModel import PartitionCCLPModel
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.instance.PartitionChanceKnapInstance import \
+    PartitionChanceKnapInstance
+
+
+class test_PartitionCCLPModel(unittest.TestCase):
+    file_location = "./tests/files-for-tests/ccmknap-6-10-10.csv"
+    epsilon = 0.2
+    partition = [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    # Split the first subset
+    new_partition = [[0, 2], [4, 5, 6], [7, 8, 9], [1, 3]]
+
+    def _load(self, continuous_var, partition, big_m_method="naive"):
+        self.chance_instance = ChanceKnapInstance(
+            self.file_location, continuous_var, self.epsilon)
+        self.chance_instance_part = PartitionChanceKnapInstance(
+            self.chance_instance)
+        self.chance_instance_part.load_partition(len(partition), partition)
+        self.big_m_finder = BigMFinder(self.chance_instance_part)
+        self._load_partition(partition, big_m_method)
+
+    def _load_partition(self, partition, big_m_method="naive"):
+        self.chance_instance_part.load_partition(len(partition), partition)
+        self.big_m_finder.update_big_M(len(partition), None,
+                                       method=big_m_method,
+                                       chance_instance=self.chance_instance,
+                                       partition=partition)
+
+    def _fresh_objective(self, use_big_M):
+        cclp_model = CCLPModel(self.chance_instance_part, self.big_m_finder)
+        cclp_model.build(use_big_M=use_big_M, verbose=False)
+        cclp_model.solve()
+        return cclp_model.get_obj_val()
+
+    def _solve(self, cclp_model, z_start=None):
+        cclp_model.update(z_start=z_start)
+        cclp_model.solve()
+        return cclp_model.get_obj_val()
+
+    @parameterized.expand(itertools.product([True, False], [True, False],
+                                            [True, False]))
+    def test_update_same_as_fresh_model(self, continuous_var, use_big_M,
+                                        use_matrix_api):
+        self._load(continuous_var, self.partition)
+        cclp_model = PartitionCCLPModel(
+            self.chance_instance_part, self.big_m_finder,
+            use_big_M=use_big_M, use_matrix_api=use_matrix_api)
+        cclp_model.build(verbose=False)
+        self.assertEqual(cclp_model.nb_added_subsets, 3)
+        self.assertAlmostEqual(self._solve(cclp_model),
+                               self._fresh_objective(use_big_M), places=5)
+        # Only the changed subsets are updated
+        self._load_partition(self.new_partition)
+        objective = self._solve(cclp_model)
+        self.assertEqual(cclp_model.nb_added_subsets, 2)
+        self.assertEqual(cclp_model.nb_removed_subsets, 1)
+        self.assertAlmostEqual(objective, self._fresh_objective(use_big_M),
+                               places=5)
+        self.assertEqual(len(cclp_model.get_var_z_val()), 4)
+        # Merge the last subsets
+        merged_partition = [[0, 2], [4, 5, 6, 7, 8, 9, 1, 3]]
+        self._load_partition(merged_partition)
+        objective = self._solve(cclp_model)
+        self.assertEqual(cclp_model.nb_added_subsets, 1)
+        self.assertEqual(cclp_model.nb_removed_subsets, 3)
+        self.assertAlmostEqual(objective, self._fresh_objective(use_big_M),
+                               places=5)
+
+    @parameterized.expand([True, False])
+    def test_change_big_m_in_place(self, continuous_var):
+        # Song et al needs more subsets than the quantile index
+        partition = [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+        self._load(continuous_var, partition)
+        cclp_model = PartitionCCLPModel(
+            self.chance_instance_part, self.big_m_finder, use_big_M=True)
+        cclp_model.build(verbose=False)
+        self._solve(cclp_model)
+        nb_constraints = cclp_model.grb_model.NumConstrs
+        # Tighter big M's for the same partition
+        self._load_partition(partition, big_m_method="song")
+        objective = self._solve(cclp_model)
+        self.assertEqual(cclp_model.nb_added_subsets, 0)
+        self.assertAlmostEqual(objective, self._fresh_objective(True),
+                               places=5)
+        if not continuous_var:
+            # Rows of binary variables are never built again
+            self.assertGreater(cclp_model.nb_changed_bigM, 0)
+            self.assertEqual(cclp_model.grb_model.NumConstrs, nb_constraints)
+
+    def test_pruning_is_reset(self):
+        self._load(True, self.partition)
+        cclp_model = PartitionCCLPModel(
+            self.chance_instance_part, self.big_m_finder, use_big_M=True)
+        cclp_model.build(verbose=False)
+        cclp_model.update()
+        cclp_model.fix_z_to_zero(0)
+        cclp_model.solve()
+        self.assertEqual(cclp_model.get_var_z_val()[0], 0.0)
+        self.assertAlmostEqual(self._solve(cclp_model, z_start={1: 1}),
+                               self._fresh_objective(True), places=5)
+        self.assertEqual(cclp_model.var_z[0].UB, 1.0)
@@ -108,3 +108,13 @@ class test_Refiner(unittest.TestCase):
         self.assertEqual(refiner.partition[1], [0, 2, 3])
         self.assertEqual(refiner.partition[2], [6, 7])
         self.assertEqual(refiner.partition[3], [4, 8])
+
+    def test_get_parent_subsets(self):
+        chance_instance = ChanceKnapInstance(
+            self.file_location, True, self.epsilon)
+        refiner = Refiner(chance_instance, False)
+        refiner.old_partition = [[1, 4, 5], [2, 3], [6, 7, 8]]
+        # Split subsets 0 and 2, then split the new subset again
+        refiner.partition = [[1], [2, 3], [6, 7], [4], [8], [5]]
+        refiner.new_subsets = [0, 3, 2, 4, 5]
+        self.assertEqual(refiner.get_parent_subsets(), [0, 0, 2, 2, 0])
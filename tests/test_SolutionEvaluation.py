@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+
+from src.instance.ChanceKnapInstance import ChanceKnapInstance
+from src.instance.SolutionEvaluation import SolutionEvaluation
+
+
+class test_SolutionEvaluation(unittest.TestCase):
+    file_location = "./tests/files-for-tests/ccmknap-6-10-5.csv"
+    epsilon = 0.2
+    chance_instance = ChanceKnapInstance(file_location, True, epsilon)
+
+    def test_initialize(self):
+        SolutionEvaluation(self.chance_instance, np.zeros(6))
+
+    def test_slacks(self):
+        var_x_val = np.ones(6)
+        var_x_val[[1, 5]] = 0
+        evaluation = SolutionEvaluation(self.chance_instance, var_x_val)
+        for s in range(self.chance_instance.get_nb_scenarios()):
+            A = self.chance_instance.get_matrix_A(s)
+            b = self.chance_instance.get_vector_b(s)
+            for i in range(self.chance_instance.get_nb_constraints(s)):
+                slack = b[i] - A[i, :].dot(var_x_val)
+                rescaled_slack = slack/np.linalg.norm(A[i, :])
+                self.assertAlmostEqual(evaluation.slacks[s, i], slack)
+                self.assertAlmostEqual(evaluation.rescaled_slacks[s, i],
+                                       rescaled_slack)
+
+    def test_rescaled_violations(self):
+        var_x_val = np.ones(6)
+        evaluation = SolutionEvaluation(self.chance_instance, var_x_val)
+        violations = evaluation.get_rescaled_violations(1e-6)
+        self.assertTrue((violations >= 0).all())
+        self.assertTrue((violations[evaluation.slacks >= 0] == 0).all())
+        np.testing.assert_allclose(
+            violations[evaluation.slacks < -1e-6],
+            -evaluation.rescaled_slacks[evaluation.slacks < -1e-6])
+
+    def test_min_rescaled_slack(self):
+        evaluation = SolutionEvaluation(self.chance_instance, np.zeros(6))
+        margin = evaluation.get_min_rescaled_slack([0, 2])
+        self.assertAlmostEqual(
+            margin, evaluation.rescaled_slacks[[0, 2]].min())
+        self.assertGreater(margin, 0.)
+
+    def test_evaluation_is_shared(self):
+        chance_instance = ChanceKnapInstance(self.file_location, True,
+                                             self.epsilon)
+        evaluation = chance_instance.evaluate_solution(np.zeros(6))
+        self.assertIs(chance_instance.evaluate_solution([0] * 6), evaluation)
+        # Only the last few evaluations are kept
+        for k in range(chance_instance.NB_SAVED_EVALUATIONS):
+            chance_instance.evaluate_solution(np.full(6, k + 1.0))
+        self.assertIsNot(chance_instance.evaluate_solution(np.zeros(6)),
+                         evaluation)
@@ -14,14 +14,22 @@ struct Comp {
         weights = nullptr;
     }
 
+    // Strict total order: items with equal ratios are ordered by index,
+    // so that any algorithm that orders the items gives the same order
     bool operator()(int i, int j) {
-        if (profits[i] == 0 && weights[i] == 0) {
-            return false;
-        } else if (profits[j] == 0 && weights[j] == 0) {
-            return true;
-        } else {
-            return profits[i] * weights[j] > profits[j] * weights[i];
+        bool iZero = (profits[i] == 0 && weights[i] == 0);
+        bool jZero = (profits[j] == 0 && weights[j] == 0);
+        if (iZero != jZero) {
+            return jZero;
+        }
+        if (!iZero) {
+            double iValue = profits[i] * weights[j];
+            double jValue = profits[j] * weights[i];
+            if (iValue != jValue) {
+                return iValue > jValue;
+            }
         }
+        return i < j;
     }
 };
 
@@ -34,20 +42,22 @@ void bind(
     comp.weights = weights;
 }
 
-void update(
+bool update(
     double* profits, double* loss,
     double* weights, double* capacity,
     int n,
     double* minViolPtr,
     int* indices,
-    bool reverse
+    bool reverse,
+    int nbSorted
 ) {
+    // Only the first nbSorted indices, in the order of the update, are
+    // sorted: return false if the knapsack needs the other items
     double violation = -*loss;
     double weight = 0.0;
 
-    // Add zero-weight items no matter where they are in the indices list
-    for (int ii = 0; ii < n; ii+=1) {
-        int i = indices[ii];
+    // Add zero-weight items in the order of the items
+    for (int i = 0; i < n; i+=1) {
         if (weights[i] <= 1e-6) {
             violation += profits[i];
         }
@@ -57,7 +67,12 @@ void update(
     int jstart = reverse ? n - 1 : 0;
     int jend = reverse ? -1 : n;
     int jstep = reverse ? -1 : 1;
+    int nbVisited = 0;
     for (int jj = jstart; jj != jend; jj += jstep) {
+        if (nbVisited == nbSorted) {
+            return false;
+        }
+        nbVisited += 1;
         int j = indices[jj];
         // Ignore items with zero-weights: they have already been added
         if (weights[j] <= 1e-6) {
@@ -80,6 +95,99 @@ void update(
     if (violation < *minViolPtr) {
         *minViolPtr = violation;
     }
+    return true;
+}
+
+int partitionIndices(int* indices, int lo, int hi, Comp& comp) {
+    // Partition indices[lo, hi) around a median-of-three pivot: the items
+    // before the returned position come before the pivot in the order
+    int mid = lo + (hi - lo) / 2;
+    if (comp(indices[mid], indices[lo])) {
+        std::swap(indices[mid], indices[lo]);
+    }
+    if (comp(indices[hi - 1], indices[lo])) {
+        std::swap(indices[hi - 1], indices[lo]);
+    }
+    if (comp(indices[hi - 1], indices[mid])) {
+        std::swap(indices[hi - 1], indices[mid]);
+    }
+    std::swap(indices[mid], indices[hi - 1]);
+    int pivot = indices[hi - 1];
+    int i = lo;
+    for (int j = lo; j < hi - 1; j++) {
+        if (comp(indices[j], pivot)) {
+            std::swap(indices[i], indices[j]);
+            i++;
+        }
+    }
+    std::swap(indices[i], indices[hi - 1]);
+    return i;
+}
+
+double partWeight(int* indices, int lo, int hi, double* weights,
+                  bool* hasItem) {
+    // Total weight of the non-zero-weight items of indices[lo, hi)
+    double weight = 0.0;
+    *hasItem = false;
+    for (int jj = lo; jj < hi; jj++) {
+        int j = indices[jj];
+        if (weights[j] > 1e-6) {
+            weight += weights[j];
+            *hasItem = true;
+        }
+    }
+    return weight;
+}
+
+int selectFront(int* indices, int lo, int hi, double* weights,
+                double capacity, Comp& comp) {
+    // Weighted selection of Balas and Zemel: move the first items of the
+    // order to indices[lo, end), until the critical item that fills the
+    // capacity, in expected linear time. Returns end.
+    double remaining = capacity;
+    bool hasItem;
+    while (lo < hi) {
+        int p = partitionIndices(indices, lo, hi, comp);
+        double weight = partWeight(indices, lo, p, weights, &hasItem);
+        if (hasItem && weight >= remaining) {
+            hi = p;
+            continue;
+        }
+        remaining -= weight;
+        if (weights[indices[p]] > 1e-6) {
+            if (weights[indices[p]] >= remaining) {
+                return p + 1;
+            }
+            remaining -= weights[indices[p]];
+        }
+        lo = p + 1;
+    }
+    return hi;
+}
+
+int selectBack(int* indices, int lo, int hi, double* weights,
+               double capacity, Comp& comp) {
+    // Same as selectFront for the last items of the order, which are the
+    // first items of a reverse update. Returns the start of the selection.
+    double remaining = capacity;
+    bool hasItem;
+    while (lo < hi) {
+        int p = partitionIndices(indices, lo, hi, comp);
+        double weight = partWeight(indices, p + 1, hi, weights, &hasItem);
+        if (hasItem && weight >= remaining) {
+            lo = p + 1;
+            continue;
+        }
+        remaining -= weight;
+        if (weights[indices[p]] > 1e-6) {
+            if (weights[indices[p]] >= remaining) {
+                return p;
+            }
+            remaining -= weights[indices[p]];
+        }
+        hi = p;
+    }
+    return lo;
 }
 
 void compute(
@@ -89,58 +197,227 @@ void compute(
     double* sViolPtr,
     double* tViolPtr,
     int* indices,
-    Comp& comp
+    Comp& comp,
+    bool useSelection
 ) {
+    // Start from the identity so that the result of the sort, and hence
+    // the violations, do not depend on the previous calls of the thread
+    for (int j = 0; j < n; j++) {
+        indices[j] = j;
+    }
     bind(comp, slhs, tlhs);
-    std::sort(indices, indices + n, comp);
-    update(slhs, srhs, tlhs, trhs, n, sViolPtr, indices, false);
-    update(tlhs, trhs, slhs, srhs, n, tViolPtr, indices, true);
+    if (!useSelection) {
+        std::sort(indices, indices + n, comp);
+        update(slhs, srhs, tlhs, trhs, n, sViolPtr, indices, false, n);
+        update(tlhs, trhs, slhs, srhs, n, tViolPtr, indices, true, n);
+        return;
+    }
+    // Only sort the first items, used by the update of s, and the last
+    // items, used by the reverse update of t. The other items are only
+    // sorted if an update needs them.
+    int front = selectFront(indices, 0, n, tlhs, *trhs - 1e-6, comp);
+    int back = selectBack(indices, front, n, slhs, *srhs - 1e-6, comp);
+    std::sort(indices, indices + front, comp);
+    std::sort(indices + back, indices + n, comp);
+    bool isSorted = (front == back);
+    if (!update(slhs, srhs, tlhs, trhs, n, sViolPtr, indices, false,
+                isSorted ? n : front)) {
+        std::sort(indices + front, indices + back, comp);
+        isSorted = true;
+        update(slhs, srhs, tlhs, trhs, n, sViolPtr, indices, false, n);
+    }
+    if (!update(tlhs, trhs, slhs, srhs, n, tViolPtr, indices, true,
+                isSorted ? n : n - back)) {
+        std::sort(indices + front, indices + back, comp);
+        update(tlhs, trhs, slhs, srhs, n, tViolPtr, indices, true, n);
+    }
 }
 
-void computeAllViolations(
-    double* lhs,
-    double* rhs,
-    int k,
+double solveKnapsack(
+    double* profits, double loss,
+    double* weights, double capacity,
     int n,
-    int m,
-    double* violations
+    bool useSelection
 ) {
-    double* sViolPtr = nullptr;
-    double* tViolPtr = nullptr;
-    Comp comp;
+    // Maximum violation of a single constraint over a knapsack
+    double violation = std::numeric_limits<double>::infinity();
     int* indices = new int[n];
+    Comp comp;
     for (int j = 0; j < n; j++) {
         indices[j] = j;
     }
+    bind(comp, profits, weights);
+    int front = n;
+    if (useSelection) {
+        front = selectFront(indices, 0, n, weights, capacity - 1e-6, comp);
+    }
+    std::sort(indices, indices + front, comp);
+    if (!update(profits, &loss, weights, &capacity, n, &violation, indices,
+                false, front)) {
+        std::sort(indices + front, indices + n, comp);
+        update(profits, &loss, weights, &capacity, n, &violation, indices,
+               false, n);
+    }
+    delete[] indices;
+    return violation;
+}
 
-    for (int s = 0; s < k; s++) {
+void computeScenarioViolations(
+    double* lhs,
+    double* rhs,
+    int k,
+    int n,
+    int m,
+    int s,
+    double* violations,
+    int* indices,
+    Comp& comp,
+    bool useSelection
+) {
+    // Pairs of constraints of scenario s
+    for (int i = 0; i < m; i++) {
+        for (int l = i + 1; l < m; l++) {
+            compute(
+                &lhs[s * m * n + i * n], &rhs[s * m + i],
+                &lhs[s * m * n + l * n], &rhs[s * m + l],
+                n,
+                &violations[s * k * m + s * m + i],
+                &violations[s * k * m + s * m + l],
+                indices, comp, useSelection
+            );
+        }
+    }
+    // Pairs of constraints of scenario s and any scenario t > s
+    for (int t = s + 1; t < k; t++) {
         for (int i = 0; i < m; i++) {
-            for (int l = i + 1; l < m; l++) {
-                sViolPtr = &violations[s * k * m + s * m + i];
-                tViolPtr = &violations[s * k * m + s * m + l];
+            for (int l = 0; l < m; l++) {
                 compute(
                     &lhs[s * m * n + i * n], &rhs[s * m + i],
-                    &lhs[s * m * n + l * n], &rhs[s * m + l],
-                    n, sViolPtr, tViolPtr, indices, comp
+                    &lhs[t * m * n + l * n], &rhs[t * m + l],
+                    n,
+                    &violations[s * k * m + t * m + i],
+                    &violations[t * k * m + s * m + l],
+                    indices, comp, useSelection
                 );
             }
         }
     }
+}
+
+void computeAllViolations(
+    double* lhs,
+    double* rhs,
+    int k,
+    int n,
+    int m,
+    double* violations,
+    int nbThreads,
+    bool useSelection
+) {
+    // The pairs (s, t) with s <= t are all processed by the thread that
+    // handles scenario s: it is the only one to write the (s, t) and
+    // (t, s) blocks of violations, so threads never write the same entry.
+    // Each thread uses its own index buffer and comparator.
+    #pragma omp parallel num_threads(nbThreads)
+    {
+        Comp comp;
+        int* indices = new int[n];
+        #pragma omp for schedule(dynamic)
+        for (int s = 0; s < k; s++) {
+            computeScenarioViolations(
+                lhs, rhs, k, n, m, s, violations, indices, comp,
+                useSelection);
+        }
+        delete[] indices;
+    }
+}
 
-    for (int s = 0; s < k; s++) {
-        for (int t = s + 1; t < k; t++) {
-            for (int i = 0; i < m; i++) {
-                for (int l = 0; l < m; l++) {
-                    sViolPtr = &violations[s * k * m + t * m + i];
-                    tViolPtr = &violations[t * k * m + s * m + l];
-                    compute(
-                        &lhs[s * m * n + i * n], &rhs[s * m + i],
-                        &lhs[t * m * n + l * n], &rhs[t * m + l],
-                        n, sViolPtr, tViolPtr, indices, comp
-                    );
+void computeEntry(
+    double* lhs,
+    double* rhs,
+    int n,
+    int m,
+    int s,
+    int i,
+    int t,
+    int l,
+    double* violPtr,
+    int* indices,
+    Comp& comp,
+    bool useSelection
+) {
+    // Update the violation of constraint (s, i) with the knapsack whose
+    // capacity is given by constraint (t, l). The knapsack is solved
+    // exactly as in computeAllViolations, where each pair of constraints
+    // is sorted once from the point of view of the first constraint.
+    double* silhs = &lhs[s * m * n + i * n];
+    double* sirhs = &rhs[s * m + i];
+    double* tllhs = &lhs[t * m * n + l * n];
+    double* tlrhs = &rhs[t * m + l];
+    for (int j = 0; j < n; j++) {
+        indices[j] = j;
+    }
+    if ((s < t) || ((s == t) && (i < l))) {
+        bind(comp, silhs, tllhs);
+        int front = n;
+        if (useSelection) {
+            front = selectFront(indices, 0, n, tllhs, *tlrhs - 1e-6, comp);
+        }
+        std::sort(indices, indices + front, comp);
+        if (!update(silhs, sirhs, tllhs, tlrhs, n, violPtr, indices, false,
+                    front)) {
+            std::sort(indices + front, indices + n, comp);
+            update(silhs, sirhs, tllhs, tlrhs, n, violPtr, indices, false, n);
+        }
+    } else {
+        bind(comp, tllhs, silhs);
+        int back = 0;
+        if (useSelection) {
+            back = selectBack(indices, 0, n, tllhs, *tlrhs - 1e-6, comp);
+        }
+        std::sort(indices + back, indices + n, comp);
+        if (!update(silhs, sirhs, tllhs, tlrhs, n, violPtr, indices, true,
+                    n - back)) {
+            std::sort(indices, indices + back, comp);
+            update(silhs, sirhs, tllhs, tlrhs, n, violPtr, indices, true, n);
+        }
+    }
+}
+
+void computeViolationsBlock(
+    double* lhs,
+    double* rhs,
+    int k,
+    int n,
+    int m,
+    int sStart,
+    int sEnd,
+    double* violations,
+    int nbThreads,
+    bool useSelection
+) {
+    // Compute the rows s in [sStart, sEnd) of the violations: the block
+    // has shape (sEnd - sStart, k, m). Each row is written by one thread.
+    #pragma omp parallel num_threads(nbThreads)
+    {
+        Comp comp;
+        int* indices = new int[n];
+        #pragma omp for schedule(dynamic)
+        for (int s = sStart; s < sEnd; s++) {
+            double* sViolations = &violations[(s - sStart) * k * m];
+            for (int t = 0; t < k; t++) {
+                for (int i = 0; i < m; i++) {
+                    for (int l = 0; l < m; l++) {
+                        if ((t == s) && (l == i)) {
+                            continue;
+                        }
+                        computeEntry(lhs, rhs, n, m, s, i, t, l,
+                                     &sViolations[t * m + i],
+                                     indices, comp, useSelection);
+                    }
                 }
             }
         }
+        delete[] indices;
     }
-    delete[] indices;
-}
\ No newline at end of file
+}
@@ -1,10 +1,17 @@
 import ctypes
 import numpy as np
 
+from libcpp cimport bool
+
 cdef extern from "violations.h":
-    void computeAllViolations(double*, double*, int, int, int, double*)
+    void computeAllViolations(double*, double*, int, int, int, double*,
+                              int, bool) nogil
+    void computeViolationsBlock(double*, double*, int, int, int, int, int,
+                                double*, int, bool) nogil
+    double solveKnapsack(double*, double, double*, double, int, bool) nogil
 
-cpdef compute_all_violations(double [:,:,::1] A, double [:,::1] b):
+cpdef compute_all_violations(double [:,:,::1] A, double [:,::1] b,
+                             int nb_threads=1, bool use_selection=True):
     cdef int k = int(A.shape[0])
     cdef int m = int(A.shape[1])
     cdef int n = int(A.shape[2])
@@ -15,7 +22,49 @@ cpdef compute_all_violations(double [:,:,::1] A, double [:,::1] b):
         for i in range(m):
             viols[s, s, i] = 0.0
 
-    # Call c++ function
-    computeAllViolations(&A[0, 0, 0], &b[0, 0], k, n, m, &viols[0, 0, 0])
+    # Call c++ function: release the GIL so that other Python
+    # threads can run while the violations are computed
+    with nogil:
+        computeAllViolations(&A[0, 0, 0], &b[0, 0], k, n, m,
+                             &viols[0, 0, 0], nb_threads, use_selection)
+
+    return np.asarray(viols)
+
+cpdef compute_violations_block(double [:,:,::1] A, double [:,::1] b,
+                               int s_start, int s_end, int nb_threads=1,
+                               bool use_selection=True):
+    """Compute the rows [s_start, s_end) of compute_all_violations."""
+    cdef int k = int(A.shape[0])
+    cdef int m = int(A.shape[1])
+    cdef int n = int(A.shape[2])
+    assert 0 <= s_start < s_end <= k
+    cdef double [:,:,::1] viols = np.ascontiguousarray(
+        np.ones((s_end - s_start, k, m)) * np.inf)
+
+    # A scenario has zero violation of its own constraints
+    for s in range(s_start, s_end):
+        for i in range(m):
+            viols[s - s_start, s, i] = 0.0
+
+    with nogil:
+        computeViolationsBlock(&A[0, 0, 0], &b[0, 0], k, n, m,
+                               s_start, s_end, &viols[0, 0, 0], nb_threads,
+                               use_selection)
+
+    return np.asarray(viols)
 
-    return np.asarray(viols)
\ No newline at end of file
+cpdef double solve_knapsack(double [::1] profits, double loss,
+                            double [::1] weights, double capacity,
+                            bool use_selection=True):
+    """
+    Maximum violation profits x - loss of a constraint over the
+    continuous knapsack weights x <= capacity, as in the Song et al
+    kernel. The critical item is found by weighted selection, or by
+    sorting all the items if use_selection is False.
+    """
+    cdef int n = int(profits.shape[0])
+    assert weights.shape[0] == n
+    if n == 0:
+        return -loss
+    return solveKnapsack(&profits[0], loss, &weights[0], capacity, n,
+                         use_selection)